@@ -0,0 +1,56 @@
+"""
+Compares the token-aware chunker with the fixed 6000-character
+split_dom_content over a scraped corpus: chunk counts, tokens per chunk
+and time.
+
+Usage:
+    python -m benchmarks.bench_chunker scraped_content.json
+    python -m benchmarks.bench_chunker scraped_content.jsonl --max-tokens 4000 --overlap 200
+"""
+import argparse
+import json
+import time
+
+from chunker import TokenCounter, chunk_text, default_chunk_tokens
+from scrape import split_dom_content
+
+
+def load_contents(path):
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line).get("content", "") for line in f if line.strip()]
+        return [record.get("content", "") for record in json.load(f)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare chunk counts of the old and new splitters.")
+    parser.add_argument("corpus", help="Scraped JSON array or JSONL journal.")
+    parser.add_argument("--max-tokens", type=int, default=None)
+    parser.add_argument("--overlap", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    contents = [content for content in load_contents(args.corpus) if content]
+    counter = TokenCounter()
+    budget = args.max_tokens or default_chunk_tokens()
+    print(f"{len(contents)} transcripts, {sum(map(len, contents)) / 1024 ** 2:.1f} MB, "
+          f"token budget {budget}, tokenizer {'tiktoken' if counter.encoding else 'estimate'}")
+
+    start = time.perf_counter()
+    old_chunks = [chunk for content in contents for chunk in split_dom_content(content)]
+    old_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new_chunks = [chunk for content in contents
+                  for chunk in chunk_text(content, budget, overlap_tokens=args.overlap, counter=counter)]
+    new_time = time.perf_counter() - start
+
+    for name, chunks, elapsed in (("split_dom_content", old_chunks, old_time), ("chunk_text", new_chunks, new_time)):
+        tokens = counter.count_many(chunks) if chunks else [0]
+        print(f"{name:>17}: {len(chunks):6d} chunks, {sum(tokens) / len(tokens):7.0f} avg tokens, "
+              f"{max(tokens):6d} max tokens, {elapsed:6.2f} s")
+    if old_chunks:
+        print(f"LLM calls: {len(new_chunks) / len(old_chunks):.2f}x of the old splitter")
+
+
+if __name__ == "__main__":
+    main()
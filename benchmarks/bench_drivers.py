@@ -0,0 +1,139 @@
+"""
+Compares the drivers the scraper creates, get_browser_driver with and
+without the fast-render profile (driver_profile.py), on local fixture
+pages: per-page load time, whether the extracted transcript is identical,
+and the resident memory of the browser process tree. The fixture transcripts pull in stylesheets, web fonts,
+images, a video and a third-party tracker, each served with a delay, like
+a real news page.
+
+Usage:
+    python -m benchmarks.bench_drivers
+    python -m benchmarks.bench_drivers --browser firefox --pages 30 --asset-delay 0.2
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.measure import tree_rss
+from extract import extract_transcript
+from scrape import get_browser_driver
+
+PARAGRAPH = ("The President held a meeting on economic issues, discussing the federal budget, regional "
+             "development programmes and measures to support industry and small businesses. ")
+
+ASSETS = {
+    ".css": ("text/css", b"body { font-family: 'Fixture'; }\n" * 2000),
+    ".woff2": ("font/woff2", os.urandom(80 * 1024)),
+    ".jpg": ("image/jpeg", os.urandom(250 * 1024)),
+    ".mp4": ("video/mp4", os.urandom(500 * 1024)),
+    ".js": ("application/javascript", b"var tracked = true;\n" * 500),
+}
+
+
+def transcript_page(number, third_party):
+    paragraphs = "".join(f"<p>{PARAGRAPH * 3}{number}-{index}</p>" for index in range(60))
+    images = "".join(f'<img src="/static/photo-{number}-{index}.jpg">' for index in range(8))
+    return f"""<html><head><title>Transcript {number}</title>
+<link rel="stylesheet" href="/static/site-{number}.css">
+<style>@font-face {{ font-family: 'Fixture'; src: url('/static/font-{number}.woff2'); }}</style>
+<script src="{third_party}/counter.js?page={number}"></script>
+</head><body>
+<h1 class="entry-title p-name">Meeting on economic issues {number}</h1>
+<div class="read__lead entry-summary p-summary">Vladimir Putin held a meeting {number}.</div>
+{images}
+<video src="/static/clip-{number}.mp4" autoplay muted></video>
+<img src="{third_party}/pixel-{number}.jpg">
+<div class="entry-content e-content read__internal_content">{paragraphs}</div>
+</body></html>""".encode("utf-8")
+
+
+def start_fixture_server(asset_delay):
+    """
+    Serves transcripts at /transcripts/N and their assets on 127.0.0.1; the
+    same server answers as 'localhost', which the benchmark treats as a
+    third-party domain.
+
+    Returns:
+    - tuple: (server, first-party base URL, third-party base URL).
+    """
+    state = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path.startswith("/transcripts/"):
+                body, content_type = transcript_page(path.rsplit("/", 1)[-1], state["third_party"]), "text/html"
+            else:
+                time.sleep(asset_delay)
+                content_type, body = ASSETS.get(os.path.splitext(path)[1], ("text/plain", b""))
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")  # Every page pays for its assets, like distinct articles
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    port = server.server_address[1]
+    state["third_party"] = f"http://localhost:{port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{port}", state["third_party"]
+
+
+def make_driver(browser, fast):
+    # Only the fixture host counts as first party, so 'localhost' plays the tracker
+    return get_browser_driver(browser, fast_render=fast, allowed_hosts=("127.0.0.1",))
+
+
+def run_profile(browser, fast, base_url, pages):
+    start = time.perf_counter()
+    driver = make_driver(browser, fast)
+    startup = time.perf_counter() - start
+    latencies, records, peak_rss = [], [], 0.0
+    try:
+        for number in range(pages):
+            url = f"{base_url}/transcripts/{number}"
+            start = time.perf_counter()
+            driver.get(url)
+            html = driver.page_source
+            latencies.append(time.perf_counter() - start)
+            records.append(extract_transcript(html, url))
+            peak_rss = max(peak_rss, tree_rss(driver.service.process.pid) or 0.0)
+    finally:
+        driver.quit()
+    return {"startup": startup, "latencies": latencies, "records": records, "peak_rss": peak_rss}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare default and fast-render browser drivers on local pages.")
+    parser.add_argument("--browser", default="chrome", choices=("chrome", "firefox"))
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--asset-delay", type=float, default=0.1, help="Seconds the server takes per asset.")
+    args = parser.parse_args(argv)
+
+    server, base_url, _ = start_fixture_server(args.asset_delay)
+    try:
+        results = {}
+        for name, fast in (("default", False), ("fast-render", True)):
+            results[name] = result = run_profile(args.browser, fast, base_url, args.pages)
+            latencies = sorted(result["latencies"])
+            print(f"{name:>11}: startup {result['startup']:5.2f} s, "
+                  f"median {statistics.median(latencies) * 1000:7.1f} ms/page, "
+                  f"max {latencies[-1] * 1000:7.1f} ms, peak RSS {result['peak_rss']:6.0f} MB")
+    finally:
+        server.shutdown()
+
+    default, fast = results["default"], results["fast-render"]
+    mismatches = sum(a != b for a, b in zip(default["records"], fast["records"]))
+    print(f"Speedup {sum(default['latencies']) / sum(fast['latencies']):.1f}x, "
+          f"{default['peak_rss'] - fast['peak_rss']:.0f} MB less peak RSS, {mismatches} extraction mismatches")
+
+
+if __name__ == "__main__":
+    main()
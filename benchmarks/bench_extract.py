@@ -0,0 +1,137 @@
+"""
+Micro-benchmark for the extraction engine: times the original BeautifulSoup
+("html.parser") extraction against extract.py over saved pages and checks
+that both produce identical output. Body markup is serialized differently by
+the two parsers (<br/> vs <br>, ...), so it is compared by the text it cleans
+to, and the byte-identical pages are counted separately.
+
+Usage:
+    python -m benchmarks.bench_extract --pages-dir saved_pages/
+    python -m benchmarks.bench_extract --cache-dir html_cache/ --limit 500
+"""
+import argparse
+import glob
+import gzip
+import os
+import time
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+from extract import extract_body_html, extract_clean_text, extract_listing, extract_transcript
+
+
+# Reference implementations, as they were in scrape.py before extract.py
+def legacy_transcript(html):
+    soup = BeautifulSoup(html, "html.parser")
+    title_element = soup.find("h1", class_="entry-title p-name")
+    title = title_element.get_text(strip=True) if title_element else "No title found"
+
+    summary_element = soup.find("div", class_="read__lead entry-summary p-summary")
+    summary = summary_element.get_text(strip=True) if summary_element else "No summary found"
+
+    content_element = soup.find("div", class_="entry-content e-content read__internal_content")
+    paragraphs = content_element.find_all("p") if content_element else []
+    content = "\n\n".join(p.get_text(strip=True) for p in paragraphs) if paragraphs else "No content found"
+
+    return {"title": title, "summary": summary, "content": content}
+
+
+def legacy_listing(html, base_url="http://en.kremlin.ru"):
+    soup = BeautifulSoup(html, "html.parser")
+    links = []
+    for title in soup.find_all("span", class_="entry-title p-name"):
+        parent = title.find_parent("a")
+        if parent and 'href' in parent.attrs:
+            relative_url = parent['href']
+            links.append(relative_url if relative_url.startswith("http") else f"{base_url}{relative_url}")
+    months = []
+    for date_block in soup.find_all("a", class_="dateblock"):
+        date_text = date_block.get_text(strip=True).replace("Calendar:", "").strip()
+        try:
+            month_year = datetime.strptime(date_text, '%B, %Y')
+            months.append((month_year.year, month_year.month))
+        except ValueError:
+            pass
+    return links, months
+
+
+def legacy_body_html(html):
+    soup = BeautifulSoup(html, "html.parser")
+    return str(soup.body) if soup.body else ""
+
+
+def legacy_clean_text(html):
+    soup = BeautifulSoup(html, "html.parser")
+    body_content = str(soup.body) if soup.body else ""
+    soup = BeautifulSoup(body_content, "html.parser")
+    for script_or_style in soup(["script", "style"]):
+        script_or_style.extract()
+    cleaned_content = soup.get_text(separator="\n")
+    return "\n".join(line.strip() for line in cleaned_content.splitlines() if line.strip())
+
+
+def load_pages(pages_dir=None, cache_dir=None, limit=None):
+    pages = []
+    if pages_dir:
+        for path in sorted(glob.glob(os.path.join(pages_dir, "*.htm*"))):
+            with open(path, "r", encoding="utf-8") as f:
+                pages.append((path, f.read()))
+    if cache_dir:
+        for path in sorted(glob.glob(os.path.join(cache_dir, "blobs", "*", "*.gz"))):
+            with gzip.open(path, "rb") as f:
+                pages.append((path, f.read().decode("utf-8")))
+    return pages[:limit] if limit else pages
+
+
+def time_function(function, pages, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [function(html) for _, html in pages]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare BeautifulSoup and lxml extraction speed and output.")
+    parser.add_argument("--pages-dir", help="Directory of saved .html pages.")
+    parser.add_argument("--cache-dir", help="HtmlCache directory to read pages from.")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    pages = load_pages(args.pages_dir, args.cache_dir, args.limit)
+    if not pages:
+        parser.error("No pages found; pass --pages-dir or --cache-dir.")
+    total_mb = sum(len(html) for _, html in pages) / 1024 ** 2
+    print(f"{len(pages)} pages, {total_mb:.1f} MB")
+
+    cases = [
+        ("transcript", legacy_transcript, extract_transcript),
+        ("listing", legacy_listing, extract_listing),
+        ("clean text", legacy_clean_text, extract_clean_text),
+        ("body", legacy_body_html, extract_body_html),
+    ]
+    for name, legacy, fast in cases:
+        legacy_time, legacy_results = time_function(legacy, pages, args.repeat)
+        fast_time, fast_results = time_function(fast, pages, args.repeat)
+        if name == "body":
+            # Compare the markup by its cleaned text; byte-identical markup is not expected
+            identical = sum(a == b for a, b in zip(legacy_results, fast_results))
+            mismatches = [path for (path, _), a, b in zip(pages, legacy_results, fast_results)
+                          if legacy_clean_text(a) != extract_clean_text(b)]
+        else:
+            mismatches = [path for (path, _), a, b in zip(pages, legacy_results, fast_results) if a != b]
+        print(f"{name:>10}: html.parser {legacy_time * 1000 / len(pages):7.2f} ms/page, "
+              f"lxml {fast_time * 1000 / len(pages):7.2f} ms/page, "
+              f"speedup {legacy_time / fast_time:5.1f}x, mismatches {len(mismatches)}")
+        if name == "body":
+            print(f"            byte-identical markup: {identical}/{len(pages)}")
+        for path in mismatches[:5]:
+            print(f"            mismatch: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Offline end-to-end benchmark of the scraper. Starts the fixture site and a
+fake LLM endpoint locally, then runs each stage the way the app does and
+measures it:
+
+    listing   scrape_all_links over the fixture's listing pages (needs a browser)
+    fetch     scrape_individual_page for every transcript, through PageFetcher
+    clean     extract_clean_text(html) per transcript
+    split     split_dom_content per cleaned transcript
+    llm       parse_with_groq over the chunks, against the fake endpoint
+
+For each stage it reports items per second, p50/p99 latency per item, CPU
+seconds and the peak RSS of the process tree, and saves everything (with
+the configuration) as JSON so runs can be compared with --compare.
+
+Usage:
+    python -m benchmarks.bench_pipeline --browser none
+    python -m benchmarks.bench_pipeline --latency 0.05 --jitter 0.1 --error-rate 0.02 --llm-error-rate 0.05
+    python -m benchmarks.bench_pipeline --compare benchmarks/results/pipeline-20260101-120000.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_llm import FakeLLMServer
+from benchmarks.fixture_site import FixtureSite
+from benchmarks.measure import StageRecorder, psutil
+from extract import extract_clean_text
+from fetch import PageFetcher
+from llm_client import OpenAICompatibleBackend
+from politeness import PolitenessScheduler
+from scrape import scrape_all_links, scrape_individual_page, split_dom_content
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+PARSE_DESCRIPTION = "Analyze speeches:"
+
+
+class TimedBackend:
+    """
+    Wraps an LLM backend to record the latency of every completion call.
+    """
+
+    def __init__(self, backend, recorder):
+        self.backend = backend
+        self.recorder = recorder
+
+    async def complete(self, messages, max_tokens=None):
+        start = time.perf_counter()
+        try:
+            text, tokens = await self.backend.complete(messages, max_tokens)
+        except Exception:
+            self.recorder.add(time.perf_counter() - start, ok=False)
+            raise
+        self.recorder.add(time.perf_counter() - start, ok=text is not None)
+        return text, tokens
+
+
+def bench_listing(site, args, scheduler):
+    served = site.requests["listing"]
+    end_month, end_year = site.last_month
+    with StageRecorder("listing") as recorder:
+        links = scrape_all_links(site.listing_url, args.browser, end_month, end_year, scheduler=scheduler)
+    # scrape_all_links loads pages internally, so pages are counted on the server side
+    recorder.items = site.requests["listing"] - served
+    recorder.extra.update(links=len(links), expected_links=len(site.transcript_urls()))
+    return recorder.result()
+
+
+def bench_fetch(site, args, scheduler):
+    fetcher = PageFetcher(args.browser, pool_size=args.workers, scheduler=scheduler)
+    if args.browser == "none":
+        # HTTP only: pages that would need the browser fallback count as failures
+        fetcher.fetch_selenium = lambda url, stop_event=None: None
+
+    def fetch_one(recorder, url):
+        start = time.perf_counter()
+        record = scrape_individual_page(url, args.browser, fetcher=fetcher)
+        recorder.add(time.perf_counter() - start, ok=record is not None)
+
+    try:
+        with StageRecorder("fetch") as recorder:
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                list(executor.map(lambda url: fetch_one(recorder, url), site.transcript_urls()))
+    finally:
+        fetcher.close()
+    recorder.extra["fetch"] = fetcher.stats_summary()
+    return recorder.result()
+
+
+def bench_clean(site):
+    pages = [site.transcript_page(id_).decode("utf-8") for id_ in site.transcript_ids()]
+    texts = []
+    with StageRecorder("clean") as recorder:
+        for html in pages:
+            start = time.perf_counter()
+            texts.append(extract_clean_text(html))
+            recorder.add(time.perf_counter() - start)
+    recorder.extra["mb"] = round(sum(len(html) for html in pages) / 1024 ** 2, 2)
+    return recorder.result(), texts
+
+
+def bench_split(texts):
+    chunks = []
+    with StageRecorder("split") as recorder:
+        for text in texts:
+            start = time.perf_counter()
+            chunks.extend(split_dom_content(text))
+            recorder.add(time.perf_counter() - start)
+    recorder.extra["chunks"] = len(chunks)
+    return recorder.result(), chunks
+
+
+def bench_llm(chunks, args):
+    try:
+        # parse.py builds a Groq client at import time; the fake backend below replaces it for every call
+        os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+        from llm_cache import LLMResponseCache
+        from parse import parse_with_groq
+    except ImportError as e:
+        return {"skipped": f"parse.py cannot be imported: {e}"}
+
+    with FakeLLMServer(args.llm_latency, args.llm_seconds_per_token, error_rate=args.llm_error_rate) as fake, \
+            tempfile.TemporaryDirectory() as tmp_dir:
+        cache = LLMResponseCache(os.path.join(tmp_dir, "llm_cache.sqlite3"))
+        with StageRecorder("llm") as recorder:
+            backend = TimedBackend(OpenAICompatibleBackend(fake.base_url), recorder)
+            parse_with_groq(chunks, PARSE_DESCRIPTION, backend=backend, concurrency=args.llm_concurrency,
+                            requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9, cache=cache, bypass_cache=True)
+        cache.close()
+        recorder.extra["server"] = dict(fake.requests)
+    return recorder.result()
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "psutil": psutil is not None, "commit": commit}
+
+
+def print_results(stages, baseline=None):
+    print(f"{'stage':>8} {'items':>6} {'errors':>6} {'items/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'cpu s':>7} {'rss MB':>7}")
+    for name, result in stages.items():
+        if "skipped" in result:
+            print(f"{name:>8}  skipped: {result['skipped']}")
+            continue
+        ms = lambda value: f"{value * 1000:9.1f}" if value is not None else f"{'-':>9}"
+        line = (f"{name:>8} {result['items']:6d} {result['errors']:6d} {result['items_per_second'] or 0:9.1f} "
+                f"{ms(result['p50_seconds'])} {ms(result['p99_seconds'])} {result['cpu_seconds']:7.2f} "
+                f"{result['peak_rss_mb'] or 0:7.0f}")
+        before = (baseline or {}).get(name, {})
+        if before.get("items_per_second") and result["items_per_second"]:
+            line += f"   {result['items_per_second'] / before['items_per_second']:5.2f}x throughput vs baseline"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scraper offline against a local fixture site.")
+    parser.add_argument("--stages", default="listing,fetch,clean,split,llm")
+    parser.add_argument("--browser", default="chrome", choices=("chrome", "firefox", "none"),
+                        help="'none' skips the listing stage and disables the Selenium fallback.")
+    parser.add_argument("--pages", type=int, default=5, help="Listing pages on the fixture site.")
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every fixture response.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra random seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fixture responses that fail.")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent fetches.")
+    parser.add_argument("--max-rate", type=float, default=1000.0,
+                        help="Politeness ceiling in requests per second (the fixture does not need protecting).")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Start the politeness scheduler at its usual slow initial rate and let it ramp up.")
+    parser.add_argument("--llm-chunks", type=int, default=40, help="Chunks sent to the fake LLM.")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-seconds-per-token", type=float, default=0.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Results file (default: benchmarks/results/pipeline-<time>.json).")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare throughput with.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    selected = [stage.strip() for stage in args.stages.split(",")]
+    # By default the scheduler starts at its ceiling, so the numbers measure the scraper rather than the AIMD ramp-up
+    concurrency = max(args.workers, 1)
+    if args.adaptive:
+        scheduler = PolitenessScheduler(max_rate=args.max_rate, max_concurrency=concurrency)
+    else:
+        scheduler = PolitenessScheduler(max_rate=args.max_rate, max_concurrency=concurrency, initial_rate=args.max_rate,
+                                        initial_concurrency=concurrency, jitter=0)
+    stages = {}
+    texts, chunks = [], []
+
+    with FixtureSite(args.pages, args.per_page, args.latency, args.jitter, args.error_rate, seed=args.seed) as site:
+        if "listing" in selected:
+            stages["listing"] = (bench_listing(site, args, scheduler) if args.browser != "none"
+                                 else {"skipped": "needs a browser"})
+        if "fetch" in selected:
+            stages["fetch"] = bench_fetch(site, args, scheduler)
+        # Clean and split work on the fixture HTML directly, so they measure parsing alone
+        if "clean" in selected or "split" in selected or "llm" in selected:
+            result, texts = bench_clean(site)
+            if "clean" in selected:
+                stages["clean"] = result
+        if "split" in selected or "llm" in selected:
+            result, chunks = bench_split(texts)
+            if "split" in selected:
+                stages["split"] = result
+    if "llm" in selected:
+        stages["llm"] = bench_llm(chunks[:args.llm_chunks], args)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["stages"]
+    print_results(stages, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("pipeline-%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"started_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "config": vars(args),
+                   "environment": environment(), "stages": stages}, f, indent=4)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Fake OpenAI-compatible /chat/completions endpoint for benchmarking the LLM
+stage offline. It answers after a configurable delay (a fixed part plus a
+per-token part, like a real model generating its reply), reports token
+usage, and can answer a fraction of requests with 429 or 500 errors to
+exercise the dispatcher's retries.
+
+Usage:
+    python -m benchmarks.fake_llm --port 8801 --latency 0.3 --error-rate 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_client import estimate_tokens
+
+
+class FakeLLMServer:
+    """
+    Threaded HTTP server speaking the chat completions API.
+
+    Parameters:
+    - latency (float): Seconds before every answer...
+    - seconds_per_token (float): ...plus this much per completion token.
+    - completion_tokens (int): Length of each answer in tokens.
+    - error_rate (float): Fraction of requests that fail.
+    - retry_after (float): Retry-After sent with injected 429s (half of the errors; the rest are 500s).
+    - host (str): Interface to listen on.
+    - port (int): Port to listen on (0 picks a free one).
+    - seed (int): Seed for the injected errors.
+    """
+
+    def __init__(self, latency=0.2, seconds_per_token=0.0, completion_tokens=200, error_rate=0.0, retry_after=1,
+                 host="127.0.0.1", port=0, seed=0):
+        self.latency = latency
+        self.seconds_per_token = seconds_per_token
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = {"ok": 0, "rate_limited": 0, "server_error": 0, "prompt_tokens": 0}
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                status, body, headers = fake.respond(json.loads(self.rfile.read(length) or b"{}"))
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://{host}:{self.server.server_address[1]}/v1"
+
+    def respond(self, request):
+        """
+        Returns (status, JSON body, extra headers) for a completion request.
+        """
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.error_rate / 2:
+            self._count("rate_limited")
+            return 429, {"error": {"message": "Rate limit reached"}}, {"Retry-After": str(self.retry_after)}
+        if roll < self.error_rate:
+            self._count("server_error")
+            return 500, {"error": {"message": "Injected server error"}}, {}
+
+        prompt = "".join(message.get("content", "") for message in request.get("messages", []))
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = min(self.completion_tokens, request.get("max_tokens") or self.completion_tokens)
+        time.sleep(self.latency + completion_tokens * self.seconds_per_token)
+        self._count("ok")
+        self._count("prompt_tokens", prompt_tokens)
+
+        content = (f"- Date of the speech: not stated\n- Location: Moscow\n- Main topics discussed: "
+                   f"{prompt[-200:].strip()[:120]}\n- Key quotes: none")
+        return 200, {
+            "id": "fake-completion",
+            "object": "chat.completion",
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }, {}
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.requests[key] += amount
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a fake chat completions endpoint until interrupted.")
+    parser.add_argument("--port", type=int, default=8801)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--seconds-per-token", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    fake = FakeLLMServer(args.latency, args.seconds_per_token, error_rate=args.error_rate, port=args.port)
+    print(f"Fake LLM endpoint at {fake.base_url} (use it as an OpenAICompatibleBackend base_url)")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Local stand-in for the kremlin.ru transcript section, for benchmarks that
+must not touch the live site. Listing pages carry the same markup the
+extractor reads (span.entry-title inside a link, a.dateblock, /page/N
+pagination, one month per page), and transcript pages have realistic
+sizes: navigation chrome, inline scripts and styles, and 20 to 120
+paragraphs of text. Every response can be delayed, and a fraction of them
+fail, to mimic a slow or overloaded server.
+
+Usage:
+    python -m benchmarks.fixture_site --port 8800 --latency 0.05 --error-rate 0.02
+"""
+import argparse
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SECTION = "/events/president/transcripts"
+
+WORDS = ("president", "meeting", "government", "economy", "regions", "development", "budget", "federal",
+         "programme", "industry", "cooperation", "security", "international", "question", "support", "children",
+         "healthcare", "education", "infrastructure", "investment", "colleagues", "decision", "important", "year")
+
+
+def month_offset(year, month, offset):
+    # The month `offset` months before (year, month)
+    index = year * 12 + (month - 1) - offset
+    return index // 12, index % 12 + 1
+
+
+class FixtureSite:
+    """
+    Threaded HTTP server with synthetic listing and transcript pages.
+
+    Parameters:
+    - pages (int): Listing pages; page N lists transcripts published N - 1 months before the first.
+    - per_page (int): Transcripts per listing page.
+    - latency (float): Seconds added to every response...
+    - jitter (float): ...plus up to this many random seconds.
+    - error_rate (float): Fraction of page responses answered with error_status instead.
+    - error_status (int): The status code of injected errors.
+    - host (str): Interface to listen on.
+    - port (int): Port to listen on (0 picks a free one).
+    - seed (int): Seed for page sizes and injected errors, so runs are comparable.
+    """
+
+    def __init__(self, pages=5, per_page=20, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503,
+                 host="127.0.0.1", port=0, seed=0):
+        self.pages = pages
+        self.per_page = per_page
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+        self.first_month = (datetime.now().year, datetime.now().month)
+        self.first_id = 70000 + pages * per_page
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = {"listing": 0, "transcript": 0, "robots": 0, "other": 0, "errors": 0}
+
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, body = site.respond(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8" if status == 200 else "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    @property
+    def listing_url(self):
+        return self.base_url + SECTION
+
+    @property
+    def last_month(self):
+        # Crawling until this (month, year) visits exactly `pages` listing pages
+        year, month = month_offset(*self.first_month, self.pages - 1)
+        return month, year
+
+    def transcript_ids(self):
+        return list(range(self.first_id, self.first_id - self.pages * self.per_page, -1))
+
+    def transcript_urls(self):
+        return [f"{self.listing_url}/{id_}" for id_ in self.transcript_ids()]
+
+    def _text(self, rng, words):
+        return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+    def listing_page(self, page_number):
+        year, month = month_offset(*self.first_month, page_number - 1)
+        month_name = datetime(year, month, 1).strftime("%B")
+        first = self.first_id - (page_number - 1) * self.per_page
+        entries = []
+        for id_ in range(first, first - self.per_page, -1):
+            rng = random.Random(self.seed * 1000003 + id_)
+            entries.append(
+                f'<div class="hentry h-entry hentry_event"><a href="{self.listing_url}/{id_}" class="tabs_article">'
+                f'<span class="entry-title p-name">{self._text(rng, 8)}</span></a>'
+                f'<p class="hentry__meta"><time class="published">{month_name} {rng.randint(1, 28)}, {year}</time></p></div>')
+        navigation = (f'<a class="button button_white more-prev" href="{self.listing_url}/page/{page_number + 1}">'
+                      f'Previous</a>' if page_number < self.pages else "")
+        return self._page("Transcripts", f'<a class="dateblock" href="#">Calendar: {month_name}, {year}</a>'
+                          + "".join(entries) + navigation)
+
+    def transcript_page(self, id_):
+        rng = random.Random(self.seed * 1000003 + id_)
+        paragraphs = "".join(f"<p>{' '.join(self._text(rng, rng.randint(12, 30)) for _ in range(rng.randint(2, 6)))}</p>"
+                             for _ in range(rng.randint(20, 120)))
+        body = (f'<h1 class="entry-title p-name">{self._text(rng, 8)}</h1>'
+                f'<div class="read__lead entry-summary p-summary">{self._text(rng, 30)}</div>'
+                f'<div class="entry-content e-content read__internal_content">{paragraphs}</div>')
+        return self._page("Transcript", body)
+
+    def _page(self, title, main):
+        # Site chrome around the content: the navigation, scripts and styles every real page carries
+        navigation = "".join(f'<li><a href="{SECTION}/page/{n}">Section {n}</a></li>' for n in range(1, 150))
+        script = "var analytics = {page: location.pathname, data: [" + ",".join(str(n) for n in range(1500)) + "]};"
+        style = "".join(f".block-{n} {{ margin: {n % 16}px; padding: {n % 8}px; }}\n" for n in range(300))
+        return (f"<!DOCTYPE html><html><head><title>{title}</title><style>{style}</style><script>{script}</script></head>"
+                f"<body><header><nav><ul>{navigation}</ul></nav></header><main>{main}</main>"
+                f"<footer><p>Fixture site for benchmarks.</p></footer></body></html>").encode("utf-8")
+
+    def respond(self, path):
+        """
+        Returns (status, body) for a request path, after the configured delay.
+        """
+        path = path.split("?", 1)[0].rstrip("/")
+        if path == "/robots.txt":
+            self._count("robots")
+            return 200, b"User-agent: *\nDisallow:\n"
+
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+
+        if path == SECTION or path.startswith(SECTION + "/page/"):
+            kind = "listing"
+            page_number = int(path.rsplit("/", 1)[-1]) if "/page/" in path else 1
+            found = 1 <= page_number <= self.pages
+        elif path.startswith(SECTION + "/") and path.rsplit("/", 1)[-1].isdigit():
+            kind = "transcript"
+            id_ = int(path.rsplit("/", 1)[-1])
+            found = id_ in range(self.first_id - self.pages * self.per_page + 1, self.first_id + 1)
+        else:
+            kind, found = "other", False
+
+        self._count(kind)
+        if failed:
+            self._count("errors")
+            return self.error_status, b"Injected error"
+        if not found:
+            return 404, b"Not found"
+        return 200, self.listing_page(page_number) if kind == "listing" else self.transcript_page(id_)
+
+    def _count(self, kind):
+        with self._lock:
+            self.requests[kind] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the benchmark fixture site until interrupted.")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    site = FixtureSite(args.pages, args.per_page, args.latency, args.jitter, args.error_rate, port=args.port)
+    print(f"Serving {args.pages * args.per_page} transcripts at {site.listing_url}")
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Measurement helpers shared by the benchmarks: resident memory of a process
+tree, and a per-stage recorder for throughput, latency percentiles, CPU
+time and peak RSS.
+"""
+import os
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:  # Optional; /proc is read instead on Linux
+    psutil = None
+
+
+def tree_rss(pid=None):
+    """
+    Resident memory of a process and all of its descendants, in MB (browsers
+    and process pools are many processes). Returns None where it cannot be measured.
+    """
+    pid = pid or os.getpid()
+    if psutil:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / 1024 ** 2
+
+    # Without psutil, walk /proc (Linux only)
+    if not os.path.isdir("/proc"):
+        return None
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat", "r") as f:
+                    parent = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(parent, []).append(int(entry))
+    total_kb, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status", "r") as f:
+                total_kb += next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0)
+        except OSError:
+            pass
+    return total_kb / 1024
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of numbers (None for an empty list).
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def cpu_seconds():
+    # User + system time of this process and of its children that have exited (e.g. parse workers)
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class StageRecorder:
+    """
+    Context manager that measures one benchmark stage: wall time, CPU time,
+    and peak RSS of this process tree (sampled in the background), plus the
+    latency of each item the stage reports with add().
+
+    Parameters:
+    - name (str): The stage name.
+    - sample_interval (float): Seconds between RSS samples.
+    """
+
+    def __init__(self, name, sample_interval=0.05):
+        self.name = name
+        self.sample_interval = sample_interval
+        self.latencies = []
+        self.items = 0
+        self.errors = 0
+        self.extra = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._peak_rss = 0.0
+
+    def add(self, latency=None, ok=True):
+        with self._lock:
+            self.items += 1
+            if not ok:
+                self.errors += 1
+            if latency is not None:
+                self.latencies.append(latency)
+
+    def _sample(self):
+        while True:
+            rss = tree_rss()
+            if rss is not None:
+                self._peak_rss = max(self._peak_rss, rss)
+            if self._done.wait(self.sample_interval):
+                return
+
+    def __enter__(self):
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        self._cpu = cpu_seconds()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall = time.perf_counter() - self._start
+        self.cpu = cpu_seconds() - self._cpu
+        self._done.set()
+        self._sampler.join()
+
+    def result(self):
+        """
+        Returns:
+        - dict: items, errors, wall and CPU seconds, items per second, p50/p99 latency (seconds) and peak RSS (MB).
+        """
+        p50, p99 = percentile(self.latencies, 0.5), percentile(self.latencies, 0.99)
+        return {
+            "items": self.items,
+            "errors": self.errors,
+            "wall_seconds": round(self.wall, 4),
+            "cpu_seconds": round(self.cpu, 4),
+            "items_per_second": round(self.items / self.wall, 2) if self.wall else None,
+            "p50_seconds": round(p50, 5) if p50 is not None else None,
+            "p99_seconds": round(p99, 5) if p99 is not None else None,
+            "peak_rss_mb": round(self._peak_rss, 1) or None,
+            **self.extra,
+        }
@@ -0,0 +1,152 @@
+import logging
+import re
+from functools import lru_cache
+
+import metrics
+from llm_client import DEFAULT_MODEL
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to the character estimate below
+    tiktoken = None
+
+# Context window per model, in tokens
+MODEL_CONTEXT = {
+    "llama3-8b-8192": 8192,
+    "llama3-70b-8192": 8192,
+}
+
+# Tokens kept free in the context for the system prompt, the instructions and the completion
+PROMPT_OVERHEAD_TOKENS = 128
+COMPLETION_RESERVE_TOKENS = 1024
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+# What goes between two pieces of a chunk: paragraphs are separated as in the scraped content,
+# sentences of a split paragraph by a space, and token slices of one sentence by nothing
+PARAGRAPH_SEPARATOR = "\n\n"
+SENTENCE_SEPARATOR = " "
+# Tokens each separator may add to a chunk; "\n\n" is a single token and a space at most one
+SEPARATOR_TOKENS = {PARAGRAPH_SEPARATOR: 1, SENTENCE_SEPARATOR: 1, "": 0}
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(name):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logging.warning("Could not load tokenizer, estimating tokens instead: %s", e)
+        return None
+
+
+class TokenCounter:
+    """
+    Counts tokens for a model. Llama 3 uses a tiktoken-style BPE vocabulary,
+    so cl100k_base is used as the closest available encoding; without
+    tiktoken, tokens are estimated from the character count.
+    """
+
+    def __init__(self, model=DEFAULT_MODEL):
+        self.model = model
+        self.encoding = _load_encoding("cl100k_base")
+
+    def count_many(self, texts):
+        if self.encoding is None:
+            # The character estimate rounded up, so the counts of parts never add up to less than that of their join
+            return [-(-len(text) // 4) for text in texts]
+        return [len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts)]
+
+    def count(self, text):
+        return self.count_many([text])[0]
+
+    def split(self, text, max_tokens):
+        # Hard split of a single over-long sentence at token boundaries
+        if self.encoding is None:
+            step = max_tokens * 4
+            return [text[i: i + step] for i in range(0, len(text), step)]
+        tokens = self.encoding.encode_ordinary(text)
+        return [self.encoding.decode(tokens[i: i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+
+def default_chunk_tokens(model=DEFAULT_MODEL):
+    """
+    Returns the chunk token budget that fits in the model's context with the prompt and completion.
+    """
+    return MODEL_CONTEXT.get(model, 8192) - PROMPT_OVERHEAD_TOKENS - COMPLETION_RESERVE_TOKENS
+
+
+def _pieces(paragraph, tokens, max_tokens, counter):
+    # Paragraphs that fit are kept whole; longer ones fall back to sentences, then to token slices.
+    # Each piece is (text, tokens, separator placed before it when it does not start a chunk).
+    if tokens <= max_tokens:
+        return [(paragraph, tokens, PARAGRAPH_SEPARATOR)]
+    sentences = SENTENCE_END.split(paragraph)
+    pieces = []
+    for sentence, sentence_tokens in zip(sentences, counter.count_many(sentences)):
+        separator = SENTENCE_SEPARATOR if pieces else PARAGRAPH_SEPARATOR
+        if sentence_tokens <= max_tokens:
+            pieces.append((sentence, sentence_tokens, separator))
+        else:
+            for part in counter.split(sentence, max_tokens):
+                pieces.append((part, counter.count(part), separator))
+                separator = ""
+    return pieces
+
+
+def _join(pieces):
+    return "".join(text if index == 0 else separator + text for index, (text, _, separator) in enumerate(pieces))
+
+
+@metrics.timed("chunk")
+def chunk_text(dom_content, max_tokens=None, model=DEFAULT_MODEL, overlap_tokens=0, counter=None):
+    """
+    Splits text into chunks of whole paragraphs (the "\\n\\n" joins from
+    scrape_individual_page) packed up to a token budget. Drop-in replacement
+    for split_dom_content.
+
+    Parameters:
+    - dom_content (str): The text to split.
+    - max_tokens (int): Token budget per chunk (default: fits the model's context).
+    - model (str): The target model, for the default budget.
+    - overlap_tokens (int): Repeat up to this many tokens of trailing paragraphs (or sentences) at the start of the next chunk.
+    - counter (TokenCounter): Optional shared token counter.
+
+    Returns:
+    - list: The text chunks.
+    """
+    if not dom_content:
+        return []
+    max_tokens = max_tokens or default_chunk_tokens(model)
+    counter = counter or TokenCounter(model)
+
+    paragraphs = [paragraph for paragraph in dom_content.split(PARAGRAPH_SEPARATOR) if paragraph.strip()]
+    pieces = []
+    for paragraph, tokens in zip(paragraphs, counter.count_many(paragraphs)):
+        pieces.extend(_pieces(paragraph, tokens, max_tokens, counter))
+
+    # current_tokens is the pieces' tokens plus the separators between them, the same sum the checks use
+    chunks = []
+    current, current_tokens = [], 0
+    for piece, tokens, separator in pieces:
+        if current and current_tokens + SEPARATOR_TOKENS[separator] + tokens > max_tokens:
+            chunks.append(_join(current))
+
+            # Carry trailing pieces into the next chunk, within the overlap and the budget
+            carried, carried_tokens = [], 0
+            for text, text_tokens, text_separator in reversed(current):
+                with_text = text_tokens + (SEPARATOR_TOKENS[carried[0][2]] + carried_tokens if carried else 0)
+                if with_text > overlap_tokens or with_text + SEPARATOR_TOKENS[separator] + tokens > max_tokens:
+                    break
+                carried.insert(0, (text, text_tokens, text_separator))
+                carried_tokens = with_text
+            current, current_tokens = carried, carried_tokens
+
+        current_tokens += tokens + (SEPARATOR_TOKENS[separator] if current else 0)
+        current.append((piece, tokens, separator))
+
+    if current:
+        chunks.append(_join(current))
+    metrics.count("chunks_total", len(chunks))
+    return chunks
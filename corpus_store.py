@@ -0,0 +1,217 @@
+import argparse
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+from search_index import iter_records
+from sortJSON import extract_date
+
+CORPUS_DIR = "corpus"
+BATCH_SIZE = 2000  # Records converted to a record batch at a time
+ROWS_PER_FILE = 50000
+ZSTD_LEVEL = 9
+
+SCHEMA = pa.schema([
+    ("url", pa.string()),
+    ("title", pa.string()),
+    ("summary", pa.string()),
+    ("content", pa.string()),
+    ("publication_date", pa.timestamp("s")),
+    ("year", pa.int16()),
+])
+
+# Files are laid out as corpus/year=2023/part-0.parquet; undated records go to the null partition
+PARTITIONING = ds.partitioning(pa.schema([("year", pa.int16())]), flavor="hive")
+
+
+def _record_batches(records, batch_size):
+    columns = {name: [] for name in SCHEMA.names}
+    for record in records:
+        published = extract_date(record.get("content") or "")
+        published = None if published == datetime.min else published
+        columns["url"].append(record.get("url"))
+        columns["title"].append(record.get("title"))
+        columns["summary"].append(record.get("summary"))
+        columns["content"].append(record.get("content"))
+        columns["publication_date"].append(published)
+        columns["year"].append(published.year if published else None)
+        if len(columns["url"]) >= batch_size:
+            yield pa.RecordBatch.from_pydict(columns, schema=SCHEMA)
+            columns = {name: [] for name in SCHEMA.names}
+    if columns["url"]:
+        yield pa.RecordBatch.from_pydict(columns, schema=SCHEMA)
+
+
+def write_corpus(records, root=CORPUS_DIR, batch_size=BATCH_SIZE, rows_per_file=ROWS_PER_FILE,
+                 compression_level=ZSTD_LEVEL):
+    """
+    Writes transcript records to zstd-compressed Parquet files partitioned by
+    publication year, streaming them batch by batch. The corpus is built
+    next to root and swapped in when complete, so readers never see a
+    half-written corpus.
+
+    Parameters:
+    - records (iterable): dicts with url, title, summary and content.
+    - root (str): The corpus directory.
+    - batch_size (int): Records held in memory at a time.
+    - rows_per_file (int): Maximum rows per Parquet file.
+    - compression_level (int): zstd compression level.
+
+    Returns:
+    - int: The number of records written.
+    """
+    count = 0
+
+    def counted(batches):
+        nonlocal count
+        for batch in batches:
+            count += batch.num_rows
+            yield batch
+
+    tmp_root = root.rstrip("/\\") + ".tmp"
+    shutil.rmtree(tmp_root, ignore_errors=True)
+    file_options = ds.ParquetFileFormat().make_write_options(compression="zstd", compression_level=compression_level)
+    ds.write_dataset(
+        counted(_record_batches(records, batch_size)),
+        tmp_root,
+        schema=SCHEMA,
+        format="parquet",
+        partitioning=PARTITIONING,
+        file_options=file_options,
+        max_rows_per_file=rows_per_file,
+        max_rows_per_group=min(rows_per_file, 10000),
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    if not os.path.isdir(tmp_root):  # No records; write_dataset creates nothing
+        os.makedirs(tmp_root)
+
+    shutil.rmtree(root, ignore_errors=True)
+    os.replace(tmp_root, root)
+    logging.info("Wrote %d records to %s.", count, root)
+    return count
+
+
+def convert_files(paths, root=CORPUS_DIR, **options):
+    """
+    Converts JSON array exports and JSONL journals into one Parquet corpus.
+    Records are de-duplicated by URL (or by content for legacy records without one).
+    """
+    def records():
+        seen = set()
+        for path in paths:
+            for record in iter_records(path):
+                key = record.get("url") or hash((record.get("title"), record.get("content")))
+                if key not in seen:
+                    seen.add(key)
+                    yield record
+
+    return write_corpus(records(), root, **options)
+
+
+def open_corpus(root=CORPUS_DIR):
+    """
+    Opens the corpus as a pyarrow dataset over memory-mapped files. Nothing is
+    read until columns are requested.
+    """
+    return ds.dataset(root, schema=SCHEMA, format="parquet", partitioning=PARTITIONING,
+                      filesystem=pafs.LocalFileSystem(use_mmap=True))
+
+
+def _year_filter(years):
+    if years is None:
+        return None
+    if isinstance(years, range):
+        return (ds.field("year") >= years.start) & (ds.field("year") < years.stop)
+    return ds.field("year").isin(list(years))
+
+
+def read_columns(root=CORPUS_DIR, columns=("title", "publication_date"), years=None):
+    """
+    Reads only the given columns, and only the partitions of the given years.
+
+    Parameters:
+    - root (str): The corpus directory.
+    - columns (tuple): Column names to read.
+    - years (range or list): Optional publication years; partitions outside them are not opened.
+
+    Returns:
+    - pyarrow.Table: The requested columns.
+    """
+    return open_corpus(root).to_table(columns=list(columns), filter=_year_filter(years))
+
+
+def iter_corpus(root=CORPUS_DIR, columns=None, years=None, batch_size=BATCH_SIZE):
+    """
+    Yields records as dicts, one record batch at a time.
+    """
+    columns = list(columns or SCHEMA.names)
+    for batch in open_corpus(root).to_batches(columns=columns, filter=_year_filter(years), batch_size=batch_size):
+        yield from batch.to_pylist()
+
+
+def corpus_stats(root=CORPUS_DIR):
+    """
+    Returns the record count per year and the on-disk size of the corpus.
+    """
+    years = read_columns(root, ("year",)).column("year").value_counts().to_pylist()
+    size = sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(root) for name in names)
+    return {
+        "records": sum(item["counts"] for item in years),
+        "bytes": size,
+        "years": {item["values"]: item["counts"] for item in sorted(years, key=lambda item: item["values"] or 0)},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parquet corpus of scraped transcripts.")
+    parser.add_argument("--corpus", default=CORPUS_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = subparsers.add_parser("convert", help="Convert JSON exports / JSONL journals into the corpus.")
+    convert_parser.add_argument("paths", nargs="+")
+    convert_parser.add_argument("--rows-per-file", type=int, default=ROWS_PER_FILE)
+    convert_parser.add_argument("--level", type=int, default=ZSTD_LEVEL, help="zstd compression level.")
+
+    subparsers.add_parser("stats", help="Show records per year and the corpus size.")
+
+    titles_parser = subparsers.add_parser("titles", help="List titles and dates, timing the read.")
+    titles_parser.add_argument("--from-year", type=int, default=None)
+    titles_parser.add_argument("--to-year", type=int, default=None)
+    titles_parser.add_argument("--limit", type=int, default=20, help="Titles to print (the read is not limited).")
+
+    args = parser.parse_args(argv)
+    if args.command == "convert":
+        start = time.perf_counter()
+        input_bytes = sum(os.path.getsize(path) for path in args.paths)
+        count = convert_files(args.paths, args.corpus, rows_per_file=args.rows_per_file, compression_level=args.level)
+        stats = corpus_stats(args.corpus)
+        print(f"Converted {count} records in {time.perf_counter() - start:.1f} s: "
+              f"{input_bytes / 1024 ** 2:.1f} MB -> {stats['bytes'] / 1024 ** 2:.1f} MB.")
+    elif args.command == "stats":
+        stats = corpus_stats(args.corpus)
+        print(f"{stats['records']} records, {stats['bytes'] / 1024 ** 2:.1f} MB")
+        for year, count in stats["years"].items():
+            print(f"{year or 'undated':>8}: {count}")
+    elif args.command == "titles":
+        years = None
+        if args.from_year or args.to_year:
+            years = range(args.from_year or 0, (args.to_year or 9999) + 1)
+        start = time.perf_counter()
+        table = read_columns(args.corpus, ("title", "publication_date"), years)
+        elapsed = time.perf_counter() - start
+        for title, published in zip(table.column("title").to_pylist()[:args.limit],
+                                    table.column("publication_date").to_pylist()[:args.limit]):
+            print(f"{published or 'undated'!s:19}  {title}")
+        print(f"Read {table.num_rows} titles and dates in {elapsed * 1000:.0f} ms "
+              f"({table.nbytes / 1024 ** 2:.1f} MB in memory).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,475 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from functools import partial
+
+import metrics
+
+JOBS_FILE = "crawl_jobs.sqlite3"
+
+# The runner process exits after this long without queued jobs; the next submit starts a new one
+RUNNER_IDLE_TIMEOUT = 120
+PROGRESS_INTERVAL = 0.5  # Seconds between progress writes
+CANCEL_POLL_INTERVAL = 0.5
+# A running job whose runner has not checked in for this long is considered dead
+HEARTBEAT_TIMEOUT = 30
+
+# Crawl settings used by jobs unless the submitted parameters override them
+MAX_WORKERS = 3  # Browsers kept in the driver pool for pages that need the Selenium fallback
+FETCH_WORKERS = 16
+PARSE_WORKERS = None  # One parser process per CPU core
+PARSE_QUEUE_SIZE = 64
+LISTING_CONCURRENCY = 4
+
+
+class JobStore:
+    """
+    SQLite table of crawl jobs. It is the only channel between the UI and the
+    runner process: the UI submits jobs, reads their progress and flags them
+    for cancellation; the runner claims queued jobs in order and writes their
+    progress. Every call is a short transaction, so polling it is cheap.
+
+    Parameters:
+    - path (str): The SQLite database file.
+    """
+
+    def __init__(self, path=JOBS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                progress TEXT,
+                error TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                runner_pid INTEGER,
+                heartbeat_at REAL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+        self._db.commit()
+
+    def submit(self, kind, params):
+        """
+        Queues a job.
+
+        Returns:
+        - int: The job ID.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO jobs (kind, params, status, created_at) VALUES (?, ?, 'queued', ?)",
+                (kind, json.dumps(params), time.time()))
+            self._db.commit()
+            return cursor.lastrowid
+
+    def claim_next(self, runner_pid):
+        """
+        Atomically marks the oldest queued job as running.
+
+        Returns:
+        - dict: The job, or None if the queue is empty.
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            row = self._db.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                self._db.commit()
+                return None
+            self._db.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ?, runner_pid = ? WHERE id = ?",
+                (time.time(), time.time(), runner_pid, row[0]))
+            self._db.commit()
+        return self.get(row[0])
+
+    def update_progress(self, job_id, progress):
+        with self._lock:
+            self._db.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id))
+            self._db.commit()
+
+    def finish(self, job_id, status, error=None):
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?",
+                             (status, time.time(), error, job_id))
+            self._db.commit()
+
+    def request_cancel(self, job_id):
+        """
+        Cancels a queued job immediately, or flags a running one; the runner
+        notices the flag within CANCEL_POLL_INTERVAL and stops the crawl.
+        """
+        with self._lock:
+            self._db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN ('queued', 'running')",
+                             (job_id,))
+            self._db.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                             (time.time(), job_id))
+            self._db.commit()
+
+    def heartbeat(self, job_id):
+        """
+        Records that the runner is still alive.
+
+        Returns:
+        - bool: True if the job was flagged for cancellation.
+        """
+        with self._lock:
+            self._db.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+            self._db.commit()
+            row = self._db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def recover_interrupted(self, timeout=HEARTBEAT_TIMEOUT):
+        """
+        Marks running jobs whose runner stopped sending heartbeats as failed.
+
+        Returns:
+        - int: The number of jobs marked.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, error = 'Interrupted: the runner process exited.' "
+                "WHERE status = 'running' AND heartbeat_at < ?", (time.time(), time.time() - timeout))
+            self._db.commit()
+        return cursor.rowcount
+
+    def _row_to_job(self, row):
+        columns = ("id", "kind", "params", "status", "created_at", "started_at", "finished_at", "progress", "error",
+                   "cancel_requested")
+        job = dict(zip(columns, row))
+        job["params"] = json.loads(job["params"])
+        job["progress"] = json.loads(job["progress"]) if job["progress"] else {}
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, params, status, created_at, started_at, finished_at, progress, error, cancel_requested "
+                "FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, limit=20):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, kind, params, status, created_at, started_at, finished_at, progress, error, cancel_requested "
+                "FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def active_jobs(self):
+        with self._lock:
+            rows = self._db.execute("SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY id").fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class JobProgress:
+    """
+    Progress counters of a running job, written to the job store at most
+    every PROGRESS_INTERVAL seconds so reporting stays off the hot path.
+    """
+
+    def __init__(self, store, job_id, interval=PROGRESS_INTERVAL):
+        self.store = store
+        self.job_id = job_id
+        self.interval = interval
+        self.started = time.time()
+        self.data = {"stage": "starting", "links": 0, "pending": 0, "processed": 0, "ok": 0, "empty": 0,
+                     "errors": 0, "recent": [], "fetch": ""}
+        self._last_write = 0.0
+
+    def update(self, **fields):
+        self.data.update(fields)
+        self.flush()
+
+    def count(self, status, title=None):
+        self.data["processed"] += 1
+        self.data["ok" if status == "ok" else "empty" if status == "empty" else "errors"] += 1
+        if title:
+            self.data["recent"] = ([title] + self.data["recent"])[:5]
+        self.flush()
+
+    def flush(self, force=False):
+        now = time.time()
+        if force or now - self._last_write >= self.interval:
+            self.data["elapsed"] = round(now - self.started, 1)
+            self.store.update_progress(self.job_id, self.data)
+            self._last_write = now
+
+
+def _watch_cancel(store, job_id, stop_event, done):
+    # Sends heartbeats and bridges the cancel flag in the job store to the crawl's stop_event
+    while not done.wait(CANCEL_POLL_INTERVAL):
+        if store.heartbeat(job_id) and not stop_event.is_set():
+            logging.info("Job %d cancelled.", job_id)
+            stop_event.set()
+
+
+def run_crawl_job(params, progress, stop_event):
+    """
+    Runs one crawl: collects the transcript links from a listing URL (or takes
+    the given list of links), then scrapes the pending ones through the fetch
+    and parse pipeline into the journal, the frontier and the search index.
+
+    Parameters:
+    - params (dict): browser, and either url (with end_month, end_year and optional seek, start_month,
+      start_year, incremental) or links; optional max_rate, use_proxies, proxy_file, fast_render.
+    - progress (JobProgress): Progress reporter.
+    - stop_event: threading event set when the job is cancelled.
+    """
+    # Imported here so the UI process only needs the job store
+    from driver_pool import DriverPool
+    from driver_profile import FAST_RENDER, first_party_hosts
+    from fetch import PageFetcher
+    from frontier import FrontierStore
+    from html_cache import HtmlCache
+    from journal import JOURNAL_FILE, ResultJournal, completed_urls
+    from listing_crawler import crawl_all_links
+    from listing_seek import seek_all_links
+    from pipeline import ScrapePipeline
+    from politeness import MAX_CONCURRENCY, get_scheduler
+    from proxy_pool import get_proxy_pool
+    from scrape import create_driver_with_proxy, get_browser_driver
+    from search_index import TranscriptIndex
+
+    browser = params.get("browser", "chrome")
+    if params.get("max_rate"):
+        get_scheduler().set_ceiling(max_rate=params["max_rate"], max_concurrency=MAX_CONCURRENCY)
+
+    # Optional proxy rotation: HTTP requests rotate proxies per request, browsers per driver
+    proxy_pool = None
+    fast_render = params.get("fast_render", FAST_RENDER)
+    driver_factory = partial(get_browser_driver, fast_render=fast_render)
+    if params.get("use_proxies"):
+        proxy_pool = get_proxy_pool(params.get("proxy_file") or None)
+        driver_factory = partial(create_driver_with_proxy, proxy_pool=proxy_pool, fast_render=fast_render)
+
+    html_cache = HtmlCache()
+    frontier = FrontierStore()
+    if len(frontier) == 0 and os.path.exists(JOURNAL_FILE):
+        frontier.seed_from_journal(JOURNAL_FILE)
+    search_index = TranscriptIndex()
+
+    try:
+        incremental = params.get("incremental", False)
+        if params.get("url"):
+            progress.update(stage="listing")
+            if params.get("seek"):
+                links = seek_all_links(params["url"], browser=browser, start_month=params["start_month"],
+                                       start_year=params["start_year"], end_month=params["end_month"],
+                                       end_year=params["end_year"], concurrency=LISTING_CONCURRENCY, cache=html_cache,
+                                       proxy_pool=proxy_pool, stop_event=stop_event)
+            else:
+                # Incremental runs must see new listing pages, so they bypass the listing cache
+                links = crawl_all_links(params["url"], browser=browser, end_month=params["end_month"],
+                                        end_year=params["end_year"], concurrency=LISTING_CONCURRENCY,
+                                        cache=None if incremental else html_cache, proxy_pool=proxy_pool,
+                                        frontier=frontier if incremental else None, stop_event=stop_event)
+        else:
+            links = params.get("links", [])
+        links = list(dict.fromkeys(links))  # Uploaded files and overlapping listing pages can repeat a link
+
+        # Resume: skip links already scraped successfully in an earlier run
+        new_links = frontier.add_discovered(links)
+        if incremental:
+            # Also retry transcripts left unfetched or failed by earlier runs, wherever they are listed
+            pending = frontier.pending(links)
+            scheduled = set(pending)
+            pending += [url for url in frontier.unfetched() if url not in scheduled]
+        else:
+            done_links = completed_urls(JOURNAL_FILE)
+            pending = [link for link in links if link not in done_links]
+        progress.update(stage="scraping", links=len(links), new=new_links, pending=len(pending))
+        if stop_event.is_set() or not pending:
+            return
+
+        # Fetch threads feed raw HTML to a process pool of parsers, sharing long-lived drivers for fallbacks.
+        # The drivers may only contact the hosts of the job's listing URL or of its uploaded links.
+        allowed_hosts = first_party_hosts(params["url"]) if params.get("url") else first_party_hosts(*pending)
+        driver_pool = DriverPool(browser, size=params.get("max_workers", MAX_WORKERS), stop_event=stop_event,
+                                 driver_factory=driver_factory, allowed_hosts=allowed_hosts)
+        fetcher = PageFetcher(browser, driver_pool=driver_pool, pool_size=FETCH_WORKERS, cache=html_cache,
+                              proxy_pool=proxy_pool)
+        pipeline = ScrapePipeline(fetcher, fetch_workers=FETCH_WORKERS, parse_workers=PARSE_WORKERS,
+                                  queue_size=PARSE_QUEUE_SIZE, stop_event=stop_event)
+        try:
+            with ResultJournal(JOURNAL_FILE) as journal, driver_pool:
+                for link, transcript_data, error in pipeline.run(pending):
+                    if stop_event.is_set():
+                        logging.info("Stopping scraping as requested by user.")
+                        break
+
+                    if error or not transcript_data:
+                        status = "error" if error else "empty"
+                        if error:
+                            logging.error(f"Error scraping {link}: {error}")
+                        journal.append(link, status=status, job_id=progress.job_id)
+                        frontier.mark_fetched(link, status)
+                        progress.count(status)
+                        continue
+
+                    record = {
+                        "title": transcript_data.get("title", "No Title"),
+                        "summary": transcript_data.get("summary", "No Summary"),
+                        "content": transcript_data.get("content", "No Content"),
+                    }
+                    journal.append(link, record, job_id=progress.job_id)
+                    frontier.mark_fetched(link, "ok")
+                    search_index.add({**record, "url": link})
+                    progress.count("ok", record["title"])
+                    progress.data["fetch"] = fetcher.stats_summary()
+        finally:
+            fetcher.close()
+            progress.data["fetch"] = fetcher.stats_summary()
+            logging.info("Fetch statistics: %s", fetcher.stats_summary())
+    finally:
+        progress.update(stage="finished")
+        progress.flush(force=True)
+        html_cache.close()
+        frontier.close()
+        search_index.close()
+
+
+JOB_HANDLERS = {
+    "crawl": run_crawl_job,
+}
+
+
+def run_job(store, job):
+    """
+    Runs one claimed job to completion, failure or cancellation.
+    """
+    stop_event = threading.Event()
+    done = threading.Event()
+    watcher = threading.Thread(target=_watch_cancel, args=(store, job["id"], stop_event, done), daemon=True)
+    watcher.start()
+    progress = JobProgress(store, job["id"])
+    logging.info("Starting job %d (%s).", job["id"], job["kind"])
+    try:
+        JOB_HANDLERS[job["kind"]](job["params"], progress, stop_event)
+        store.finish(job["id"], "cancelled" if stop_event.is_set() else "done")
+    except Exception as e:
+        logging.exception("Job %d failed.", job["id"])
+        store.finish(job["id"], "failed", f"{type(e).__name__}: {e}")
+    finally:
+        done.set()
+        watcher.join()
+
+
+def runner_main(path=JOBS_FILE, idle_timeout=RUNNER_IDLE_TIMEOUT):
+    """
+    Entry point of the runner process: runs queued jobs one at a time, in
+    submission order, and exits once the queue has been empty for idle_timeout.
+    """
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [runner %(process)d] %(message)s")
+    # Crawls record their stage timings in this process; the UI and `metrics.py serve` read them from disk
+    metrics.start_snapshot_writer("runner")
+    store = JobStore(path)
+    store.recover_interrupted()
+    idle_since = time.monotonic()
+    try:
+        while idle_timeout is None or time.monotonic() - idle_since < idle_timeout:
+            job = store.claim_next(os.getpid())
+            if job is None:
+                time.sleep(1.0)
+                continue
+            run_job(store, job)
+            idle_since = time.monotonic()
+    finally:
+        store.close()
+
+
+class JobService:
+    """
+    Front end for the UI: submits and cancels jobs, reads their status, and
+    keeps a runner process alive while there is work. Crawls run in that
+    process, so the Streamlit script only ever does quick job store reads.
+
+    Parameters:
+    - path (str): The job store file.
+    """
+
+    def __init__(self, path=JOBS_FILE):
+        self.path = path
+        self.store = JobStore(path)
+        self._process = None
+        self._lock = threading.Lock()
+
+    def ensure_runner(self):
+        with self._lock:
+            if self._process is not None and self._process.is_alive():
+                return
+            # Not a daemon: the runner owns the parser process pool, and daemons cannot have children
+            context = multiprocessing.get_context("spawn")
+            self._process = context.Process(target=runner_main, args=(self.path,), name="crawl-job-runner")
+            self._process.start()
+            logging.info("Started crawl job runner (pid %d).", self._process.pid)
+
+    def submit(self, params, kind="crawl"):
+        job_id = self.store.submit(kind, params)
+        self.ensure_runner()
+        return job_id
+
+    def cancel(self, job_id):
+        self.store.request_cancel(job_id)
+
+    def cancel_all(self):
+        for job_id in self.store.active_jobs():
+            self.store.request_cancel(job_id)
+
+    def jobs(self, limit=20):
+        jobs = self.store.list_jobs(limit)
+        if any(job["status"] == "queued" for job in jobs):
+            self.ensure_runner()  # Restart a runner that exited while jobs were still waiting
+        return jobs
+
+    def runner_alive(self):
+        return self._process is not None and self._process.is_alive()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run or inspect background crawl jobs.")
+    parser.add_argument("--jobs", default=JOBS_FILE)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    runner_parser = subparsers.add_parser("runner", help="Run queued jobs in this process.")
+    runner_parser.add_argument("--idle-timeout", type=float, default=None, help="Exit after this many idle seconds.")
+    subparsers.add_parser("list", help="List recent jobs.")
+    cancel_parser = subparsers.add_parser("cancel", help="Cancel a job.")
+    cancel_parser.add_argument("job_id", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "runner":
+        runner_main(args.jobs, args.idle_timeout)
+        return
+
+    store = JobStore(args.jobs)
+    try:
+        if args.command == "cancel":
+            store.request_cancel(args.job_id)
+        for job in store.list_jobs():
+            progress = job["progress"]
+            print(f"#{job['id']:<4} {job['status']:<9} {progress.get('stage', ''):<9} "
+                  f"{progress.get('processed', 0)}/{progress.get('pending', 0)} "
+                  f"{job['params'].get('url') or str(len(job['params'].get('links', []))) + ' links'}"
+                  f"{'  ' + job['error'] if job['error'] else ''}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+
+from scrape import get_browser_driver
+
+
+class DriverPool:
+    """
+    Keeps a fixed number of long-lived WebDriver instances that worker threads
+    check out and back in, instead of starting a new browser for every URL.
+
+    Parameters:
+    - browser (str): The browser to use ('chrome' or 'firefox').
+    - size (int): Maximum number of drivers alive at once (match the worker count).
+    - max_pages (int): Recycle a driver after it has served this many pages.
+    - stop_event: Optional threading event; once set, the pool shuts down.
+    - driver_factory (callable): Creates a new driver from the browser name.
+    - allowed_hosts (tuple): Optional hosts the drivers may contact, passed to the factory (see first_party_hosts).
+    """
+
+    def __init__(self, browser='chrome', size=3, max_pages=50, stop_event=None, driver_factory=get_browser_driver,
+                 allowed_hosts=None):
+        self.browser = browser
+        self.size = size
+        self.max_pages = max_pages
+        self.stop_event = stop_event
+        self.driver_factory = driver_factory
+        self.allowed_hosts = allowed_hosts
+
+        self._idle = queue.LifoQueue()  # Reuse the most recently used (warm) driver first
+        self._page_counts = {}  # id(driver) -> pages served
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _new_driver(self):
+        if self.allowed_hosts:
+            driver = self.driver_factory(self.browser, allowed_hosts=self.allowed_hosts)
+        else:
+            driver = self.driver_factory(self.browser)
+        with self._lock:
+            self._page_counts[id(driver)] = 0
+        logging.info("Driver pool started a new %s driver (%d/%d alive).", self.browser, self._created, self.size)
+        return driver
+
+    def _discard(self, driver):
+        with self._lock:
+            self._page_counts.pop(id(driver), None)
+            self._created -= 1
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.warning("Error while quitting driver: %s", e)
+
+    def _is_healthy(self, driver):
+        # A cheap round-trip to the browser; a crashed session raises here
+        try:
+            driver.current_url
+            return True
+        except Exception as e:
+            logging.warning("Driver failed health check, recycling it: %s", e)
+            return False
+
+    def _should_stop(self):
+        return self._closed or (self.stop_event is not None and self.stop_event.is_set())
+
+    def acquire(self, timeout=None):
+        """
+        Checks a healthy driver out of the pool, starting one if the pool is not full yet.
+
+        Returns:
+        - WebDriver: A driver, or None if the pool was stopped or the timeout expired.
+        """
+        while not self._should_stop():
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        return self._new_driver()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                try:
+                    # Poll so that a stop request is noticed while waiting
+                    driver = self._idle.get(timeout=0.5 if timeout is None else min(timeout, 0.5))
+                except queue.Empty:
+                    if timeout is not None:
+                        timeout -= 0.5
+                        if timeout <= 0:
+                            return None
+                    continue
+
+            if self._is_healthy(driver):
+                return driver
+            self._discard(driver)
+
+        return None
+
+    def release(self, driver, failed=False):
+        """
+        Checks a driver back in. Drivers that crashed, or that have served
+        max_pages pages, are quit and replaced lazily on the next acquire.
+
+        Parameters:
+        - driver: The driver returned by acquire().
+        - failed (bool): True if the driver raised while it was checked out.
+        """
+        if driver is None:
+            return
+
+        with self._lock:
+            pages = self._page_counts.get(id(driver), 0) + 1
+            self._page_counts[id(driver)] = pages
+
+        if failed or pages >= self.max_pages or self._should_stop():
+            if pages >= self.max_pages:
+                logging.info("Recycling driver after %d pages.", pages)
+            self._discard(driver)
+        else:
+            self._idle.put(driver)
+
+        if self._should_stop():
+            self.shutdown()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """
+        Context manager around acquire()/release(). Yields None if the pool is stopped.
+        """
+        driver = self.acquire(timeout)
+        failed = False
+        try:
+            yield driver
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.release(driver, failed=failed)
+
+    def shutdown(self):
+        """
+        Quits every idle driver. Drivers still checked out are quit when released.
+        """
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+        logging.info("Driver pool shut down.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
@@ -0,0 +1,147 @@
+from urllib.parse import quote, urlsplit
+
+# Fast-render profile for the fallback drivers: headless, skipping everything that is not the page itself.
+# Off by default; crawl jobs turn it on with their fast_render setting.
+FAST_RENDER = False
+
+WINDOW_SIZE = (1024, 768)
+DISK_CACHE_MB = 64
+
+# Requests for these resource types are dropped by the browser before they are sent
+BLOCKED_URL_PATTERNS = [
+    "*.css", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.avif",
+    "*.mp4", "*.webm", "*.mp3", "*.ogg", "*.m3u8",
+]
+
+
+def first_party_hosts(*urls):
+    """
+    The hosts a driver created for urls may contact when third-party domains
+    are blocked: the hosts of the urls themselves (with their sibling subdomains).
+    """
+    hosts = dict.fromkeys(urlsplit(url).hostname for url in urls if url)
+    hosts.pop(None, None)
+    return tuple(hosts) or None
+
+
+def _host_patterns(allowed_hosts):
+    # Each allowed host also covers its parent domain and sibling subdomains (static.kremlin.ru for en.kremlin.ru)
+    for host in allowed_hosts:
+        yield host
+        if not host.replace(".", "").isdigit() and "." in host:
+            domain = ".".join(host.split(".")[-2:])
+            if domain != host:
+                yield domain
+            yield "*." + domain
+
+
+def fast_chrome_options(options, allowed_hosts=None, proxy=None):
+    """
+    Turns ChromeOptions into the fast-render profile: headless, 'eager' page
+    loads (return at DOMContentLoaded), no images, a small window, a disk
+    cache capped at DISK_CACHE_MB and fewer background processes. With
+    allowed_hosts, DNS lookups for every other host fail, which blocks
+    third-party domains; pooled drivers that load pages of any site leave
+    it unset.
+
+    Parameters:
+    - options (ChromeOptions): The options to extend.
+    - allowed_hosts (tuple): Optional hosts the browser may contact (see first_party_hosts).
+    - proxy (str): The proxy the driver uses, if any, so it stays resolvable.
+
+    Returns:
+    - ChromeOptions: The same options object.
+    """
+    options.page_load_strategy = "eager"
+    options.add_argument("--headless=new")
+    options.add_argument(f"--window-size={WINDOW_SIZE[0]},{WINDOW_SIZE[1]}")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    for argument in ("--disable-gpu", "--disable-extensions", "--disable-dev-shm-usage", "--mute-audio",
+                     "--disable-background-networking", "--disable-component-update", "--disable-default-apps",
+                     "--disable-sync", "--no-first-run", "--renderer-process-limit=2"):
+        options.add_argument(argument)
+    options.add_argument(f"--disk-cache-size={DISK_CACHE_MB * 1024 * 1024}")
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.fonts": 2,
+        "profile.default_content_setting_values.notifications": 2,
+    })
+
+    if allowed_hosts:
+        hosts = list(_host_patterns(allowed_hosts))
+        if proxy:
+            hosts.append(urlsplit(proxy).hostname)
+        options.add_argument("--host-resolver-rules=MAP * ~NOTFOUND , "
+                             + " , ".join(f"EXCLUDE {host}" for host in hosts))
+    return options
+
+
+def block_chrome_resources(driver, patterns=BLOCKED_URL_PATTERNS):
+    """
+    Blocks stylesheets, fonts and media by URL through the DevTools protocol;
+    Chrome has no command-line switch for these.
+    """
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    return driver
+
+
+def firefox_pac_script(allowed_hosts, proxy=None):
+    """
+    Builds a proxy auto-config script that sends allowed hosts directly (or
+    through the proxy) and every other host to a closed local port, which is
+    how Firefox blocks third-party domains without an extension.
+    """
+    route = f"PROXY {urlsplit(proxy).netloc}" if proxy else "DIRECT"
+    checks = " || ".join(f'shExpMatch(host, "{pattern}")' for pattern in _host_patterns(allowed_hosts))
+    return (f"function FindProxyForURL(url, host) {{ if ({checks}) return \"{route}\"; "
+            f"return \"PROXY 127.0.0.1:9\"; }}")
+
+
+def fast_firefox_options(options, allowed_hosts=None, proxy=None):
+    """
+    Turns FirefoxOptions into the fast-render profile: headless, 'eager' page
+    loads, no images, stylesheets, web fonts or media, a small window, a
+    bounded disk cache with a small memory cache and a single content
+    process. With allowed_hosts, third-party domains are blocked through a
+    PAC script, which also routes through the proxy, if any; without it the
+    caller configures the proxy.
+
+    Returns:
+    - FirefoxOptions: The same options object.
+    """
+    options.page_load_strategy = "eager"
+    options.add_argument("-headless")
+    options.add_argument(f"--width={WINDOW_SIZE[0]}")
+    options.add_argument(f"--height={WINDOW_SIZE[1]}")
+    preferences = {
+        "permissions.default.image": 2,
+        "permissions.default.stylesheet": 2,
+        "gfx.downloadable_fonts.enabled": False,
+        "media.autoplay.default": 5,
+        "media.mediasource.enabled": False,
+        "media.hardware-video-decoding.enabled": False,
+        "browser.cache.disk.enable": True,
+        "browser.cache.disk.capacity": DISK_CACHE_MB * 1024,  # In KB
+        "browser.cache.disk.smart_size.enabled": False,
+        "browser.cache.memory.capacity": 8 * 1024,
+        "network.http.use-cache": True,
+        "browser.sessionhistory.max_total_viewers": 0,
+        "browser.sessionstore.resume_from_crash": False,
+        "dom.ipc.processCount": 1,
+        "fission.autostart": False,
+        "network.prefetch-next": False,
+        "network.dns.disablePrefetch": True,
+        "toolkit.telemetry.enabled": False,
+        "datareporting.healthreport.uploadEnabled": False,
+        "app.update.enabled": False,
+    }
+    for name, value in preferences.items():
+        options.set_preference(name, value)
+
+    if allowed_hosts:
+        options.set_preference("network.proxy.type", 2)
+        options.set_preference("network.proxy.autoconfig_url", "data:application/x-ns-proxy-autoconfig,"
+                               + quote(firefox_pac_script(allowed_hosts, proxy)))
+    return options
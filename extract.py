@@ -0,0 +1,191 @@
+import logging
+import re
+from functools import lru_cache
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import lxml.html
+from lxml import etree
+
+# Selector definitions per site. Each entry is (tag, exact class attribute), matching
+# the BeautifulSoup find(tag, class_="...") calls these replace.
+SITE_SELECTORS = {
+    "en.kremlin.ru": {
+        "base_url": "http://en.kremlin.ru",
+        "title": ("h1", "entry-title p-name"),
+        "summary": ("div", "read__lead entry-summary p-summary"),
+        "content": ("div", "entry-content e-content read__internal_content"),
+        "listing_title": ("span", "entry-title p-name"),
+        "dateblock": ("a", "dateblock"),
+        "dateblock_format": "%B, %Y",
+    },
+}
+DEFAULT_SITE = "en.kremlin.ru"
+
+BODY_TAG = re.compile(r"<body[\s>/]", re.IGNORECASE)
+HTML_TAG = re.compile(r"<html[\s>/]", re.IGNORECASE)
+PAGE_SUFFIX = re.compile(r"/page/(\d+)/?$")
+
+
+def site_selectors(url=None):
+    """
+    Returns the selector definitions for the site a URL belongs to (default: kremlin.ru).
+    """
+    host = urlsplit(url).netloc.lower() if url else DEFAULT_SITE
+    return SITE_SELECTORS.get(host, SITE_SELECTORS[DEFAULT_SITE])
+
+
+def split_listing_url(url):
+    """
+    Splits a listing URL into its base and page number.
+    'http://en.kremlin.ru/events/president/transcripts/page/7' -> (base, 7);
+    a URL without a /page/N suffix is treated as page 1.
+    """
+    match = PAGE_SUFFIX.search(url)
+    if match:
+        return url[:match.start()], int(match.group(1))
+    return url.rstrip("/"), 1
+
+
+def listing_page_url(base, page_number):
+    return base if page_number == 1 else f"{base}/page/{page_number}"
+
+
+@lru_cache(maxsize=None)
+def _class_xpath(tag, class_name):
+    # BeautifulSoup matches a multi-word class_ against the whole attribute and a
+    # single word against any one of the classes
+    if " " in class_name:
+        return etree.XPath(f'.//{tag}[normalize-space(@class)="{class_name}"]')
+    return etree.XPath(f'.//{tag}[contains(concat(" ", normalize-space(@class), " "), " {class_name} ")]')
+
+
+# Text nodes outside <script>/<style>, which BeautifulSoup's get_text skips as well
+_TEXT_NODES = etree.XPath(".//text()[not(ancestor::script) and not(ancestor::style)]")
+
+
+def _text(element):
+    # Same as BeautifulSoup get_text(strip=True): every text node stripped, empty ones dropped
+    return "".join(text.strip() for text in _TEXT_NODES(element) if text.strip())
+
+
+def parse_document(html):
+    """
+    Parses an HTML document once with the C-backed lxml parser.
+    An empty or whitespace-only document parses to an empty <html><body>.
+    """
+    if not html or not html.strip():
+        return lxml.html.document_fromstring("<html><body></body></html>")
+    try:
+        return lxml.html.document_fromstring(html)
+    except ValueError:
+        # Strings with an XML encoding declaration must be passed as bytes
+        return lxml.html.document_fromstring(html.encode("utf-8"))
+
+
+def extract_transcript(html, url=None, doc=None):
+    """
+    Extracts title, summary and content paragraphs from a transcript page.
+
+    Returns:
+    - dict: {"title", "summary", "content"}, the same output as the BeautifulSoup version.
+    """
+    selectors = site_selectors(url)
+    doc = parse_document(html) if doc is None else doc
+
+    title_elements = _class_xpath(*selectors["title"])(doc)
+    title = _text(title_elements[0]) if title_elements else "No title found"
+
+    summary_elements = _class_xpath(*selectors["summary"])(doc)
+    summary = _text(summary_elements[0]) if summary_elements else "No summary found"
+
+    content_elements = _class_xpath(*selectors["content"])(doc)
+    paragraphs = content_elements[0].xpath(".//p") if content_elements else []
+    content = "\n\n".join(_text(p) for p in paragraphs) if paragraphs else "No content found"
+
+    return {
+        "title": title,
+        "summary": summary,
+        "content": content,
+    }
+
+
+def extract_listing(html, url=None, doc=None):
+    """
+    Extracts the transcript links and dateblock months from a listing page in one parse.
+
+    Returns:
+    - tuple: (list of absolute article links, list of (year, month) tuples), both in page order.
+    """
+    selectors = site_selectors(url)
+    doc = parse_document(html) if doc is None else doc
+    base_url = selectors["base_url"]
+
+    links = []
+    for title in _class_xpath(*selectors["listing_title"])(doc):
+        parent = next(title.iterancestors("a"), None)
+        if parent is not None and parent.get("href") is not None:
+            relative_url = parent.get("href")
+            links.append(relative_url if relative_url.startswith("http") else f"{base_url}{relative_url}")
+
+    months = []
+    for date_block in _class_xpath(*selectors["dateblock"])(doc):
+        date_text = _text(date_block).replace("Calendar:", "").strip()
+        try:
+            month_year = datetime.strptime(date_text, selectors["dateblock_format"])
+            months.append((month_year.year, month_year.month))
+        except ValueError:
+            logging.warning("Unrecognized date format: %s", date_text)
+
+    return links, months
+
+
+def months_reached_end(months, end_month, end_year):
+    """
+    Returns True if any (year, month) is at or before end_month/end_year.
+    """
+    if not (end_month and end_year):
+        return False
+    return any(month <= (end_year, end_month) for month in months)
+
+
+def extract_body_html(html):
+    """
+    Returns the <body> element of a document as markup, or "" if it has none
+    (as str(soup.body) did). The markup is lxml's serialization of the same
+    tree, not byte-identical to BeautifulSoup's: e.g. <br> instead of <br/>.
+    """
+    if not BODY_TAG.search(html):
+        return ""
+    body = parse_document(html).find("body")
+    return lxml.html.tostring(body, encoding="unicode") if body is not None else ""
+
+
+def _text_root(html):
+    # <body> of a full document; a document without one is read whole, and a
+    # fragment or plain text under a single parent, as html.parser reads them
+    if BODY_TAG.search(html):
+        return parse_document(html).find("body")
+    if HTML_TAG.search(html):
+        return parse_document(html)
+    try:
+        return lxml.html.fragment_fromstring(html, create_parent=True)
+    except ValueError:
+        return lxml.html.fragment_fromstring(html.encode("utf-8"), create_parent=True)
+
+
+def extract_clean_text(html):
+    """
+    Single-parse equivalent of clean_body_content(extract_body_content(html)):
+    the text of <body> without <script>/<style>, one stripped line per text line.
+    Markup without a <body> tag, such as a fragment or plain text, is cleaned whole.
+    """
+    root = _text_root(html)
+    if root is None:
+        return ""
+
+    # Text nodes outside <script>/<style>; text following them stays a separate node, as with extract()
+    cleaned_content = "\n".join(_TEXT_NODES(root))
+    return "\n".join(
+        line.strip() for line in cleaned_content.splitlines() if line.strip()
+    )
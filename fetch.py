@@ -0,0 +1,232 @@
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from driver_profile import first_party_hosts
+from politeness import RequestCancelled, get_scheduler
+from proxy_pool import requests_proxies
+from scrape import fetch_page_with_retry, get_browser_driver
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36"
+
+# Markers that must be present in a server-rendered transcript page
+EXPECTED_MARKERS = ("entry-title", "entry-content")
+
+# Markers that suggest the server returned a JavaScript challenge instead of the page
+JS_CHALLENGE_MARKERS = (
+    "please enable javascript",
+    "enable javascript and cookies",
+    "cf-browser-verification",
+    "challenge-platform",
+    "__js_p_",
+    "ddos-guard",
+)
+
+
+def create_http_session(pool_size=32):
+    """
+    Creates a keep-alive HTTP session whose connection pool is large enough
+    for every fetch worker to reuse its own connection.
+
+    Parameters:
+    - pool_size (int): Maximum number of pooled connections per host.
+
+    Returns:
+    - requests.Session: The configured session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+    })
+    return session
+
+
+def looks_like_js_challenge(status_code, html):
+    """
+    Returns True if the response looks like a bot/JS challenge rather than content.
+    """
+    if status_code in (403, 429, 503):
+        return True
+    head = html[:20000].lower()
+    return any(marker in head for marker in JS_CHALLENGE_MARKERS)
+
+
+def has_expected_content(html, markers=EXPECTED_MARKERS):
+    """
+    Returns True if every expected selector class appears in the HTML.
+    """
+    return all(marker in html for marker in markers)
+
+
+class PageFetcher:
+    """
+    HTTP-first page fetcher. Each page is requested with a plain GET over a
+    pooled keep-alive session; the Selenium path is used only when the
+    expected selectors are missing or the response looks like a JS challenge.
+
+    Parameters:
+    - browser (str): The browser to use for the Selenium fallback.
+    - driver_pool: Optional DriverPool to borrow fallback drivers from.
+    - pool_size (int): Size of the HTTP connection pool.
+    - timeout (float): HTTP request timeout in seconds.
+    - expected_markers (tuple): Class names the page must contain to skip the browser.
+    - cache: Optional HtmlCache; fresh hits skip the network entirely.
+    - cache_ttl (float): Optional TTL override for this fetcher's cache lookups.
+    - scheduler: Optional PolitenessScheduler pacing every network request (default: the shared one).
+    - proxy_pool: Optional ProxyPool; each HTTP request goes through the proxy it picks, and the
+      outcome is reported back so failing proxies are rotated out.
+    """
+
+    def __init__(self, browser='chrome', driver_pool=None, pool_size=32, timeout=15, expected_markers=EXPECTED_MARKERS,
+                 cache=None, cache_ttl=None, scheduler=None, proxy_pool=None):
+        self.browser = browser
+        self.driver_pool = driver_pool
+        self.timeout = timeout
+        self.expected_markers = expected_markers
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.scheduler = scheduler or get_scheduler()
+        self.proxy_pool = proxy_pool
+        self.session = create_http_session(pool_size)
+
+        self._stats_lock = threading.Lock()
+        self.stats = {"cache": 0, "revalidated": 0, "http": 0, "selenium": 0, "failed": 0}
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def fetch_http(self, url, cached_entry=None, stop_event=None):
+        """
+        Fetches a page with a plain HTTP GET, conditionally if a stale cache entry is given.
+
+        Returns:
+        - str: The page HTML if it contains the expected content, "" if the page does not
+          exist (404 or 410), None otherwise.
+        """
+        headers = self.cache.conditional_headers(cached_entry) if self.cache else {}
+        proxy = self.proxy_pool.get() if self.proxy_pool else None
+        start = time.monotonic()
+        host = metrics.host_of(url)
+        try:
+            with self.scheduler.request(url, stop_event=stop_event) as outcome, metrics.timer("fetch_http", host) as span:
+                response = self.session.get(url, timeout=self.timeout, headers=headers,
+                                            proxies=requests_proxies(proxy) if proxy else None)
+                outcome.record(response.status_code, response.headers.get("Retry-After"))
+                span.outcome = "ok" if response.status_code in (200, 304) else f"http_{response.status_code}"
+            metrics.count("http_status_total", host=host, status=response.status_code)
+        except RequestCancelled:
+            return None
+        except requests.RequestException as e:
+            logging.warning("HTTP fetch failed for %s: %s", url, e)
+            if self.proxy_pool:
+                self.proxy_pool.report(proxy, ok=False)
+            return None
+
+        if response.status_code == 304 and cached_entry:
+            self.cache.touch(url)
+            self._count("revalidated")
+            metrics.count("fetch_cache_total", host=host, result="revalidated")
+            return cached_entry["html"]
+
+        html = response.text
+        if self.proxy_pool:
+            # Any response from the target means the proxy works; its 403/429/503 are the site throttling
+            self.proxy_pool.report(proxy, ok=response.status_code != 407, latency=time.monotonic() - start)
+        if looks_like_js_challenge(response.status_code, html):
+            logging.info("JS challenge or block detected for %s (status %d), falling back to browser.", url, response.status_code)
+            return None
+        if response.status_code in (404, 410):
+            logging.info("Page %s does not exist (status %d).", url, response.status_code)
+            return ""
+        if response.status_code != 200 or not has_expected_content(html, self.expected_markers):
+            logging.info("Expected selectors missing for %s (status %d), falling back to browser.", url, response.status_code)
+            return None
+
+        if self.cache:
+            self.cache.put(url, html, etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"))
+        self._count("http")
+        return html
+
+    def fetch_selenium(self, url, stop_event=None):
+        """
+        Fetches a page through a real browser, borrowing a driver from the pool if available.
+
+        Returns:
+        - str: The page source if successful, None otherwise.
+        """
+        stop_event = stop_event or threading.Event()
+        driver = (self.driver_pool.acquire() if self.driver_pool
+                  else get_browser_driver(self.browser, allowed_hosts=first_party_hosts(url)))
+        if driver is None:
+            return None
+
+        html = None
+        try:
+            html = fetch_page_with_retry(url, driver, stop_event, cache=self.cache, cache_ttl=self.cache_ttl,
+                                         scheduler=self.scheduler)
+            return html
+        finally:
+            if self.proxy_pool and getattr(driver, "proxy", None):
+                self.proxy_pool.report(driver.proxy, ok=html is not None or stop_event.is_set())
+            if self.driver_pool:
+                self.driver_pool.release(driver, failed=html is None and not stop_event.is_set())
+            else:
+                driver.quit()
+
+    def fetch(self, url, stop_event=None):
+        """
+        Fetches a page, trying HTTP first and falling back to Selenium.
+
+        Parameters:
+        - url (str): The URL of the page to fetch.
+        - stop_event: Optional threading event to check for stopping the scraper.
+
+        Returns:
+        - str: The page HTML if successful, "" if the page does not exist, None otherwise.
+        """
+        if stop_event and stop_event.is_set():
+            return None
+
+        cached_entry = self.cache.lookup(url, self.cache_ttl) if self.cache else None
+        if cached_entry and cached_entry["fresh"]:
+            self._count("cache")
+            metrics.count("fetch_cache_total", host=metrics.host_of(url), result="hit")
+            return cached_entry["html"]
+
+        html = self.fetch_http(url, cached_entry, stop_event)
+        if html:
+            return html
+        if stop_event and stop_event.is_set():
+            return None
+        if html == "":
+            # A browser would not find a missing page either
+            self._count("failed")
+            return html
+
+        html = self.fetch_selenium(url, stop_event)
+        self._count("selenium" if html else "failed")
+        return html
+
+    def stats_summary(self):
+        """
+        Returns a one-line summary of how many pages used each fetch path.
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        total = sum(stats.values())
+        return (f"{total} pages fetched: {stats['cache']} from cache, {stats['revalidated']} revalidated, "
+                f"{stats['http']} via HTTP, {stats['selenium']} via Selenium, {stats['failed']} failed.")
+
+    def close(self):
+        self.session.close()
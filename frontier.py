@@ -0,0 +1,182 @@
+import argparse
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+from journal import JOURNAL_FILE, completed_urls
+
+FRONTIER_FILE = "frontier.sqlite3"
+
+TRANSCRIPT_ID = re.compile(r"/transcripts/(\d+)/?$")
+
+
+def transcript_id(url):
+    """
+    'http://en.kremlin.ru/events/president/transcripts/57538' -> 57538, or None for other URLs.
+    """
+    match = TRANSCRIPT_ID.search(url)
+    return int(match.group(1)) if match else None
+
+
+class FrontierStore:
+    """
+    Persistent seen-set of transcript IDs with their discovery and last
+    fetch times. An incremental crawl stops paging through the listing at
+    the first page whose transcripts are all known, and only schedules the
+    IDs that were never fetched successfully.
+
+    Parameters:
+    - path (str): The SQLite database file.
+    """
+
+    def __init__(self, path=FRONTIER_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS transcripts (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                discovered_at REAL NOT NULL,
+                fetched_at REAL,
+                status TEXT
+            )
+        """)
+        self._db.commit()
+
+    def _ids(self, urls):
+        return {id_: url for url in urls if (id_ := transcript_id(url)) is not None}
+
+    def _select_ids(self, query, ids):
+        found = set()
+        ids = list(ids)
+        # SQLite limits the number of bound parameters per statement
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            rows = self._db.execute(query.format(",".join("?" * len(batch))), batch).fetchall()
+            found.update(row[0] for row in rows)
+        return found
+
+    def all_known(self, urls):
+        """
+        Returns True if every transcript on a listing page was already fetched successfully.
+        Discovered but unfetched or failed IDs do not count, so an interrupted run
+        does not make the next incremental run stop early. A page without
+        transcript links is never considered known.
+        """
+        ids = self._ids(urls)
+        if not ids or len(ids) < len(set(urls)):
+            return False
+        with self._lock:
+            known = self._select_ids("SELECT id FROM transcripts WHERE status = 'ok' AND id IN ({})", ids)
+        return len(known) == len(ids)
+
+    def add_discovered(self, urls):
+        """
+        Records newly discovered transcript URLs; already known IDs are left untouched.
+
+        Returns:
+        - int: The number of new IDs.
+        """
+        now = time.time()
+        rows = [(id_, url, now) for id_, url in self._ids(urls).items()]
+        with self._lock:
+            cursor = self._db.executemany(
+                "INSERT OR IGNORE INTO transcripts (id, url, discovered_at) VALUES (?, ?, ?)", rows)
+            self._db.commit()
+            return cursor.rowcount
+
+    def pending(self, urls):
+        """
+        Filters URLs down to those not yet fetched successfully, keeping their order.
+        URLs without a transcript ID are always kept.
+        """
+        ids = self._ids(urls)
+        with self._lock:
+            done = self._select_ids("SELECT id FROM transcripts WHERE status = 'ok' AND id IN ({})", ids)
+        return [url for url in urls if transcript_id(url) not in done]
+
+    def unfetched(self):
+        """
+        Returns the URLs of every known transcript never fetched or whose fetch
+        failed, newest first, including those on listing pages an incremental
+        run no longer visits. Pages found missing ('empty', e.g. 404) are not retried.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url FROM transcripts WHERE status IS NULL OR status = 'error' ORDER BY id DESC").fetchall()
+        return [row[0] for row in rows]
+
+    def mark_fetched(self, url, status="ok"):
+        """
+        Records the outcome of fetching a transcript ("ok", "empty" or "error").
+        """
+        id_ = transcript_id(url)
+        if id_ is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute("""
+                INSERT INTO transcripts (id, url, discovered_at, fetched_at, status) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET fetched_at = excluded.fetched_at, status = excluded.status
+            """, (id_, url, now, now, status))
+            self._db.commit()
+
+    def seed_from_journal(self, journal_path=JOURNAL_FILE):
+        """
+        Marks every transcript already in the scrape journal as fetched, so the
+        first incremental run does not start from an empty frontier.
+
+        Returns:
+        - int: The number of IDs added.
+        """
+        now = time.time()
+        rows = [(id_, url, now, now) for id_, url in self._ids(completed_urls(journal_path)).items()]
+        with self._lock:
+            cursor = self._db.executemany("""
+                INSERT OR IGNORE INTO transcripts (id, url, discovered_at, fetched_at, status) VALUES (?, ?, ?, ?, 'ok')
+            """, rows)
+            self._db.commit()
+        logging.info("Seeded the frontier with %d transcripts from %s.", cursor.rowcount, journal_path)
+        return cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            total, fetched, last_fetch = self._db.execute(
+                "SELECT COUNT(*), COUNT(CASE WHEN status = 'ok' THEN 1 END), MAX(fetched_at) FROM transcripts"
+            ).fetchone()
+        return {"known": total, "fetched": fetched, "pending": total - fetched, "last_fetch": last_fetch}
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or seed the incremental crawl frontier.")
+    parser.add_argument("--frontier", default=FRONTIER_FILE)
+    parser.add_argument("command", choices=("stats", "seed"))
+    parser.add_argument("--journal", default=JOURNAL_FILE)
+    args = parser.parse_args(argv)
+
+    frontier = FrontierStore(args.frontier)
+    try:
+        if args.command == "seed":
+            print(f"{frontier.seed_from_journal(args.journal)} transcripts added from {args.journal}.")
+        stats = frontier.stats()
+        last_fetch = time.strftime("%Y-%m-%d %H:%M", time.localtime(stats["last_fetch"])) if stats["last_fetch"] else "never"
+        print(f"{stats['known']} known transcripts, {stats['fetched']} fetched, {stats['pending']} pending; "
+              f"last fetch {last_fetch}.")
+    finally:
+        frontier.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+import argparse
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_CACHE_DIR = "html_cache"
+DEFAULT_TTL = 30 * 24 * 3600  # Transcripts almost never change once published
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# The orphan sweep leaves younger blobs alone: another process may be about to index them
+ORPHAN_GRACE = 600
+# Puts between exact size checks; in between, only blobs written by this process are counted
+SIZE_CHECK_INTERVAL = 500
+# Eviction triggered by put() frees this much of max_bytes, so the next puts do not evict again at once
+EVICT_HEADROOM = 0.1
+
+
+def normalize_url(url):
+    """
+    Normalizes a URL for use as a cache key: lowercase scheme and host,
+    no fragment, sorted query string and no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
+
+
+class HtmlCache:
+    """
+    Persistent HTML cache. Raw pages are stored gzip-compressed under the
+    SHA-256 of their content (identical pages share one blob), and a SQLite
+    index maps each normalized URL to its blob, ETag, Last-Modified and
+    fetch time. Entries expire after a TTL and the least recently used
+    ones are evicted once the cache grows past max_bytes.
+
+    Parameters:
+    - cache_dir (str): Directory holding the index and blobs.
+    - ttl (float): Seconds after which an entry must be revalidated.
+    - max_bytes (int): Compressed size limit before LRU eviction.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(cache_dir, "blobs"), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._bytes_estimate = None  # Cache size as of the last exact check, plus blobs written since
+        self._puts_since_check = 0
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._db.commit()
+
+    def _blob_path(self, content_hash):
+        return os.path.join(self.cache_dir, "blobs", content_hash[:2], content_hash + ".gz")
+
+    def _read_blob(self, content_hash):
+        try:
+            with gzip.open(self._blob_path(content_hash), "rb") as f:
+                return f.read().decode("utf-8")
+        except OSError as e:
+            logging.warning("Missing or corrupt cache blob %s: %s", content_hash, e)
+            return None
+
+    def lookup(self, url, ttl=None):
+        """
+        Looks up a URL without touching the network.
+
+        Parameters:
+        - url (str): The page URL.
+        - ttl (float): Optional TTL override (e.g. shorter for listing pages).
+
+        Returns:
+        - dict: {"html", "etag", "last_modified", "fetched_at", "fresh"} or None on a miss.
+        """
+        key = normalize_url(url)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT content_hash, etag, last_modified, fetched_at FROM entries WHERE url = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        content_hash, etag, last_modified, fetched_at = row
+        html = self._read_blob(content_hash)
+        if html is None:
+            self.delete(url)
+            return None
+
+        with self._lock:
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE url = ?", (time.time(), key))
+            self._db.commit()
+
+        ttl = self.ttl if ttl is None else ttl
+        return {
+            "html": html,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": fetched_at,
+            "fresh": time.time() - fetched_at < ttl,
+        }
+
+    def get(self, url, ttl=None):
+        """
+        Returns the cached HTML for a URL if it is still fresh, None otherwise.
+        """
+        entry = self.lookup(url, ttl)
+        return entry["html"] if entry and entry["fresh"] else None
+
+    def conditional_headers(self, entry):
+        """
+        Builds If-None-Match / If-Modified-Since headers for revalidating an entry.
+        """
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url, html, etag=None, last_modified=None):
+        """
+        Stores a page. The blob is written once per distinct content.
+        """
+        data = html.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(content_hash)
+        key = normalize_url(url)
+
+        # Compress outside the lock; only publishing the blob and indexing it must be atomic
+        tmp_path = self._write_tmp_blob(path, data) if not os.path.exists(path) else None
+
+        now = time.time()
+        with self._lock:
+            # Under the same lock as _release_blobs, so the blob cannot be removed as unreferenced in between
+            new_blob = not os.path.exists(path)
+            if new_blob:
+                # Rarely, an identical blob seen above was released since
+                os.replace(tmp_path or self._write_tmp_blob(path, data), path)
+            elif tmp_path:
+                os.remove(tmp_path)
+            size = os.path.getsize(path)
+            row = self._db.execute("SELECT content_hash FROM entries WHERE url = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (url, content_hash, size, etag, last_modified, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, content_hash, size, etag, last_modified, now, now),
+            )
+            self._db.commit()
+            if row and row[0] != content_hash:
+                self._release_blobs([row[0]])  # The page changed; its old content may now be unreferenced
+
+            # Released blobs are not subtracted, so the estimate only errs towards checking early
+            if new_blob and self._bytes_estimate is not None:
+                self._bytes_estimate += size
+            self._puts_since_check += 1
+            check_size = (self._bytes_estimate is None or self._bytes_estimate > self.max_bytes
+                          or self._puts_since_check >= SIZE_CHECK_INTERVAL)
+
+        if check_size:
+            self.evict_to_size(target_bytes=int(self.max_bytes * (1 - EVICT_HEADROOM)))
+
+    def _write_tmp_blob(self, path, data):
+        # A unique temp file next to the blob, so writers in other threads or processes never share it
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as f:
+                f.write(data)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return tmp_path
+
+    def touch(self, url):
+        """
+        Marks an entry as freshly validated (after a 304 Not Modified).
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, normalize_url(url)))
+            self._db.commit()
+
+    def delete(self, url):
+        key = normalize_url(url)
+        with self._lock:
+            row = self._db.execute("SELECT content_hash FROM entries WHERE url = ?", (key,)).fetchone()
+            self._db.execute("DELETE FROM entries WHERE url = ?", (key,))
+            self._db.commit()
+            if row:
+                self._release_blobs([row[0]])
+
+    def _release_blobs(self, content_hashes):
+        # Removes the blobs of the given hashes that no entry points to any more; the caller holds self._lock
+        removed = 0
+        for content_hash in set(content_hashes):
+            if self._db.execute("SELECT 1 FROM entries WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone():
+                continue
+            try:
+                os.remove(self._blob_path(content_hash))
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def remove_orphan_blobs(self, grace=ORPHAN_GRACE):
+        """
+        Sweeps the blob directories for blobs no entry points to, e.g. left by
+        a crash between writing a blob and indexing it. Blobs younger than
+        grace seconds are kept.
+
+        Returns:
+        - int: The number of blobs removed.
+        """
+        cutoff = time.time() - grace
+        removed = 0
+        blob_root = os.path.join(self.cache_dir, "blobs")
+        with self._lock:
+            referenced = {row[0] for row in self._db.execute("SELECT DISTINCT content_hash FROM entries")}
+            for subdir in os.listdir(blob_root):
+                for name in os.listdir(os.path.join(blob_root, subdir)):
+                    path = os.path.join(blob_root, subdir, name)
+                    if name.endswith(".gz") and name[:-3] not in referenced and os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+        return removed
+
+    def total_bytes(self):
+        # Each blob is counted once even if several URLs share it
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT content_hash, MAX(size) AS size FROM entries GROUP BY content_hash)"
+            ).fetchone()
+        return row[0]
+
+    def _reset_estimate(self, total):
+        with self._lock:
+            self._bytes_estimate, self._puts_since_check = total, 0
+
+    def evict_to_size(self, max_bytes=None, target_bytes=None):
+        """
+        Evicts least recently used entries once the cache exceeds max_bytes,
+        until it fits in target_bytes.
+
+        Parameters:
+        - max_bytes (int): Size limit (default: the cache's max_bytes).
+        - target_bytes (int): Size to shrink to once over the limit (default: max_bytes).
+
+        Returns:
+        - int: The number of entries evicted.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        target_bytes = max_bytes if target_bytes is None else min(target_bytes, max_bytes)
+        total = self.total_bytes()
+        if total <= max_bytes:
+            self._reset_estimate(total)
+            return 0
+
+        evicted = 0
+        dereferenced = []
+        with self._lock:
+            rows = self._db.execute("SELECT url, content_hash, size FROM entries ORDER BY accessed_at").fetchall()
+            references = {}
+            for _, content_hash, _ in rows:
+                references[content_hash] = references.get(content_hash, 0) + 1
+            for url, content_hash, size in rows:
+                if total <= target_bytes:
+                    break
+                self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                references[content_hash] -= 1
+                if references[content_hash] == 0:
+                    total -= size  # The blob is only freed once its last URL is gone
+                    dereferenced.append(content_hash)
+                evicted += 1
+            self._db.commit()
+            self._release_blobs(dereferenced)
+            self._bytes_estimate, self._puts_since_check = total, 0
+        logging.info("HTML cache evicted %d entries to fit %d bytes.", evicted, target_bytes)
+        return evicted
+
+    def prune(self, max_age=None):
+        """
+        Removes entries fetched more than max_age seconds ago (default: the TTL).
+
+        Returns:
+        - int: The number of entries removed.
+        """
+        cutoff = time.time() - (self.ttl if max_age is None else max_age)
+        with self._lock:
+            content_hashes = [row[0] for row in self._db.execute(
+                "SELECT DISTINCT content_hash FROM entries WHERE fetched_at < ?", (cutoff,))]
+            removed = self._db.execute("DELETE FROM entries WHERE fetched_at < ?", (cutoff,)).rowcount
+            self._db.commit()
+            self._release_blobs(content_hashes)
+        return removed
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            entries, blobs, oldest, newest = self._db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT content_hash), MIN(fetched_at), MAX(fetched_at) FROM entries"
+            ).fetchone()
+            expired = self._db.execute("SELECT COUNT(*) FROM entries WHERE fetched_at < ?", (now - self.ttl,)).fetchone()[0]
+        return {
+            "entries": entries,
+            "blobs": blobs,
+            "bytes": self.total_bytes(),
+            "expired": expired,
+            "oldest_age_hours": round((now - oldest) / 3600, 1) if oldest else None,
+            "newest_age_hours": round((now - newest) / 3600, 1) if newest else None,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def read_url_file(path):
+    """
+    Reads a URL file like nov2024-jan2014.txt, skipping blank lines and duplicates.
+    """
+    seen = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            url = line.strip()
+            if url and normalize_url(url) not in seen:
+                seen.add(normalize_url(url))
+                yield url
+
+
+def warm_cache(cache, url_file, browser='chrome', workers=8):
+    """
+    Fetches every URL in url_file that is not already fresh in the cache.
+
+    Returns:
+    - dict: The fetcher's per-path statistics.
+    """
+    from fetch import PageFetcher
+
+    fetcher = PageFetcher(browser, pool_size=workers, cache=cache)
+    urls = [url for url in read_url_file(url_file) if cache.get(url) is None]
+    logging.info("Warming HTML cache with %d URLs.", len(urls))
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in executor.map(fetcher.fetch, urls):
+                pass
+    finally:
+        fetcher.close()
+    logging.info("Cache warm finished: %s", fetcher.stats_summary())
+    return dict(fetcher.stats)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect, prune and warm the on-disk HTML cache.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("stats", help="Show entry count, size and age.")
+
+    show_parser = subparsers.add_parser("show", help="Show the cache entry for a URL.")
+    show_parser.add_argument("url")
+
+    prune_parser = subparsers.add_parser("prune", help="Remove expired entries and shrink to a size limit.")
+    prune_parser.add_argument("--max-age-days", type=float, default=None)
+    prune_parser.add_argument("--max-mb", type=float, default=None)
+
+    warm_parser = subparsers.add_parser("warm", help="Fetch every URL in a URL file into the cache.")
+    warm_parser.add_argument("url_file")
+    warm_parser.add_argument("--browser", default="chrome", choices=["chrome", "firefox"])
+    warm_parser.add_argument("--workers", type=int, default=8)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    cache = HtmlCache(args.cache_dir)
+    try:
+        if args.command == "stats":
+            for key, value in cache.stats().items():
+                print(f"{key}: {value}")
+        elif args.command == "show":
+            entry = cache.lookup(args.url)
+            if entry is None:
+                print("Not cached.")
+            else:
+                print(f"url: {normalize_url(args.url)}")
+                print(f"fresh: {entry['fresh']}")
+                print(f"etag: {entry['etag']}")
+                print(f"last_modified: {entry['last_modified']}")
+                print(f"fetched_at: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['fetched_at']))}")
+                print(f"html_chars: {len(entry['html'])}")
+        elif args.command == "prune":
+            max_age = args.max_age_days * 86400 if args.max_age_days is not None else None
+            print(f"Removed {cache.prune(max_age)} expired entries.")
+            if args.max_mb is not None:
+                print(f"Evicted {cache.evict_to_size(int(args.max_mb * 1024 ** 2))} entries.")
+            print(f"Removed {cache.remove_orphan_blobs()} orphaned blobs.")
+        elif args.command == "warm":
+            print(warm_cache(cache, args.url_file, args.browser, args.workers))
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
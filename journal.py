@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import threading
+import time
+
+JOURNAL_FILE = "scraped_content.jsonl"
+EXPORT_FILE = "scraped_content.json"
+
+# Fields written to the legacy JSON array export
+LEGACY_FIELDS = ("title", "summary", "content")
+
+
+class ResultJournal:
+    """
+    Append-only JSONL journal of scrape results. Each record is written as
+    soon as it completes, with its URL, fetch timestamp and status, and the
+    file is fsynced in batches so a crash loses at most a few records.
+
+    Parameters:
+    - path (str): The journal file.
+    - fsync_every (int): Fsync after this many records...
+    - fsync_interval (float): ...or after this many seconds, whichever comes first.
+    """
+
+    def __init__(self, path=JOURNAL_FILE, fsync_every=20, fsync_interval=2.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def append(self, url, record=None, status="ok", job_id=None):
+        """
+        Appends one result to the journal.
+
+        Parameters:
+        - url (str): The scraped URL.
+        - record (dict): The scraped fields (title, summary, content), if any.
+        - status (str): 'ok', 'empty' or 'error'.
+        - job_id (int): The crawl job that scraped it, if any, so the UI can show that job's results.
+        """
+        entry = {"url": url, "fetched_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "status": status}
+        if job_id is not None:
+            entry["job_id"] = job_id
+        if record:
+            entry.update(record)
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+
+        with self._lock:
+            self._file.write(line)
+            self._pending += 1
+            if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def sync(self):
+        """
+        Forces everything appended so far to disk.
+        """
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_journal(path=JOURNAL_FILE):
+    """
+    Streams the records of a journal file. A torn last line from a crash is skipped.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logging.warning("Skipping unreadable journal line %d in %s.", line_number, path)
+
+
+def completed_urls(path=JOURNAL_FILE):
+    """
+    Returns the set of URLs that were already scraped successfully, so a run can resume.
+    """
+    return {record["url"] for record in iter_journal(path) if record.get("status") == "ok"}
+
+
+def job_records(job_id, path=JOURNAL_FILE):
+    """
+    Returns the successful records a crawl job wrote to the journal, in the order they were scraped.
+    """
+    return [record for record in iter_journal(path) if record.get("job_id") == job_id and record.get("status") == "ok"]
+
+
+def export_json_array(journal_path=JOURNAL_FILE, export_path=EXPORT_FILE, fields=LEGACY_FIELDS):
+    """
+    Streams the successful journal records into the legacy pretty-printed JSON
+    array format, one record at a time. The output is the same as
+    json.dumps(records, ensure_ascii=False, indent=4).
+
+    Returns:
+    - int: The number of records exported.
+    """
+    count = 0
+    seen = set()
+    tmp_path = export_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        out.write("[")
+        for record in iter_journal(journal_path):
+            if record.get("status") != "ok" or record["url"] in seen:
+                continue
+            seen.add(record["url"])
+            item = json.dumps({field: record.get(field) for field in fields}, ensure_ascii=False, indent=4)
+            out.write(",\n" if count else "\n")
+            out.write("\n".join("    " + line for line in item.splitlines()))
+            count += 1
+        out.write("\n]" if count else "]")
+    os.replace(tmp_path, export_path)
+    return count
+
+
+def export_if_stale(journal_path=JOURNAL_FILE, export_path=EXPORT_FILE):
+    """
+    Re-exports the journal only if it changed since the last export.
+
+    Returns:
+    - bool: True if the export was rewritten.
+    """
+    if not os.path.exists(journal_path):
+        return False
+    if os.path.exists(export_path) and os.path.getmtime(export_path) >= os.path.getmtime(journal_path):
+        return False
+    export_json_array(journal_path, export_path)
+    return True
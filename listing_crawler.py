@@ -0,0 +1,145 @@
+import asyncio
+import logging
+
+from fetch import PageFetcher
+from extract import extract_listing, listing_page_url, months_reached_end, split_listing_url
+from scrape import LISTING_CACHE_TTL
+
+# Class names a listing page must contain to be used without a browser
+LISTING_MARKERS = ("entry-title", "dateblock")
+
+
+def parse_listing_page(html, end_month=None, end_year=None, base_url="http://en.kremlin.ru"):
+    """
+    Parses one listing page.
+
+    Returns:
+    - tuple: (list of article links, True if the end date was reached on this page).
+    """
+    links, months = extract_listing(html, base_url)
+    return links, months_reached_end(months, end_month, end_year)
+
+
+async def crawl_listing_pages(url, fetch_html, end_month=None, end_year=None, concurrency=4, window=None,
+                              max_pages=None, is_known=None, stop_event=None):
+    """
+    Crawls listing pages concurrently, prefetching a sliding window of upcoming
+    pages. Pages are consumed in order so the result matches the sequential
+    crawl in scrape_all_links: every page up to and including the first one
+    whose dateblock is at or before end_month/end_year.
+
+    Parameters:
+    - url (str): The first listing page.
+    - fetch_html (callable): Blocking function url -> html ("" if missing, None if failed); run in worker threads.
+    - end_month (int): The target end month (1 = January, ..., 12 = December).
+    - end_year (int): The target end year.
+    - concurrency (int): Maximum number of listing pages fetched at once; fetch_html is expected to pace
+      the requests to the host itself (PageFetcher does, through the politeness scheduler).
+    - window (int): How many pages ahead of the current one to prefetch (default 2 x concurrency).
+    - max_pages (int): Optional hard limit on the number of pages visited.
+    - is_known (callable): Optional links -> bool; for an incremental crawl, the crawl also stops at
+      the first page whose links are all already known (e.g. FrontierStore.all_known).
+    - stop_event: Optional threading event; once set, the crawl stops and returns the links collected so far.
+
+    Returns:
+    - list: A list of unique article links.
+    """
+    base, first_page = split_listing_url(url)
+    window = window or concurrency * 2
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = {}
+    cutoff = None  # Lowest page number known to contain the end date
+
+    async def fetch_page(page_number):
+        nonlocal cutoff
+        async with semaphore:
+            if cutoff is not None and page_number > cutoff:
+                return None
+            page_url = listing_page_url(base, page_number)
+            html = await asyncio.to_thread(fetch_html, page_url)
+            if html is None:
+                return None
+            if not html:
+                return [], False  # The page does not exist: past the last page
+            links, reached_end = await asyncio.to_thread(parse_listing_page, html, end_month, end_year)
+            if is_known and not reached_end and await asyncio.to_thread(is_known, links):
+                logging.info("Every transcript on listing page %d is already known.", page_number)
+                reached_end = True
+
+        # Cancel everything in flight past the boundary as soon as it is known
+        if reached_end and (cutoff is None or page_number < cutoff):
+            cutoff = page_number
+            for other_page, task in tasks.items():
+                if other_page > page_number:
+                    task.cancel()
+        return links, reached_end
+
+    all_links = set()
+    page_number = first_page
+    next_page = first_page
+    last_page = first_page + max_pages - 1 if max_pages else None
+
+    try:
+        while True:
+            # Keep the prefetch window full, never past a known cutoff
+            while next_page < page_number + window and (cutoff is None or next_page <= cutoff) \
+                    and (last_page is None or next_page <= last_page):
+                tasks[next_page] = asyncio.create_task(fetch_page(next_page))
+                next_page += 1
+
+            task = tasks.pop(page_number, None)
+            if task is None:
+                break
+            if stop_event and stop_event.is_set():
+                logging.info("Stopping the listing crawl as requested by user.")
+                task.cancel()
+                break
+            result = await task
+            if result is None:
+                logging.error("Failed to load listing page %d. Stopping.", page_number)
+                break
+
+            links, reached_end = result
+            all_links.update(links)
+            logging.info("Collected %d article links so far (page %d).", len(all_links), page_number)
+
+            if reached_end:
+                logging.info("End date or known transcripts reached on page %d. Stopping scraping.", page_number)
+                break
+            if not links:
+                logging.info("Listing page %d has no links. Stopping scraping.", page_number)
+                break
+            page_number += 1
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    return list(all_links)
+
+
+def crawl_all_links(url, browser='chrome', end_month=None, end_year=None, concurrency=4, window=None,
+                    driver_pool=None, cache=None, cache_ttl=LISTING_CACHE_TTL, proxy_pool=None, frontier=None,
+                    stop_event=None):
+    """
+    Concurrent replacement for scrape_all_links. Listing pages are fetched
+    over HTTP and fall back to a browser only when needed; with a cache,
+    pages fetched within cache_ttl are served from disk. With a
+    FrontierStore, the crawl is incremental: it stops at the first page of
+    already fetched transcripts.
+
+    Returns:
+    - list: A list of unique article links.
+    """
+    fetcher = PageFetcher(browser, driver_pool=driver_pool, pool_size=concurrency, expected_markers=LISTING_MARKERS,
+                          cache=cache, cache_ttl=cache_ttl, proxy_pool=proxy_pool)
+    try:
+        return asyncio.run(crawl_listing_pages(
+            url, lambda page_url: fetcher.fetch(page_url, stop_event), end_month=end_month, end_year=end_year,
+            concurrency=concurrency, window=window, is_known=frontier.all_known if frontier else None,
+            stop_event=stop_event,
+        ))
+    finally:
+        logging.info("Listing fetch statistics: %s", fetcher.stats_summary())
+        logging.info("Politeness state per host: %s", fetcher.scheduler.snapshot())
+        fetcher.close()
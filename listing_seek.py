@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from fetch import PageFetcher
+from listing_crawler import LISTING_MARKERS, crawl_all_links
+from extract import extract_listing, listing_page_url, split_listing_url
+from scrape import LISTING_CACHE_TTL
+
+PAGE_CACHE_FILE = "listing_page_cache.json"
+
+# A listing page that fails to load is retried this many times before the seek gives up
+PROBE_RETRIES = 3
+PROBE_RETRY_DELAY = 2
+
+
+class ProbeError(Exception):
+    """
+    A listing page could not be loaded, so its position relative to the target date is unknown.
+    """
+
+
+class ListingPageIndex:
+    """
+    Locates listing pages by date with O(log N) probes and remembers the
+    page -> (newest, oldest) month mapping on disk for later runs.
+
+    Listing pages are ordered newest first, and new transcripts only push
+    older ones onto higher page numbers. A cached page whose oldest month is
+    newer than a target therefore stays a valid lower bound; cached upper
+    bounds are re-probed before they are trusted.
+
+    Parameters:
+    - url (str): Any listing page URL of the section (page 1 or /page/N).
+    - fetch_html (callable): Blocking function url -> html, "" for a page that does not exist,
+      or None if it failed to load (like PageFetcher.fetch).
+    - cache_file (str): JSON file holding the page -> month mapping.
+    - retries (int): Attempts per page before a failed load raises ProbeError.
+    """
+
+    def __init__(self, url, fetch_html, cache_file=PAGE_CACHE_FILE, retries=PROBE_RETRIES):
+        self.base, _ = split_listing_url(url)
+        self.fetch_html = fetch_html
+        self.cache_file = cache_file
+        self.retries = retries
+        self.probes = 0
+        self._lock = threading.Lock()
+        self._cache = self._load_cache()
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                pages = json.load(f).get(self.base, {})
+            return {int(page): [tuple(months[0]), tuple(months[1])] for page, months in pages.items()}
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            logging.warning("Ignoring unreadable listing page cache %s: %s", self.cache_file, e)
+            return {}
+
+    def save(self):
+        data = {}
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except ValueError:
+                data = {}
+        with self._lock:
+            data[self.base] = {str(page): [list(months[0]), list(months[1])] for page, months in sorted(self._cache.items())}
+        tmp_file = self.cache_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_file, self.cache_file)
+
+    def probe(self, page_number):
+        """
+        Fetches a listing page and returns its (newest, oldest) months as
+        (year, month) tuples, or None if the page has no dated entries or
+        does not exist (past the last page). Raises ProbeError if the page
+        fails to load retries times, since guessing would send the search
+        to the wrong page.
+        """
+        html = None
+        for attempt in range(self.retries):
+            if attempt:
+                time.sleep(PROBE_RETRY_DELAY * 2 ** (attempt - 1))
+            self.probes += 1
+            html = self.fetch_html(listing_page_url(self.base, page_number))
+            if html is not None:
+                break
+            logging.warning("Could not load listing page %d (attempt %d of %d).", page_number, attempt + 1, self.retries)
+        if html is None:
+            raise ProbeError(f"Listing page {page_number} could not be loaded.")
+        if not html:
+            return None  # Not found: past the last page
+        links, months = extract_listing(html, self.base)
+        if not months:
+            if links:
+                logging.warning("Listing page %d has links but no dateblocks.", page_number)
+            return None
+        newest_oldest = [max(months), min(months)]
+        with self._lock:
+            self._cache[page_number] = newest_oldest
+        logging.info("Probed listing page %d: %s .. %s", page_number, newest_oldest[0], newest_oldest[1])
+        return newest_oldest
+
+    def _at_or_before(self, page_number, target):
+        # True if the page holds an entry at or before target; empty pages count as "older than everything".
+        # Pages that fail to load raise ProbeError instead of being mistaken for empty ones.
+        months = self.probe(page_number)
+        return months is None or months[1] <= target
+
+    def find_first_page(self, target):
+        """
+        Returns the smallest page number whose oldest entry is at or before target (year, month).
+        This is the page where the sequential crawl would stop for that month.
+        """
+        with self._lock:
+            cached = dict(self._cache)
+
+        # Cached pages newer than the target stay valid lower bounds
+        lo = max((page for page, months in cached.items() if months[1] > target), default=0)
+
+        # A cached upper bound must be confirmed, and gallop forward if it no longer holds
+        hi = min((page for page, months in cached.items() if months[1] <= target and page > lo), default=None)
+        step = 1
+        if hi is None or not self._at_or_before(hi, target):
+            lo = max(lo, hi or 0)
+            hi = lo + 1
+            while not self._at_or_before(hi, target):
+                lo = hi
+                hi += step
+                step *= 2
+
+        # Binary search for the first page that satisfies the predicate in (lo, hi]
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if self._at_or_before(mid, target):
+                hi = mid
+            else:
+                lo = mid
+        return hi
+
+
+def seek_page_range(url, start_month, start_year, end_month, end_year, fetch_html, cache_file=PAGE_CACHE_FILE):
+    """
+    Finds the listing pages that cover the [end, start] date window.
+
+    Parameters:
+    - url (str): Any listing page URL of the section.
+    - start_month, start_year (int): The newest month to include.
+    - end_month, end_year (int): The oldest month to include.
+    - fetch_html (callable): Blocking function url -> html, "" or None (see ListingPageIndex).
+    - cache_file (str): JSON file holding the page -> month mapping.
+
+    Returns:
+    - tuple: (first page, last page) to crawl.
+
+    Raises:
+    - ProbeError: If a listing page the search depends on cannot be loaded.
+    """
+    index = ListingPageIndex(url, fetch_html, cache_file)
+    # Only pages that loaded are cached, so the probes made before a ProbeError are still worth saving
+    try:
+        first_page = index.find_first_page((start_year, start_month))
+        last_page = index.find_first_page((end_year, end_month))
+    finally:
+        index.save()
+    logging.info("Seek located pages %d..%d in %d probes.", first_page, last_page, index.probes)
+    return first_page, last_page
+
+
+def seek_all_links(url, browser='chrome', start_month=None, start_year=None, end_month=None, end_year=None,
+                   concurrency=4, cache_file=PAGE_CACHE_FILE, driver_pool=None, cache=None, proxy_pool=None,
+                   stop_event=None):
+    """
+    Seek mode for scrape_all_links: locates the page range for the date
+    window by binary search, then crawls only that range.
+
+    Returns:
+    - list: A list of unique article links.
+    """
+    fetcher = PageFetcher(browser, driver_pool=driver_pool, pool_size=concurrency, expected_markers=LISTING_MARKERS,
+                          cache=cache, cache_ttl=LISTING_CACHE_TTL, proxy_pool=proxy_pool)
+    try:
+        first_page, _ = seek_page_range(url, start_month, start_year, end_month, end_year, fetcher.fetch, cache_file)
+    finally:
+        logging.info("Seek fetch statistics: %s", fetcher.stats_summary())
+        fetcher.close()
+
+    base, _ = split_listing_url(url)
+    return crawl_all_links(listing_page_url(base, first_page), browser=browser, end_month=end_month, end_year=end_year,
+                           concurrency=concurrency, driver_pool=driver_pool, cache=cache, proxy_pool=proxy_pool,
+                           stop_event=stop_event)
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+LLM_CACHE_FILE = "llm_cache.sqlite3"
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_MAX_AGE = 90 * 24 * 3600
+
+
+def cache_key(model, system_prompt, prompt_template, parse_description, chunk):
+    """
+    Hashes everything that determines a completion into one cache key.
+    """
+    payload = json.dumps([model, system_prompt, prompt_template, parse_description, chunk], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed cache of LLM completions keyed by cache_key(). Entries
+    older than max_age are dropped, and the least recently used ones are
+    evicted once there are more than max_entries.
+
+    Parameters:
+    - path (str): The SQLite database file.
+    - max_entries (int): Maximum number of cached completions.
+    - max_age (float): Maximum age of a completion in seconds.
+    """
+
+    def __init__(self, path=LLM_CACHE_FILE, max_entries=DEFAULT_MAX_ENTRIES, max_age=DEFAULT_MAX_AGE):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._puts_since_evict = 0
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed_at)")
+        self._db.commit()
+
+    def get_many(self, keys):
+        """
+        Looks up many keys in one pass.
+
+        Returns:
+        - dict: key -> cached response, for the keys that were found and not expired.
+        """
+        found = {}
+        now = time.time()
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, response FROM completions WHERE created_at >= ? AND key IN ({','.join('?' * len(batch))})",
+                    [now - self.max_age, *batch],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                self._db.executemany("UPDATE completions SET accessed_at = ? WHERE key = ?", [(now, key) for key in found])
+                self._db.commit()
+
+        hits = sum(1 for key in keys if key in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items, model):
+        """
+        Stores (key, response) pairs. Failed (None) responses are not cached.
+        """
+        now = time.time()
+        rows = [(key, model, response, now, now) for key, response in items if response is not None]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+            self._puts_since_evict += len(rows)
+            evict_now = self._puts_since_evict >= 100
+        if evict_now:
+            self.evict()
+
+    def put(self, key, response, model):
+        self.put_many([(key, response)], model)
+
+    def evict(self):
+        """
+        Drops expired completions, then the least recently used ones beyond max_entries.
+
+        Returns:
+        - int: The number of completions removed.
+        """
+        with self._lock:
+            self._puts_since_evict = 0
+            removed = self._db.execute("DELETE FROM completions WHERE created_at < ?", (time.time() - self.max_age,)).rowcount
+            count = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+            if count > self.max_entries:
+                removed += self._db.execute(
+                    "DELETE FROM completions WHERE key IN (SELECT key FROM completions ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,),
+                ).rowcount
+            self._db.commit()
+        if removed:
+            logging.info("LLM cache evicted %d completions.", removed)
+        return removed
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
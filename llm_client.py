@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+import metrics
+
+DEFAULT_MODEL = "llama3-8b-8192"
+
+# Status codes worth retrying: rate limited, or a transient server error
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Full prompts and completions are only logged when this is set; on large runs they cost real time and disk
+LOG_LLM_PAYLOADS = os.getenv("LOG_LLM_PAYLOADS", "").lower() in ("1", "true", "yes")
+
+
+class LLMError(Exception):
+    """
+    Error returned by an LLM backend, with the HTTP status and Retry-After if known.
+    """
+
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """
+    Async token bucket that refills continuously at capacity per minute.
+
+    Parameters:
+    - capacity_per_minute (float): Tokens (or requests) allowed per minute.
+    """
+
+    def __init__(self, capacity_per_minute):
+        self.capacity = float(capacity_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        # A request bigger than the bucket is allowed through once the bucket is full
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def refund(self, amount):
+        # Give back tokens that were reserved but not used
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class GroqBackend:
+    """
+    Backend that sends chat completions through the Groq SDK client.
+
+    Parameters:
+    - client: A groq.Groq client.
+    - model (str): The model name.
+    """
+
+    def __init__(self, client, model=DEFAULT_MODEL):
+        # The dispatcher does the retrying, so turn off the SDK's own retries
+        self.client = client.with_options(max_retries=0) if hasattr(client, "with_options") else client
+        self.model = model
+        self.host = urlsplit(str(getattr(client, "base_url", "https://api.groq.com"))).hostname or "api.groq.com"
+
+    def _complete(self, messages, max_tokens):
+        try:
+            options = {"max_tokens": max_tokens} if max_tokens else {}
+            response = self.client.chat.completions.create(messages=messages, model=self.model, **options)
+        except Exception as e:
+            status_code = getattr(e, "status_code", None)
+            headers = getattr(getattr(e, "response", None), "headers", None) or {}
+            raise LLMError(str(e), status_code, headers.get("retry-after")) from e
+
+        if not response.choices:
+            logging.warning("No choices returned in the API response.")
+            return None, 0
+        usage = getattr(response, "usage", None)
+        return response.choices[0].message.content, getattr(usage, "total_tokens", 0) or 0
+
+    async def complete(self, messages, max_tokens=None):
+        """
+        Returns (completion text or None, total tokens used).
+        """
+        return await asyncio.to_thread(self._complete, messages, max_tokens)
+
+
+class OpenAICompatibleBackend:
+    """
+    Backend for any OpenAI-compatible /chat/completions endpoint, e.g. a local
+    fake server in tests or Groq's https://api.groq.com/openai/v1.
+
+    Parameters:
+    - base_url (str): The API base URL, without /chat/completions.
+    - model (str): The model name.
+    - api_key (str): Optional bearer token.
+    - timeout (float): Request timeout in seconds.
+    """
+
+    def __init__(self, base_url, model=DEFAULT_MODEL, api_key=None, timeout=60):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.host = urlsplit(base_url).hostname or ""
+        self.model = model
+        self.timeout = timeout
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def _complete(self, messages, max_tokens):
+        try:
+            response = self.session.post(
+                self.url,
+                json={"model": self.model, "messages": messages, **({"max_tokens": max_tokens} if max_tokens else {})},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise LLMError(str(e)) from e
+
+        if response.status_code != 200:
+            raise LLMError(f"HTTP {response.status_code}: {response.text[:200]}", response.status_code,
+                           response.headers.get("Retry-After"))
+
+        data = response.json()
+        if not data.get("choices"):
+            logging.warning("No choices returned in the API response.")
+            return None, 0
+        return data["choices"][0]["message"]["content"], data.get("usage", {}).get("total_tokens", 0)
+
+    async def complete(self, messages, max_tokens=None):
+        """
+        Returns (completion text or None, total tokens used).
+        """
+        return await asyncio.to_thread(self._complete, messages, max_tokens)
+
+
+class LLMDispatcher:
+    """
+    Sends many chat requests concurrently while staying under the provider's
+    requests-per-minute and tokens-per-minute limits. Rate-limited (429) and
+    5xx responses are retried with jittered exponential backoff, honoring
+    Retry-After when the server sends it.
+
+    Parameters:
+    - backend: Object with async complete(messages, max_tokens) -> (text, tokens).
+    - concurrency (int): Maximum number of requests in flight.
+    - requests_per_minute (int): RPM limit.
+    - tokens_per_minute (int): TPM limit (prompt + completion tokens).
+    - max_tokens (int): Optional completion token limit per request.
+    - expected_completion_tokens (int): Completion size reserved in the TPM bucket when max_tokens is unset.
+    - max_retries (int): Retries per request before giving up.
+    - base_delay (float): First backoff delay in seconds.
+    - max_delay (float): Backoff ceiling in seconds.
+    - log_payloads (bool): Log every prompt and completion in full (default: the LOG_LLM_PAYLOADS environment variable).
+    """
+
+    def __init__(self, backend, concurrency=4, requests_per_minute=30, tokens_per_minute=30000, max_tokens=None,
+                 expected_completion_tokens=1024, max_retries=5, base_delay=1.0, max_delay=60.0,
+                 log_payloads=LOG_LLM_PAYLOADS):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_tokens = max_tokens
+        self.expected_completion_tokens = expected_completion_tokens
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.log_payloads = log_payloads
+        self.host = getattr(backend, "host", "")
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Full jitter: uniform between 0 and the exponential ceiling
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def _send(self, index, messages, semaphore, request_bucket, token_bucket):
+        prompt_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+        reserved = prompt_tokens + (self.max_tokens or self.expected_completion_tokens)
+
+        if self.log_payloads:
+            logging.info("LLM request %d: %s", index, messages)
+
+        for attempt in range(self.max_retries + 1):
+            await request_bucket.acquire(1)
+            await token_bucket.acquire(reserved)
+            async with semaphore:
+                # Timed inside the rate limiters, so only the call itself counts as LLM time
+                start = time.perf_counter()
+                try:
+                    text, used_tokens = await self.backend.complete(messages, self.max_tokens)
+                    metrics.observe("llm", time.perf_counter() - start, self.host, "ok" if text is not None else "empty")
+                    metrics.count("llm_tokens_total", used_tokens or 0, host=self.host)
+                    if self.log_payloads:
+                        logging.info("LLM response %d (%d tokens): %s", index, used_tokens or 0, text)
+                    if used_tokens and used_tokens < reserved:
+                        token_bucket.refund(reserved - used_tokens)
+                    return text
+                except LLMError as e:
+                    metrics.observe("llm", time.perf_counter() - start, self.host,
+                                    f"http_{e.status_code}" if e.status_code else "error")
+                    if e.status_code is not None and e.status_code not in RETRYABLE_STATUS:
+                        logging.error(f"Error: {e}")
+                        return None
+                    error = e
+
+            if attempt == self.max_retries:
+                break
+            metrics.count("retries_total", stage="llm", host=self.host)
+            delay = self._backoff(attempt, error.retry_after)
+            logging.warning("Chunk %d failed (%s), retrying in %.1f seconds.", index, error.status_code or error, delay)
+            await asyncio.sleep(delay)
+
+        logging.error(f"Error: chunk {index} failed after {self.max_retries + 1} attempts: {error}")
+        return None
+
+    async def run(self, message_lists):
+        """
+        Sends every request and returns the completions in input order
+        (None for requests that failed).
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        request_bucket = TokenBucket(self.requests_per_minute)
+        token_bucket = TokenBucket(self.tokens_per_minute)
+        return await asyncio.gather(*(
+            self._send(index, messages, semaphore, request_bucket, token_bucket)
+            for index, messages in enumerate(message_lists)
+        ))
+
+    def run_sync(self, message_lists):
+        return asyncio.run(self.run(message_lists))
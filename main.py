@@ -1,18 +1,42 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import json
 import logging
+import os
 import time
 import streamlit as st
-from scrape import scrape_all_links, scrape_individual_page, split_dom_content
-from parse import parse_with_groq
+import metrics
+from chunker import chunk_text
+from prefilter import filter_relevant
+from parse import get_response_cache, parse_with_groq
+from politeness import MAX_REQUESTS_PER_SECOND
+from search_index import TranscriptIndex
+from corpus_store import CORPUS_DIR, convert_files
+from crawl_jobs import JobService
+from journal import EXPORT_FILE, JOURNAL_FILE, export_if_stale, job_records
 from datetime import datetime
-import threading
 
 # Set the title of the Streamlit app
 st.title("AI Web Scraper")
 
-# Event for controlling scraping state
-stop_event = threading.Event()
+# Crawls run as background jobs in a separate process; the service outlives script reruns
+@st.cache_resource
+def get_job_service():
+    return JobService()
+
+job_service = get_job_service()
+
+# This process's metrics (LLM calls, chunking) go to disk for `metrics.py serve`; METRICS_PORT also serves them here
+@st.cache_resource
+def start_metrics_export():
+    metrics.start_snapshot_writer("ui")
+    port = os.getenv("METRICS_PORT")
+    return metrics.start_metrics_server(int(port)) if port else None
+
+start_metrics_export()
+
+# How often the job panel polls the job store while the page is open
+JOB_POLL_INTERVAL = 2
+
+# Transcripts shown per job in the results view; the JSON download has all of them
+RESULTS_LIMIT = 100
 
 # Option to input a URL or upload a .txt file
 option = st.selectbox("Choose an option:", ["Scrape from URL", "Upload .txt File"])
@@ -25,99 +49,82 @@ if option == "Scrape from URL":
     end_month = st.selectbox("End Month:", range(1, 13), format_func=lambda x: datetime(1, x, 1).strftime('%B'))
     end_year = st.number_input("End Year:", min_value=2000, max_value=datetime.now().year, value=datetime.now().year)
 
+    # Seek mode jumps straight to the listing pages for a [start, end] window instead of paging from the newest
+    seek_mode = st.checkbox("Seek to a date window (skip newer listing pages)")
+
+    # Incremental mode stops at the first listing page of known transcripts and only scrapes new ones
+    incremental_mode = st.checkbox("Incremental (only transcripts published since the last run)")
+    if seek_mode:
+        start_month = st.selectbox("Start Month:", range(1, 13), index=datetime.now().month - 1, format_func=lambda x: datetime(1, x, 1).strftime('%B'))
+        start_year = st.number_input("Start Year:", min_value=2000, max_value=datetime.now().year, value=datetime.now().year)
+
+# Ceiling for the per-host politeness scheduler; below it, the request rate adapts to how the server responds
+max_rate = st.number_input("Max requests per second per host:", min_value=0.1, max_value=20.0,
+                           value=MAX_REQUESTS_PER_SECOND, step=0.5)
+
+# Optional proxy rotation: HTTP requests rotate proxies per request, browsers per driver
+use_proxies = st.checkbox("Route requests through proxies")
+proxy_file = None
+if use_proxies:
+    proxy_file = st.text_input("Proxy list file (one host:port per line; empty = free-proxy-list.net):")
+
+# Fallback browsers run headless without images, CSS or fonts, and only contact the site being scraped
+fast_render = st.checkbox("Fast-render fallback browsers (headless, no images or CSS, first-party hosts only)")
+
+# Settings shared by every crawl job submitted from this page
+job_settings = {
+    "browser": browser_choice.lower(),
+    "fast_render": fast_render,
+    "max_rate": max_rate,
+    "use_proxies": use_proxies,
+    "proxy_file": proxy_file or None,
+}
+
 # Initialize session state for storing data
 if 'dom_content' not in st.session_state:
     st.session_state.dom_content = ""
 
-if 'scraped_data' not in st.session_state:
-    st.session_state.scraped_data = []
+# Full-text index of every scraped transcript, filled by the crawl jobs
+if 'search_index' not in st.session_state:
+    st.session_state.search_index = TranscriptIndex()
 
-# Function to check if scraping should continue
-def should_continue():
-    return not stop_event.is_set()
-
-# Stop Scraping button
+# Stop Scraping button: flags every queued and running job; the runner stops them within a second
 if st.button("Stop Scraping"):
-    stop_event.set()  # Signal to stop scraping
-
-# Save progress after stopping or completion
-if stop_event.is_set() or st.session_state.scraped_data:
-    json_data = json.dumps(st.session_state.scraped_data, ensure_ascii=False, indent=4)
-    with open("scraped_content.json", "w", encoding='utf-8') as f:
-        f.write(json_data)
+    job_service.cancel_all()
     st.success("Scraping stopped. Progress saved.")
 
+# Results are journaled as they arrive, so the export only needs rewriting when the journal changed
+export_if_stale(JOURNAL_FILE, EXPORT_FILE)
+
 # Download JSON button (enabled only when there is scraped data)
-if "scraped_data" in st.session_state and len(st.session_state.scraped_data) > 0:
-    json_data = json.dumps(st.session_state.scraped_data, ensure_ascii=False, indent=4)
-    st.download_button(
-        label="Download Scraped Content as JSON",
-        data=json_data.encode('utf-8'),
-        file_name="scraped_content.json",
-        mime="application/json"
-    )
+if os.path.exists(EXPORT_FILE):
+    with open(EXPORT_FILE, "rb") as export_file:
+        st.download_button(
+            label="Download Scraped Content as JSON",
+            data=export_file,
+            file_name="scraped_content.json",
+            mime="application/json"
+        )
+
+# Compact Parquet copy of the journal for analysis (zstd, one partition per publication year)
+if os.path.exists(JOURNAL_FILE) and st.button("Save as Parquet corpus"):
+    with st.spinner("Writing Parquet corpus..."):
+        written = convert_files([JOURNAL_FILE], CORPUS_DIR)
+    st.success(f"Wrote {written} transcripts to {CORPUS_DIR}/.")
 
 # Section for scraping from a URL
 if option == "Scrape from URL":
     url = st.text_input("Enter a website URL:", value="http://en.kremlin.ru/events/president/transcripts")  # Default URL
 
-    # Scrape Site button for URL input
+    # Scrape Site button for URL input: queues a crawl job and returns immediately
     if st.button("Scrape Site"):
         if url:  # Check if a URL was provided
-            stop_event.clear()  # Reset stop event before starting new scrape
-            st.write(f"Scraping the website using {browser_choice}...")
-            st.write("Extracting links to individual transcripts...")
-
-            # Scrape links up to the specified month and year
-            article_links = scrape_all_links(url, browser=browser_choice.lower(), end_month=end_month, end_year=end_year)
-
-            logging.info("Article links found: %s", article_links)
-
-            if article_links:  # Check if any links were found
-                st.write(f"Found {len(article_links)} transcript links.")
-                st.session_state.article_links = article_links
-
-                # Display the list of links in a collapsible expander
-                with st.expander("View Transcript Links"):
-                    for link in article_links:
-                        st.write(link)
-
-                # Use ThreadPoolExecutor for concurrent scraping of individual pages
-                with ThreadPoolExecutor(max_workers=3) as executor:
-                    future_to_link = {executor.submit(scrape_individual_page, link, browser_choice.lower()): link for link in article_links}
-
-                    for future in as_completed(future_to_link):
-                        if stop_event.is_set():
-                            logging.info("Stopping scraping as requested by user.")
-                            break  # Exit if scraping is stopped
-
-                        link = future_to_link[future]
-                        try:
-                            transcript_data = future.result()
-                            title = transcript_data.get("title", "No Title")
-                            summary = transcript_data.get("summary", "No Summary")
-                            content = transcript_data.get("content", "No Content")
-
-                            # Append the transcript's data as a dictionary to the scraped_data list
-                            st.session_state.scraped_data.append({
-                                "title": title,
-                                "summary": summary,
-                                "content": content
-                            })
-
-                            # Display the cleaned transcript in an expander
-                            with st.expander(f"View Transcript Content - {title}"):
-                                st.subheader(f"Transcript: {title}")
-                                st.write(f"**Summary:** {summary}")
-                                st.text_area("Transcript", content, height=300)
-
-                        except Exception as e:
-                            logging.error(f"Error scraping {link}: {e}")
-                            st.write(f"Error scraping {link}: {e}")
-
-                logging.info("Scraping session completed. Total links collected: %d", len(st.session_state.scraped_data))
-            else:
-                st.warning("No valid URLs found from the provided base URL.")
+            params = {**job_settings, "url": url, "end_month": end_month, "end_year": int(end_year),
+                      "seek": seek_mode, "incremental": incremental_mode}
+            if seek_mode:
+                params.update(start_month=start_month, start_year=int(start_year))
+            job_id = job_service.submit(params)
+            st.success(f"Queued crawl job #{job_id} using {browser_choice}.")
         else:
             st.warning("Please enter a valid URL.")
 
@@ -125,63 +132,127 @@ if option == "Scrape from URL":
 elif option == "Upload .txt File":
     uploaded_file = st.file_uploader("Upload a .txt file with URLs:", type=["txt"])
 
-    # Scrape Site button for file upload input
     if uploaded_file is not None:
         # Read the uploaded file and extract URLs
         urls = uploaded_file.read().decode('utf-8').splitlines()
         urls = [url.strip() for url in urls if url.strip()]  # Clean the URLs
 
-        logging.info("URLs loaded from file: %s", urls)
-
         if urls:  # Check if any links were found
-            stop_event.clear()  # Reset stop event before starting new scrape
-
             st.write(f"Found {len(urls)} transcript links.")
-            st.session_state.article_links = urls
 
             # Display the list of links in a collapsible expander
             with st.expander("View Transcript Links"):
                 for link in urls:
                     st.write(link)
 
-            # Use ThreadPoolExecutor for concurrent scraping of individual pages
-            with ThreadPoolExecutor(max_workers=3) as executor:
-                future_to_link = {
-                    executor.submit(scrape_individual_page, link, browser_choice.lower(), stop_event): link 
-                    for link in urls 
-                }
-
-                for future in as_completed(future_to_link):
-                    if stop_event.is_set():
-                        logging.info("Stopping scraping as requested by user.")
-                        break  # Exit the loop if scraping is stopped
-
-                    link = future_to_link[future]
-                    try:
-                        transcript_data = future.result()
-                        if not transcript_data:
-                            continue
-
-                        # Append the transcript's data to the scraped_data list
-                        st.session_state.scraped_data.append(transcript_data)
-
-                        # Display the cleaned transcript in an expander
-                        with st.expander(f"View Transcript Content - {transcript_data['title']}"):
-                            st.subheader(f"Transcript: {transcript_data['title']}")
-                            st.write(f"**Summary:** {transcript_data['summary']}")
-                            st.text_area("Transcript", transcript_data['content'], height=300)
-
-                    except Exception as e:
-                        logging.error(f"Error scraping {link}: {e}")
-                        st.write(f"Error scraping {link}: {e}")
-
-            logging.info("Scraping session completed. Total links collected: %d", len(st.session_state.scraped_data))
+            if st.button("Scrape Links"):
+                job_id = job_service.submit({**job_settings, "links": urls})
+                st.success(f"Queued crawl job #{job_id} for {len(urls)} links.")
         else:
             st.warning("No valid URLs found in the uploaded file.")
-else:
-    if option == "Upload .txt File":
+    else:
         st.warning("Please upload a .txt file containing URLs.")
 
+def job_target(job):
+    return job["params"].get("url") or f"{len(job['params'].get('links', []))} uploaded links"
+
+# Crawl jobs panel; only this fragment reruns on the polling interval, so the rest of the page stays put
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def show_jobs():
+    jobs = job_service.jobs(limit=10)
+    if not jobs:
+        return
+    st.subheader("Crawl Jobs")
+    for job in jobs:
+        progress = job["progress"]
+        st.write(f"**#{job['id']}** {job['status']} - {job_target(job)}")
+        if job["status"] == "running":
+            pending = progress.get("pending", 0)
+            st.progress(min(progress.get("processed", 0) / pending, 1.0) if pending else 0.0,
+                        text=f"{progress.get('stage', 'starting')}: {progress.get('processed', 0)} of {pending} "
+                             f"({progress.get('ok', 0)} ok, {progress.get('empty', 0)} empty, "
+                             f"{progress.get('errors', 0)} errors) in {progress.get('elapsed', 0):.0f} s")
+            for title in progress.get("recent", []):
+                st.caption(title)
+        elif progress:
+            st.caption(f"{progress.get('ok', 0)} scraped, {progress.get('empty', 0)} empty, "
+                       f"{progress.get('errors', 0)} errors of {progress.get('links', 0)} links. {progress.get('fetch', '')}")
+        if job["error"]:
+            st.error(job["error"])
+        if job["status"] in ("queued", "running") and not job["cancel_requested"]:
+            if st.button("Cancel", key=f"cancel-{job['id']}"):
+                job_service.cancel(job["id"])
+
+show_jobs()
+
+# The journal is only re-read when it changed since the last time this job's results were shown
+@st.cache_data(max_entries=8)
+def load_job_results(job_id, journal_mtime):
+    return job_records(job_id, JOURNAL_FILE)
+
+# Scraped transcripts of a job, read back from the journal; the Refresh button reruns only this fragment
+@st.fragment
+def show_results():
+    jobs = [job for job in job_service.jobs(limit=10) if job["status"] != "queued"]
+    if not jobs or not os.path.exists(JOURNAL_FILE):
+        return
+    st.subheader("Scraped Transcripts")
+    labels = {job["id"]: f"#{job['id']} {job['status']} - {job_target(job)}" for job in jobs}
+    job_id = st.selectbox("Crawl job:", list(labels), format_func=labels.get)
+    st.button("Refresh results")
+    records = load_job_results(job_id, os.path.getmtime(JOURNAL_FILE))
+    if len(records) > RESULTS_LIMIT:
+        st.caption(f"Showing the latest {RESULTS_LIMIT} of {len(records)} transcripts; download the JSON for all of them.")
+    elif not records:
+        st.caption("No transcripts scraped by this job yet.")
+
+    # Display each cleaned transcript in an expander
+    # Widgets are keyed by the record's position in the job, which stays unique when a URL repeats
+    for index, record in reversed(list(enumerate(records))[-RESULTS_LIMIT:]):
+        title = record.get("title", "No Title")
+        with st.expander(f"View Transcript Content - {title}"):
+            st.subheader(f"Transcript: {title}")
+            st.write(f"**Summary:** {record.get('summary', 'No Summary')}")
+            st.text_area("Transcript", record.get("content", "No Content"), height=300, key=f"transcript-{job_id}-{index}")
+
+show_results()
+
+# Per-stage timings merged from this page and the background processes (crawl runner, queue workers)
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def show_metrics(by_host):
+    snapshot = metrics.load_snapshot()
+    rows = metrics.stage_summary(snapshot, by_host=by_host)
+    if not rows:
+        st.caption("No metrics recorded yet.")
+        return
+    st.dataframe(rows, hide_index=True)
+    totals = {}
+    for counter in snapshot["counters"]:
+        totals[counter["name"]] = totals.get(counter["name"], 0) + counter["value"]
+    st.caption(", ".join(f"{name}: {value}" for name, value in sorted(totals.items())))
+
+with st.expander("Pipeline Metrics"):
+    metrics_by_host = st.checkbox("Break down by host")
+    show_metrics(metrics_by_host)
+
+# Search section over every transcript scraped so far
+with st.expander(f"Search Transcripts ({st.session_state.search_index.count()} indexed)"):
+    search_query = st.text_input("Search for:")
+    search_phrase = st.checkbox("Exact phrase")
+    search_dates = st.date_input("Published between:", value=(), min_value=datetime(2000, 1, 1))
+    search_limit = st.number_input("Maximum results:", min_value=1, max_value=500, value=20)
+
+    if search_query:
+        date_from = search_dates[0] if len(search_dates) > 0 else None
+        date_to = search_dates[1] if len(search_dates) > 1 else None
+        results = st.session_state.search_index.search(search_query, phrase=search_phrase, date_from=date_from,
+                                                       date_to=date_to, limit=search_limit)
+        st.write(f"{len(results)} results.")
+        for result in results:
+            st.markdown(f"**{result['title']}** ({result['published_at'] or 'undated'})  \n{result['snippet']}")
+            if result['url']:
+                st.caption(result['url'])
+
 # Parsing section (remains unchanged)
 if "saved_dom_content" in st.session_state and st.session_state.saved_dom_content:
     parse_description = st.text_area(
@@ -189,10 +260,24 @@ if "saved_dom_content" in st.session_state and st.session_state.saved_dom_conten
         value="Analyze speeches:"
     )
 
+    # Skip the completions cache and always ask the model again
+    bypass_llm_cache = st.checkbox("Bypass LLM response cache")
+
+    # Send only the paragraphs that match the parse description
+    use_prefilter = st.checkbox("Only send paragraphs relevant to the description")
+    if use_prefilter:
+        prefilter_top_k = st.number_input("Maximum paragraphs to send:", min_value=1, value=50)
+
     if st.button("Parse Content"):
         if parse_description:
             logging.info("Parsing content")
-            dom_chunks = split_dom_content(st.session_state.saved_dom_content)
+            dom_content = st.session_state.saved_dom_content
+            if use_prefilter:
+                dom_content, prefilter_report = filter_relevant(dom_content, parse_description, top_k=prefilter_top_k)
+                st.caption(f"Relevance prefilter kept {prefilter_report['kept_paragraphs']} of "
+                           f"{prefilter_report['paragraphs']} paragraphs, saving {prefilter_report['saved_tokens']} tokens.")
+            dom_chunks = chunk_text(dom_content)
             if dom_chunks:
-                result = parse_with_groq(dom_chunks, parse_description)
-                st.write(result)
\ No newline at end of file
+                result = parse_with_groq(dom_chunks, parse_description, bypass_cache=bypass_llm_cache)
+                st.write(result)
+                st.caption(f"LLM cache: {get_response_cache().stats()}")
\ No newline at end of file
@@ -0,0 +1,459 @@
+import argparse
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+METRICS_DIR = "metrics"
+METRICS_PORT = 9108
+SNAPSHOT_INTERVAL = 5.0
+# Live processes rewrite their snapshot every SNAPSHOT_INTERVAL; a file this much older belongs to one that exited
+STALE_AFTER = 120.0
+# Totals of exited processes, so the directory holds one file per live process plus this one
+CUMULATIVE_FILE = "cumulative.json"
+
+# Latency buckets in seconds, from cache-speed parses to slow LLM calls
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "stage_seconds": "Time spent per pipeline stage, by host and outcome.",
+    "retries_total": "Retried attempts, by stage and host.",
+    "fetch_cache_total": "Pages served from the HTML cache, by host and result.",
+    "http_status_total": "HTTP responses received, by host and status code.",
+    "chunks_total": "Text chunks produced for the LLM.",
+    "llm_tokens_total": "Tokens used by LLM calls, by host.",
+}
+
+
+def host_of(url):
+    return (urlsplit(url).hostname or "") if url else ""
+
+
+def _key(name, labels):
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters and latency histograms, keyed by metric name and
+    labels (stage, host, outcome...). Cheap enough to call on every page and
+    LLM request.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}  # key -> [count per bucket..., count above the last bucket, sum]
+
+    def inc(self, name, amount=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += value
+
+    def snapshot(self):
+        """
+        Returns:
+        - dict: JSON-serializable copy of every counter and histogram.
+        """
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in self._counters.items()]
+            histograms = [{"name": name, "labels": dict(labels), "counts": histogram[:-1], "sum": histogram[-1]}
+                          for (name, labels), histogram in self._histograms.items()]
+        return {"pid": os.getpid(), "updated_at": time.time(), "buckets": list(self.buckets),
+                "counters": counters, "histograms": histograms}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# Registry of this process; every instrumented module records into it
+REGISTRY = MetricsRegistry()
+
+
+def count(name, amount=1, **labels):
+    REGISTRY.inc(name, amount, **labels)
+
+
+def observe(stage, seconds, host="", outcome="ok"):
+    REGISTRY.observe("stage_seconds", seconds, stage=stage, host=host, outcome=outcome)
+
+
+class Span:
+    """
+    A stage being timed; set outcome before it ends to record something other than 'ok'.
+    """
+
+    def __init__(self, stage, host):
+        self.stage = stage
+        self.host = host
+        self.outcome = "ok"
+        self.start = time.perf_counter()
+
+
+@contextmanager
+def timer(stage, host=""):
+    """
+    Times the enclosed block as one observation of stage; an exception records
+    outcome 'error' unless the block already set a more specific one.
+    """
+    span = Span(stage, host)
+    try:
+        yield span
+    except BaseException:
+        if span.outcome == "ok":
+            span.outcome = "error"
+        raise
+    finally:
+        observe(stage, time.perf_counter() - span.start, span.host, span.outcome)
+
+
+def timed(stage):
+    """
+    Decorator form of timer() for functions that are a stage on their own.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def merge_snapshots(snapshots):
+    """
+    Adds up snapshots from several processes (the UI, the crawl job runner, queue workers).
+    """
+    counters, histograms = {}, {}
+    buckets = list(BUCKETS)
+    for snapshot in snapshots:
+        if snapshot.get("buckets") != buckets:
+            logging.warning("Skipping metrics snapshot of pid %s with different buckets.", snapshot.get("pid"))
+            continue
+        for counter in snapshot["counters"]:
+            key = _key(counter["name"], counter["labels"])
+            counters[key] = counters.get(key, 0) + counter["value"]
+        for histogram in snapshot["histograms"]:
+            key = _key(histogram["name"], histogram["labels"])
+            merged = histograms.setdefault(key, [0] * len(histogram["counts"]) + [0.0])
+            for index, value in enumerate(histogram["counts"]):
+                merged[index] += value
+            merged[-1] += histogram["sum"]
+    return {
+        "pids": [snapshot["pid"] for snapshot in snapshots if snapshot.get("pid")], "updated_at": time.time(), "buckets": buckets,
+        "counters": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in counters.items()],
+        "histograms": [{"name": name, "labels": dict(labels), "counts": merged[:-1], "sum": merged[-1]}
+                       for (name, labels), merged in histograms.items()],
+    }
+
+
+def snapshot_path(role, directory=METRICS_DIR, pid=None):
+    return os.path.join(directory, f"{role}-{pid or os.getpid()}.json")
+
+
+def write_snapshot(role, directory=METRICS_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = snapshot_path(role, directory)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({**REGISTRY.snapshot(), "role": role}, f)
+    os.replace(tmp_path, path)
+
+
+def start_snapshot_writer(role, directory=METRICS_DIR, interval=SNAPSHOT_INTERVAL):
+    """
+    Writes this process's metrics to directory/<role>-<pid>.json every
+    interval seconds and at exit, so other processes can read and merge them.
+    After the process exits, readers fold its file into the cumulative one.
+    """
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write_snapshot(role, directory)
+            except OSError as e:
+                logging.warning("Could not write metrics snapshot: %s", e)
+
+    threading.Thread(target=loop, name="metrics-snapshot", daemon=True).start()
+    atexit.register(write_snapshot, role, directory)
+
+
+def _read_snapshot(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # Missing, being replaced right now, or left half-written by a crash
+
+
+def _process_snapshots(directory):
+    # (path, snapshot) of every per-process file, i.e. everything but the cumulative one
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        if os.path.basename(path) != CUMULATIVE_FILE:
+            snapshot = _read_snapshot(path)
+            if snapshot is not None:
+                yield path, snapshot
+
+
+def fold_stale_snapshots(directory=METRICS_DIR, stale_after=STALE_AFTER):
+    """
+    Adds the snapshots of exited processes (not rewritten for stale_after
+    seconds) to the cumulative file and deletes them, so totals survive
+    while the directory does not grow with every runner or worker started.
+    Concurrent readers take turns through a lock file.
+
+    Returns:
+    - int: The number of snapshots folded.
+    """
+    now = time.time()
+    stale = [(path, snapshot) for path, snapshot in _process_snapshots(directory)
+             if now - snapshot.get("updated_at", now) > stale_after]
+    if not stale:
+        return 0
+
+    lock_path = os.path.join(directory, CUMULATIVE_FILE + ".lock")
+    try:
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        # Someone else is folding; a lock left behind by a crash is broken once it is stale itself
+        try:
+            if now - os.path.getmtime(lock_path) > stale_after:
+                os.remove(lock_path)
+        except OSError:
+            pass
+        return 0
+
+    try:
+        cumulative_path = os.path.join(directory, CUMULATIVE_FILE)
+        cumulative = _read_snapshot(cumulative_path) or merge_snapshots([])
+        # Files folded recently, by name and update time; a reader that listed one before it was deleted skips it
+        folded = {name: updated_at for name, updated_at in cumulative.get("folded", {}).items()
+                  if now - updated_at < 10 * stale_after}
+        new = [(path, snapshot) for path, snapshot in stale
+               if folded.get(os.path.basename(path)) != snapshot.get("updated_at")]
+        merged = merge_snapshots([cumulative] + [snapshot for _, snapshot in new])
+        merged.update(role="cumulative", pids=[], folded={**folded, **{
+            os.path.basename(path): snapshot.get("updated_at") for path, snapshot in new}})
+        tmp_path = cumulative_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(merged, f)
+        os.replace(tmp_path, cumulative_path)
+        for path, _ in stale:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return len(new)
+    finally:
+        os.remove(lock_path)
+
+
+def load_snapshot(directory=METRICS_DIR, include_local=True):
+    """
+    Merges the cumulative totals of exited processes, every live process's
+    snapshot file and this process's live registry.
+
+    Returns:
+    - dict: The merged snapshot.
+    """
+    try:
+        fold_stale_snapshots(directory)
+    except OSError as e:
+        logging.warning("Could not fold old metrics snapshots: %s", e)
+
+    snapshots = []
+    cumulative = _read_snapshot(os.path.join(directory, CUMULATIVE_FILE))
+    folded = cumulative.get("folded", {}) if cumulative else {}
+    if cumulative:
+        snapshots.append(cumulative)
+    for path, snapshot in _process_snapshots(directory):
+        if folded.get(os.path.basename(path)) == snapshot.get("updated_at"):
+            continue  # Already counted in the cumulative file
+        # This process's own file is older than its live registry
+        if not (include_local and snapshot.get("pid") == os.getpid()):
+            snapshots.append(snapshot)
+    if include_local:
+        snapshots.append(REGISTRY.snapshot())
+    return merge_snapshots(snapshots)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}" if labels else ""
+
+
+def prometheus_text(snapshot, prefix="scraper_"):
+    """
+    Renders a snapshot in the Prometheus text exposition format.
+    """
+    lines = []
+    by_name = {}
+    for counter in snapshot["counters"]:
+        by_name.setdefault(counter["name"], ("counter", []))[1].append(counter)
+    for histogram in snapshot["histograms"]:
+        by_name.setdefault(histogram["name"], ("histogram", []))[1].append(histogram)
+
+    for name, (kind, series) in sorted(by_name.items()):
+        metric = prefix + name
+        if name in HELP:
+            lines.append(f"# HELP {metric} {HELP[name]}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for entry in sorted(series, key=lambda entry: sorted(entry["labels"].items())):
+            labels = entry["labels"]
+            if kind == "counter":
+                lines.append(f"{metric}{_format_labels(labels)} {entry['value']}")
+                continue
+            cumulative = 0
+            for bound, value in zip(snapshot["buckets"] + ["+Inf"], entry["counts"]):
+                cumulative += value
+                lines.append(f"{metric}_bucket{_format_labels({**labels, 'le': bound})} {cumulative}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {entry['sum']}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def quantile(counts, buckets, fraction):
+    """
+    Estimates a quantile from histogram bucket counts by linear interpolation
+    within the bucket, like Prometheus' histogram_quantile.
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    rank = fraction * total
+    cumulative, lower = 0, 0.0
+    for bound, value in zip(list(buckets) + [buckets[-1]], counts):
+        if value and cumulative + value >= rank:
+            return lower + (bound - lower) * (rank - cumulative) / value
+        cumulative += value
+        lower = bound
+    return buckets[-1]
+
+
+def stage_summary(snapshot, by_host=False):
+    """
+    Summarizes the stage_seconds histograms per stage (and host).
+
+    Returns:
+    - list: Dicts with stage, host, calls, errors, total/mean seconds and p50/p95/p99 estimates.
+    """
+    groups = {}
+    for histogram in snapshot["histograms"]:
+        if histogram["name"] != "stage_seconds":
+            continue
+        labels = histogram["labels"]
+        key = (labels.get("stage", ""), labels.get("host", "") if by_host else "")
+        group = groups.setdefault(key, {"counts": [0] * len(histogram["counts"]), "sum": 0.0, "errors": 0})
+        group["counts"] = [a + b for a, b in zip(group["counts"], histogram["counts"])]
+        group["sum"] += histogram["sum"]
+        if labels.get("outcome", "ok") != "ok":
+            group["errors"] += sum(histogram["counts"])
+
+    rows = []
+    for (stage, host), group in sorted(groups.items()):
+        calls = sum(group["counts"])
+        rows.append({
+            "stage": stage, "host": host, "calls": calls, "errors": group["errors"],
+            "total_seconds": round(group["sum"], 3), "mean_ms": round(group["sum"] / calls * 1000, 1) if calls else None,
+            **{f"p{int(q * 100)}_ms": round(quantile(group["counts"], snapshot["buckets"], q) * 1000, 1)
+               for q in (0.5, 0.95, 0.99)},
+        })
+    return rows
+
+
+def start_metrics_server(port=METRICS_PORT, directory=METRICS_DIR, host="127.0.0.1"):
+    """
+    Serves the merged metrics at /metrics (Prometheus text) and /metrics.json from a background thread.
+
+    Returns:
+    - ThreadingHTTPServer: The running server.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path not in ("/metrics", "/metrics.json"):
+                self.send_error(404)
+                return
+            snapshot = load_snapshot(directory)
+            if path == "/metrics":
+                body, content_type = prometheus_text(snapshot).encode("utf-8"), "text/plain; version=0.0.4"
+            else:
+                body, content_type = json.dumps(snapshot).encode("utf-8"), "application/json"
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logging.info("Serving metrics at http://%s:%d/metrics", host, port)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve, show or reset the scraper's pipeline metrics.")
+    parser.add_argument("--dir", default=METRICS_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="Prometheus endpoint over every process's metrics.")
+    serve_parser.add_argument("--port", type=int, default=METRICS_PORT)
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    show_parser = subparsers.add_parser("show", help="Print a per-stage summary.")
+    show_parser.add_argument("--by-host", action="store_true")
+    show_parser.add_argument("--prometheus", action="store_true", help="Print the Prometheus text instead.")
+    subparsers.add_parser("reset", help="Delete the saved snapshots.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "serve":
+        server = start_metrics_server(args.port, args.dir, args.host)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+    elif args.command == "show":
+        snapshot = load_snapshot(args.dir, include_local=False)
+        if args.prometheus:
+            print(prometheus_text(snapshot), end="")
+            return
+        print(f"{'stage':<16} {'host':<24} {'calls':>7} {'errors':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for row in stage_summary(snapshot, args.by_host):
+            print(f"{row['stage']:<16} {row['host']:<24} {row['calls']:7d} {row['errors']:6d} {row['mean_ms']:9.1f} "
+                  f"{row['p50_ms']:9.1f} {row['p95_ms']:9.1f} {row['p99_ms']:9.1f}")
+    elif args.command == "reset":
+        paths = glob.glob(os.path.join(args.dir, "*.json"))
+        for path in paths:
+            os.remove(path)
+        print(f"Removed {len(paths)} metrics snapshots.")
+
+
+if __name__ == "__main__":
+    main()
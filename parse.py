@@ -2,6 +2,9 @@ import os
 from groq import Groq
 import logging
 
+from llm_client import DEFAULT_MODEL, GroqBackend, LLMDispatcher
+from llm_cache import LLMResponseCache, cache_key
+
 logging.basicConfig(level=logging.INFO)
 
 # Load the Groq API key from the environment variable
@@ -12,34 +15,78 @@ if groq_api_key is None:
 # Initialize the Groq client
 client = Groq(api_key=groq_api_key)
 
-def parse_with_groq(dom_chunks, parse_description):
-    parsed_results = []
+# Rate limits for the Groq account; override them to match your plan
+GROQ_CONCURRENCY = int(os.getenv("GROQ_CONCURRENCY", "4"))
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "30000"))
+
+SYSTEM_PROMPT = "You are tasked with analyzing speech transcripts."
+USER_PROMPT_TEMPLATE = ("Analyze the following speech text and extract:\n"
+                        "- Date of the speech\n"
+                        "- Location\n"
+                        "- Main topics discussed\n"
+                        "- Key quotes\n\n"
+                        "Text: {chunk}")
+
+# Completions cache shared by every parse in this process, opened on first use
+_response_cache = None
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = LLMResponseCache()
+    return _response_cache
+
+def build_messages(chunk):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": USER_PROMPT_TEMPLATE.format(chunk=chunk)}
+    ]
+
+def parse_with_groq(dom_chunks, parse_description, backend=None, concurrency=GROQ_CONCURRENCY,
+                    requests_per_minute=GROQ_REQUESTS_PER_MINUTE, tokens_per_minute=GROQ_TOKENS_PER_MINUTE,
+                    cache=None, bypass_cache=False, model=DEFAULT_MODEL):
+    """
+    Sends the chunks to the LLM concurrently, within the RPM/TPM limits, and
+    joins the responses in chunk order. Chunks answered before are served
+    from the response cache without calling the API.
+
+    Parameters:
+    - dom_chunks (list): The text chunks to analyze.
+    - parse_description (str): What the user wants to parse.
+    - backend: Optional LLM backend (default: the Groq client); swap in an
+      OpenAICompatibleBackend to test against a local fake server.
+    - concurrency (int): Maximum number of requests in flight.
+    - requests_per_minute (int): RPM limit.
+    - tokens_per_minute (int): TPM limit.
+    - cache: Optional LLMResponseCache (default: llm_cache.sqlite3).
+    - bypass_cache (bool): Always call the API; fresh responses still update the cache.
+    - model (str): The model name.
+
+    Returns:
+    - str: The responses joined by newlines.
+    """
     logging.info("Starting parsing with Groq...")
+    cache = cache or get_response_cache()
+    keys = [cache_key(model, SYSTEM_PROMPT, USER_PROMPT_TEMPLATE, parse_description, chunk) for chunk in dom_chunks]
+    cached = {} if bypass_cache else cache.get_many(keys)
 
-    for chunk in dom_chunks:
-        logging.info(f"Processing chunk: {chunk}")  # Log the current chunk being processed
-        try:
-            response = client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": "You are tasked with analyzing speech transcripts."},
-                    {"role": "user", "content": f"Analyze the following speech text and extract:\n"
-                                                 f"- Date of the speech\n"
-                                                 f"- Location\n"
-                                                 f"- Main topics discussed\n"
-                                                 f"- Key quotes\n\n"
-                                                 f"Text: {chunk}"}
-                ],
-                model="llama3-8b-8192"
-            )
-            logging.info(f"Response received: {response}")  # Log the API response
-            
-            if response.choices:  # Check if choices is not empty
-                parsed_results.append(response.choices[0].message.content)
-            else:
-                logging.warning("No choices returned in the API response.")  # Log a warning if no choices are available
-            
-        except Exception as e:
-            logging.error(f"Error: {e}")  # General error logging
+    missing = [index for index, key in enumerate(keys) if key not in cached]
+    logging.info("LLM cache: %d of %d chunks cached.", len(dom_chunks) - len(missing), len(dom_chunks))
 
-    return "\n".join(parsed_results)
+    fresh = {}
+    if missing:
+        dispatcher = LLMDispatcher(
+            backend or GroqBackend(client, model),
+            concurrency=concurrency,
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+        )
+        responses = dispatcher.run_sync([build_messages(dom_chunks[index]) for index in missing])
+        logging.info("Received %d of %d responses.", sum(1 for response in responses if response), len(responses))
+        fresh = {keys[index]: response for index, response in zip(missing, responses)}
+        cache.put_many(fresh.items(), model)
 
+    responses = [cached.get(key, fresh.get(key)) for key in keys]
+    parsed_results = [response for response in responses if response]
+    return "\n".join(parsed_results)
@@ -0,0 +1,137 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import metrics
+from extract import extract_transcript
+
+_FETCHER_DONE = object()
+
+
+def _timed_parse(parse_function, html, url):
+    # Runs in the parser process; the timing goes back to the parent, whose metrics registry is the one exported
+    start = time.perf_counter()
+    try:
+        return parse_function(html, url), time.perf_counter() - start, None
+    except Exception as e:
+        return None, time.perf_counter() - start, e
+
+
+class ScrapePipeline:
+    """
+    Two-stage scrape pipeline. I/O threads fetch raw HTML into a bounded
+    queue, and a process pool parses it into title/summary/content records,
+    so parsing scales with cores instead of being serialized by the GIL.
+    When the parsers fall behind, the queue fills up and the fetch threads
+    block on it, so memory stays bounded by queue_size pages.
+
+    Parameters:
+    - fetcher: Object with fetch(url, stop_event) -> html, e.g. PageFetcher.
+    - fetch_workers (int): Number of fetch threads.
+    - parse_workers (int): Number of parser processes (default: CPU count).
+    - queue_size (int): Maximum number of fetched pages waiting to be parsed.
+    - stop_event: Optional threading event to stop the pipeline early.
+    - parse_function (callable): Picklable function (html, url) -> record.
+    """
+
+    def __init__(self, fetcher, fetch_workers=16, parse_workers=None, queue_size=64, stop_event=None,
+                 parse_function=extract_transcript):
+        self.fetcher = fetcher
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.stop_event = stop_event or threading.Event()
+        self.parse_function = parse_function
+
+    def _fetch_loop(self, url_queue, html_queue, halt):
+        try:
+            while not (halt.is_set() or self.stop_event.is_set()):
+                try:
+                    url = url_queue.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    html = self.fetcher.fetch(url, self.stop_event)
+                    item = (url, html, None)
+                except Exception as e:
+                    item = (url, None, e)
+                # Blocks while the parser stage is behind; that is the backpressure
+                while not halt.is_set():
+                    try:
+                        html_queue.put(item, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+        finally:
+            html_queue.put(_FETCHER_DONE)
+
+    def run(self, urls):
+        """
+        Scrapes the given URLs.
+
+        Yields:
+        - tuple: (url, record or None, exception or None) in completion order.
+        """
+        url_queue = queue.Queue()
+        for url in urls:
+            url_queue.put(url)
+
+        # One extra slot per fetcher so every done marker fits even when the queue is full
+        html_queue = queue.Queue(maxsize=self.queue_size + self.fetch_workers)
+        halt = threading.Event()
+        fetch_threads = [
+            threading.Thread(target=self._fetch_loop, args=(url_queue, html_queue, halt), daemon=True)
+            for _ in range(min(self.fetch_workers, max(url_queue.qsize(), 1)))
+        ]
+        for thread in fetch_threads:
+            thread.start()
+
+        running_fetchers = len(fetch_threads)
+        in_flight = {}
+        max_in_flight = self.parse_workers * 2
+        executor = ProcessPoolExecutor(max_workers=self.parse_workers)
+        try:
+            while running_fetchers or in_flight:
+                # Only take more HTML off the queue while the parsers have room for it
+                while running_fetchers and len(in_flight) < max_in_flight:
+                    try:
+                        item = html_queue.get(timeout=0.1 if in_flight else 0.5)
+                    except queue.Empty:
+                        break
+                    if item is _FETCHER_DONE:
+                        running_fetchers -= 1
+                        continue
+                    url, html, error = item
+                    if error or not html:
+                        yield url, None, error
+                        continue
+                    in_flight[executor.submit(_timed_parse, self.parse_function, html, url)] = url
+
+                if not in_flight:
+                    continue
+                done, _ = wait(in_flight, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = in_flight.pop(future)
+                    try:
+                        record, seconds, error = future.result()
+                    except Exception as e:  # The worker process died
+                        record, seconds, error = None, None, e
+                    if seconds is not None:
+                        metrics.observe("parse", seconds, metrics.host_of(url), "error" if error else "ok")
+                    if error:
+                        logging.error(f"Error parsing {url}: {error}")
+                        yield url, None, error
+                    else:
+                        yield url, record, None
+        finally:
+            halt.set()
+            # Unblock fetchers waiting on a full queue so they can exit
+            while any(thread.is_alive() for thread in fetch_threads):
+                try:
+                    html_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            executor.shutdown(wait=True, cancel_futures=True)
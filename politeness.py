@@ -0,0 +1,308 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+# Ceiling per host; the scheduler never goes above it however well the host responds
+MAX_REQUESTS_PER_SECOND = 4.0
+MAX_CONCURRENCY = 8
+
+# Starting point for a host the scheduler has not seen yet
+INITIAL_REQUESTS_PER_SECOND = 0.5
+INITIAL_CONCURRENCY = 2
+MIN_REQUESTS_PER_SECOND = 0.05
+
+# AIMD: add this much rate per good response, multiply rate and concurrency by this on congestion
+ADDITIVE_INCREASE = 0.05
+MULTIPLICATIVE_DECREASE = 0.5
+
+# A response this many times slower than the host's best observed latency counts as congestion
+LATENCY_FACTOR = 3.0
+LATENCY_SMOOTHING = 0.2
+
+CONGESTION_STATUS = {429, 503}
+MAX_RETRY_AFTER = 600  # Seconds; longer Retry-After values are capped
+
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header (delta-seconds or HTTP date) into seconds from now.
+    """
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class RequestCancelled(Exception):
+    """
+    Raised by PolitenessScheduler.acquire() when the stop event is set while
+    waiting; no slot was taken, and the request must not be made.
+    """
+
+
+class HostState:
+    """
+    Rate and concurrency limits learned for one host.
+    """
+
+    def __init__(self, rate, concurrency):
+        self.rate = rate  # Requests per second
+        self.concurrency = float(concurrency)
+        self.in_flight = 0
+        self.next_start = 0.0  # Earliest monotonic time the next request may start
+        self.blocked_until = 0.0  # Set by Retry-After
+        self.last_decrease = 0.0
+        self.crawl_delay = None  # From robots.txt
+        self.robots_checked = False
+        self.latency = {}  # kind -> [smoothed latency, best smoothed latency]
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+
+
+class RequestOutcome:
+    """
+    Collects the result of one request inside PolitenessScheduler.request().
+    """
+
+    def __init__(self):
+        self.status_code = None
+        self.retry_after = None
+        self.failed = False
+
+    def record(self, status_code=None, retry_after=None, failed=False):
+        self.status_code = status_code
+        self.retry_after = parse_retry_after(retry_after) if isinstance(retry_after, str) else retry_after
+        self.failed = failed
+
+
+class PolitenessScheduler:
+    """
+    Central per-host scheduler that every fetch path goes through. Each host
+    gets its own request rate and concurrency limit, adjusted AIMD-style:
+    both grow slowly while responses are fast and successful, and are halved
+    on a 429/503, a failed request or a latency spike. Retry-After pauses the
+    host, and a robots.txt Crawl-delay lowers its ceiling.
+
+    Parameters:
+    - max_rate (float): Ceiling in requests per second per host.
+    - max_concurrency (int): Ceiling on requests in flight per host.
+    - initial_rate (float): Starting rate for a new host.
+    - initial_concurrency (int): Starting concurrency for a new host.
+    - min_rate (float): Floor the rate never drops below.
+    - jitter (float): Random +/- fraction applied to the spacing between requests.
+    - respect_robots (bool): Read each host's robots.txt for a Crawl-delay.
+    - user_agent (str): The user agent to look up in robots.txt.
+    """
+
+    def __init__(self, max_rate=MAX_REQUESTS_PER_SECOND, max_concurrency=MAX_CONCURRENCY,
+                 initial_rate=INITIAL_REQUESTS_PER_SECOND, initial_concurrency=INITIAL_CONCURRENCY,
+                 min_rate=MIN_REQUESTS_PER_SECOND, jitter=0.25, respect_robots=True, user_agent="*"):
+        self.max_rate = max_rate
+        self.max_concurrency = max_concurrency
+        self.initial_rate = initial_rate
+        self.initial_concurrency = initial_concurrency
+        self.min_rate = min_rate
+        self.jitter = jitter
+        self.respect_robots = respect_robots
+        self.user_agent = user_agent
+
+        self._condition = threading.Condition()
+        self._hosts = {}
+
+    def set_ceiling(self, max_rate=None, max_concurrency=None):
+        """
+        Changes the per-host ceiling; hosts above it are brought down immediately.
+        """
+        with self._condition:
+            if max_rate is not None:
+                self.max_rate = max_rate
+            if max_concurrency is not None:
+                self.max_concurrency = max_concurrency
+            for state in self._hosts.values():
+                state.rate = min(state.rate, self._rate_ceiling(state))
+                state.concurrency = min(state.concurrency, self.max_concurrency)
+            self._condition.notify_all()
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = HostState(min(self.initial_rate, self.max_rate), min(self.initial_concurrency, self.max_concurrency))
+            self._hosts[host] = state
+        return state
+
+    def _rate_ceiling(self, state):
+        if state.crawl_delay:
+            return min(self.max_rate, 1.0 / state.crawl_delay)
+        return self.max_rate
+
+    def _load_robots(self, url, state):
+        # Fetched once per host, outside the lock; a missing or unreadable robots.txt means no crawl delay
+        parts = urlsplit(url)
+        crawl_delay = None
+        try:
+            response = requests.get(f"{parts.scheme}://{parts.netloc}/robots.txt", timeout=10,
+                                    headers={"User-Agent": self.user_agent})
+            if response.status_code == 200:
+                parser = RobotFileParser()
+                parser.parse(response.text.splitlines())
+                crawl_delay = parser.crawl_delay(self.user_agent)
+                request_rate = parser.request_rate(self.user_agent)
+                if request_rate:
+                    crawl_delay = max(crawl_delay or 0, request_rate.seconds / request_rate.requests)
+        except requests.RequestException as e:
+            logging.info("Could not read robots.txt for %s: %s", parts.netloc, e)
+
+        with self._condition:
+            state.crawl_delay = float(crawl_delay) if crawl_delay else None
+            state.rate = min(state.rate, self._rate_ceiling(state))
+        if crawl_delay:
+            logging.info("robots.txt for %s asks for a crawl delay of %.1f s.", parts.netloc, float(crawl_delay))
+
+    def acquire(self, url, stop_event=None):
+        """
+        Blocks until a request to the URL's host is allowed, then reserves a slot.
+        Raises RequestCancelled, without reserving anything, once stop_event is set.
+
+        Returns:
+        - str: The host, to pass to release().
+        """
+        host = urlsplit(url).netloc
+        with self._condition:
+            state = self._state(host)
+            load_robots = self.respect_robots and not state.robots_checked
+            state.robots_checked = True
+        if load_robots:
+            self._load_robots(url, state)
+
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                wait = max(state.blocked_until, state.next_start) - now
+                if state.in_flight >= int(state.concurrency):
+                    wait = max(wait, 0.05)
+                elif wait <= 0:
+                    break
+                if stop_event and stop_event.is_set():
+                    raise RequestCancelled(url)
+                self._condition.wait(timeout=min(wait, 0.5))
+
+            spacing = 1.0 / state.rate
+            state.next_start = max(now, state.next_start) + spacing * random.uniform(1 - self.jitter, 1 + self.jitter)
+            state.in_flight += 1
+            state.requests += 1
+        return host
+
+    def release(self, host, latency, kind="http", status_code=None, retry_after=None, failed=False):
+        """
+        Frees the slot taken by acquire() and adapts the host's limits to the outcome.
+
+        Parameters:
+        - host (str): The host returned by acquire().
+        - latency (float): Request duration in seconds.
+        - kind (str): Fetch path ("http", "selenium"); latency is judged against the same kind only.
+        - status_code (int): HTTP status, if known.
+        - retry_after (float): Seconds the server asked us to wait, if any.
+        - failed (bool): The request raised or timed out.
+        """
+        with self._condition:
+            state = self._state(host)
+            state.in_flight -= 1
+            now = time.monotonic()
+
+            smoothed, best = state.latency.get(kind, (latency, latency))
+            smoothed += LATENCY_SMOOTHING * (latency - smoothed)
+            state.latency[kind] = (smoothed, min(best, smoothed))
+
+            throttled = status_code in CONGESTION_STATUS
+            slow = smoothed > LATENCY_FACTOR * max(best, 0.05)
+            if throttled:
+                state.throttled += 1
+            if failed or (status_code is not None and status_code >= 500):
+                state.errors += 1
+
+            if retry_after:
+                state.blocked_until = max(state.blocked_until, now + retry_after)
+                logging.info("%s asked us to wait %.0f s (status %s).", host, retry_after, status_code)
+
+            if throttled or failed or slow or (status_code is not None and status_code >= 500):
+                # Halve at most once per round trip, so a burst of failures from one congested moment counts once
+                if now - state.last_decrease > max(smoothed, 1.0):
+                    state.rate = max(self.min_rate, state.rate * MULTIPLICATIVE_DECREASE)
+                    state.concurrency = max(1.0, state.concurrency * MULTIPLICATIVE_DECREASE)
+                    state.last_decrease = now
+                    logging.info("Backing off %s to %.2f req/s, %d concurrent (status %s, latency %.2f s).",
+                                 host, state.rate, int(state.concurrency), status_code, latency)
+                if not retry_after:
+                    state.next_start = max(state.next_start, now + 1.0 / state.rate)
+            else:
+                state.rate = min(self._rate_ceiling(state), state.rate + ADDITIVE_INCREASE)
+                state.concurrency = min(float(self.max_concurrency), state.concurrency + 1.0 / state.concurrency)
+            self._condition.notify_all()
+
+    @contextmanager
+    def request(self, url, kind="http", stop_event=None):
+        """
+        Wraps one request: waits for the host's turn, times the request and
+        reports the outcome. An exception inside the block counts as a failure;
+        RequestCancelled is raised before the block runs if stop_event is set.
+
+        Usage:
+            with scheduler.request(url) as outcome:
+                response = session.get(url)
+                outcome.record(response.status_code, response.headers.get("Retry-After"))
+        """
+        host = self.acquire(url, stop_event)
+        outcome = RequestOutcome()
+        start = time.monotonic()
+        try:
+            yield outcome
+        except BaseException:
+            outcome.failed = True
+            raise
+        finally:
+            self.release(host, time.monotonic() - start, kind, outcome.status_code, outcome.retry_after, outcome.failed)
+
+    def snapshot(self):
+        """
+        Returns the current limits and counters per host.
+        """
+        with self._condition:
+            return {
+                host: {
+                    "rate": round(state.rate, 3),
+                    "concurrency": int(state.concurrency),
+                    "in_flight": state.in_flight,
+                    "crawl_delay": state.crawl_delay,
+                    "requests": state.requests,
+                    "errors": state.errors,
+                    "throttled": state.throttled,
+                    "latency": {kind: round(values[0], 3) for kind, values in state.latency.items()},
+                }
+                for host, state in self._hosts.items()
+            }
+
+
+# Scheduler shared by every fetch path in this process, created on first use
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PolitenessScheduler()
+        return _scheduler
@@ -0,0 +1,130 @@
+import logging
+import re
+
+import numpy as np
+from scipy import sparse
+
+from chunker import TokenCounter
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Words that carry no topic, including the instruction words people put in parse descriptions
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i in is it its of on or our she that the their them
+they this to was we were will with you your not no so if about into over than then there these those what which
+who whom how when where why all any can could would should may might also more most other such only own same
+analyze analyse extract find list summarize summarise describe identify speech speeches text transcript
+transcripts mentions mentioned discuss discussed discussing please
+""".split())
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class ParagraphIndex:
+    """
+    BM25 index over paragraphs, stored as a sparse term-frequency matrix so
+    a query is scored against every paragraph with a few vectorized ops.
+
+    Parameters:
+    - paragraphs (list): The paragraphs to index.
+    - k1 (float): BM25 term-frequency saturation.
+    - b (float): BM25 length normalization.
+    """
+
+    def __init__(self, paragraphs, k1=1.5, b=0.75):
+        self.paragraphs = paragraphs
+        self.k1 = k1
+        self.b = b
+
+        vocabulary = {}
+        indices, indptr = [], [0]
+        for paragraph in paragraphs:
+            for token in tokenize(paragraph):
+                indices.append(vocabulary.setdefault(token, len(vocabulary)))
+            indptr.append(len(indices))
+        self.vocabulary = vocabulary
+
+        data = np.ones(len(indices), dtype=np.float32)
+        # Duplicate (row, term) entries are summed into term frequencies
+        tf = sparse.csr_matrix((data, np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+                               shape=(len(paragraphs), max(len(vocabulary), 1)))
+        tf.sum_duplicates()
+        self.tf = tf.tocsc()  # Column slices per query term are what scoring needs
+
+        lengths = np.diff(np.array(indptr, dtype=np.float64))
+        self.length_norm = k1 * (1 - b + b * lengths / max(lengths.mean() if len(lengths) else 0, 1))
+        document_frequency = np.bincount(self.tf.indices, minlength=self.tf.shape[1])
+        self.idf = np.log1p((len(paragraphs) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def score(self, query):
+        """
+        Returns the BM25 score of every paragraph for the query.
+        """
+        term_ids = sorted({self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary})
+        scores = np.zeros(len(self.paragraphs), dtype=np.float64)
+        if not term_ids:
+            return scores
+
+        columns = self.tf[:, term_ids].tocoo()
+        tf = columns.data.astype(np.float64)
+        weights = self.idf[term_ids][columns.col] * tf * (self.k1 + 1) / (tf + self.length_norm[columns.row])
+        np.add.at(scores, columns.row, weights)
+        return scores
+
+    def select(self, query, top_k=None, min_score=None):
+        """
+        Returns the indexes of the paragraphs to keep, in document order:
+        the top_k best scoring and/or those scoring at least min_score.
+        An empty list means no paragraph matched the query.
+        """
+        scores = self.score(query)
+        candidates = np.flatnonzero(scores > 0)
+        if min_score is not None:
+            candidates = candidates[scores[candidates] >= min_score]
+        if top_k is not None and len(candidates) > top_k:
+            best = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+            candidates = candidates[best]
+        return sorted(candidates.tolist())
+
+
+def filter_relevant(texts, parse_description, top_k=50, min_score=None, counter=None):
+    """
+    Keeps only the paragraphs of the scraped texts that are relevant to the
+    parse description, so that only they are sent to the LLM.
+
+    Parameters:
+    - texts (list or str): Transcript contents, paragraphs separated by "\\n\\n".
+    - parse_description (str): The user's parse description, used as the query.
+    - top_k (int): Keep at most this many paragraphs.
+    - min_score (float): Keep only paragraphs scoring at least this much.
+    - counter (TokenCounter): Optional shared token counter for the report.
+
+    Returns:
+    - tuple: (filtered text, report dict with paragraph and token counts).
+    """
+    if isinstance(texts, str):
+        texts = [texts]
+    paragraphs = [paragraph for text in texts for paragraph in text.split("\n\n") if paragraph.strip()]
+    counter = counter or TokenCounter()
+
+    selected = ParagraphIndex(paragraphs).select(parse_description, top_k, min_score) if paragraphs else []
+    if not selected:
+        # Nothing matched (e.g. a generic description); send everything rather than nothing
+        logging.info("Relevance prefilter found no matching paragraphs; sending the full text.")
+        selected = list(range(len(paragraphs)))
+
+    kept = [paragraphs[index] for index in selected]
+    total_tokens = sum(counter.count_many(paragraphs)) if paragraphs else 0
+    kept_tokens = sum(counter.count_many(kept)) if kept else 0
+    report = {
+        "paragraphs": len(paragraphs),
+        "kept_paragraphs": len(kept),
+        "tokens": total_tokens,
+        "kept_tokens": kept_tokens,
+        "saved_tokens": total_tokens - kept_tokens,
+    }
+    logging.info("Relevance prefilter kept %d of %d paragraphs, saving %d of %d tokens.",
+                 len(kept), len(paragraphs), report["saved_tokens"], total_tokens)
+    return "\n\n".join(kept), report
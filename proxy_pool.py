@@ -0,0 +1,311 @@
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from bs4 import BeautifulSoup
+
+PROXY_SOURCE_URL = "https://free-proxy-list.net/"
+PROXY_TEST_URL = "https://httpbin.org/ip"
+PROXY_CACHE_FILE = "proxy_cache.json"
+PROXY_TTL = 30 * 60  # Seconds a proxy is trusted since it was validated or last worked
+# After a refresh that finds no working proxy, get() waits this long before refreshing again,
+# doubling up to REFRESH_BACKOFF_MAX while refreshes keep coming back empty
+REFRESH_BACKOFF = 60
+REFRESH_BACKOFF_MAX = 15 * 60
+VALIDATION_WORKERS = 32
+VALIDATION_TIMEOUT = 3
+
+# A proxy is evicted after this many consecutive failures
+MAX_FAILURES = 3
+LATENCY_SMOOTHING = 0.3
+
+
+def normalize_proxy(proxy):
+    """
+    'host:port' -> 'http://host:port'; proxies that already have a scheme are kept as they are.
+    """
+    proxy = proxy.strip()
+    return proxy if "://" in proxy else f"http://{proxy}"
+
+
+def requests_proxies(proxy):
+    """
+    Returns the proxies argument for requests that routes both schemes through the proxy.
+    """
+    return {"http": proxy, "https": proxy}
+
+
+def scrape_proxy_list(url=PROXY_SOURCE_URL, timeout=10):
+    """
+    Scrapes the HTTPS-capable proxies from free-proxy-list.net.
+
+    Returns:
+    - list: Proxy URLs.
+    """
+    response = requests.get(url, timeout=timeout)
+    soup = BeautifulSoup(response.text, "html.parser")
+    proxy_list = []
+
+    # Scrape proxy table
+    for row in soup.select("table#proxylisttable tbody tr, div.fpl-list table tbody tr"):
+        cols = row.find_all("td")
+        if len(cols) > 6 and cols[6].get_text() == "yes":  # Only use HTTPS proxies
+            proxy_list.append(normalize_proxy(f"{cols[0].get_text()}:{cols[1].get_text()}"))
+    return proxy_list
+
+
+def read_proxy_file(path):
+    """
+    Reads proxies from a text file, one 'host:port' or 'scheme://host:port' per line; '#' starts a comment.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [normalize_proxy(line.split("#", 1)[0]) for line in f if line.split("#", 1)[0].strip()]
+
+
+def validate_proxy(proxy, test_url=PROXY_TEST_URL, timeout=VALIDATION_TIMEOUT):
+    """
+    Requests the test URL through the proxy.
+
+    Returns:
+    - float: The round trip time in seconds, or None if the proxy does not work.
+    """
+    start = time.monotonic()
+    try:
+        response = requests.get(test_url, proxies=requests_proxies(proxy), timeout=timeout)
+    except requests.RequestException:
+        return None
+    return time.monotonic() - start if response.status_code == 200 else None
+
+
+def validate_proxies(proxies, test_url=PROXY_TEST_URL, timeout=VALIDATION_TIMEOUT, workers=VALIDATION_WORKERS):
+    """
+    Tests proxies concurrently, so a list of dead proxies costs one timeout instead of one per proxy.
+
+    Returns:
+    - dict: Working proxy -> latency in seconds.
+    """
+    proxies = list(dict.fromkeys(proxies))
+    if not proxies:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(proxies))) as executor:
+        latencies = executor.map(lambda proxy: validate_proxy(proxy, test_url, timeout), proxies)
+        return {proxy: latency for proxy, latency in zip(proxies, latencies) if latency is not None}
+
+
+class ProxyPool:
+    """
+    Pool of validated proxies with per-proxy health scores. Working proxies
+    are cached to disk with a TTL, so a restart skips validation. Each
+    request (or driver) takes a proxy with get() and reports back with
+    report(); successes extend a proxy's TTL, proxies that keep failing are
+    evicted, and the pool refills itself from its source when it runs dry,
+    backing off while the source has no working proxies.
+
+    Parameters:
+    - proxy_file (str): Optional static proxy list to use instead of scraping free-proxy-list.net.
+    - cache_file (str): Where validated proxies are cached (None disables the cache).
+    - ttl (float): Seconds a proxy stays trusted after it was validated or last worked.
+    - test_url (str): URL requested through each candidate to validate it.
+    - timeout (float): Validation timeout per proxy.
+    - workers (int): Candidates validated at once.
+    - max_failures (int): Consecutive failures before a proxy is evicted.
+    """
+
+    def __init__(self, proxy_file=None, cache_file=PROXY_CACHE_FILE, ttl=PROXY_TTL, test_url=PROXY_TEST_URL,
+                 timeout=VALIDATION_TIMEOUT, workers=VALIDATION_WORKERS, max_failures=MAX_FAILURES):
+        self.proxy_file = proxy_file
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.test_url = test_url
+        self.timeout = timeout
+        self.workers = workers
+        self.max_failures = max_failures
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._proxies = {}  # proxy -> {"latency", "validated_at", "successes", "failures"}
+        self._backoff = 0.0
+        self._next_refresh = 0.0  # time.monotonic() before which get() does not refresh an empty pool
+        self._load_cache()
+
+    def _load_cache(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning("Ignoring unreadable proxy cache %s: %s", self.cache_file, e)
+            return
+        now = time.time()
+        for proxy, entry in cached.items():
+            if now - entry["validated_at"] < self.ttl:
+                self._proxies[proxy] = {"latency": entry["latency"], "validated_at": entry["validated_at"],
+                                        "successes": 0, "failures": 0}
+        logging.info("Loaded %d cached proxies.", len(self._proxies))
+
+    def save(self):
+        if not self.cache_file:
+            return
+        with self._lock:
+            entries = {proxy: {"latency": entry["latency"], "validated_at": entry["validated_at"]}
+                       for proxy, entry in self._proxies.items()}
+        tmp_path = self.cache_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=4)
+        os.replace(tmp_path, self.cache_file)
+
+    def candidates(self):
+        if self.proxy_file:
+            return read_proxy_file(self.proxy_file)
+        return scrape_proxy_list()
+
+    def refresh(self):
+        """
+        Validates fresh candidates from the source and adds the working ones.
+        Concurrent callers wait for the refresh in progress instead of starting another.
+
+        Returns:
+        - int: The number of proxies in the pool afterwards.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            with self._refresh_lock:  # Someone else is refreshing; wait for it
+                return len(self)
+        try:
+            try:
+                candidates = self.candidates()
+            except (OSError, requests.RequestException) as e:
+                logging.error("Could not load proxy candidates: %s", e)
+                candidates = []
+            start = time.monotonic()
+            working = validate_proxies(candidates, self.test_url, self.timeout, self.workers)
+            logging.info("Validated %d of %d proxies in %.1f s.", len(working), len(candidates), time.monotonic() - start)
+
+            now = time.time()
+            with self._lock:
+                for proxy, latency in working.items():
+                    entry = self._proxies.setdefault(proxy, {"successes": 0, "failures": 0})
+                    entry.update(latency=latency, validated_at=now, failures=0)
+                if working:
+                    self._backoff = 0.0
+                else:
+                    # Remember the empty result so every request does not re-scrape and re-validate
+                    self._backoff = min(self._backoff * 2 or REFRESH_BACKOFF, REFRESH_BACKOFF_MAX)
+                    self._next_refresh = time.monotonic() + self._backoff
+                    logging.warning("No working proxies; not refreshing again for %d s.", self._backoff)
+            self.save()
+            return len(self)
+        finally:
+            self._refresh_lock.release()
+
+    def _score(self, entry):
+        # Lower is better: slow proxies and proxies that have been failing are picked less often
+        return entry["latency"] * (1 + entry["failures"]) ** 2
+
+    def get(self):
+        """
+        Picks a proxy for the next request or driver: the healthier of two random
+        proxies, which spreads load while favouring fast, reliable ones. An
+        empty pool is refreshed, unless the last refresh found nothing and
+        its backoff has not run out yet.
+
+        Returns:
+        - str: A proxy URL, or None if no working proxy is available.
+        """
+        with self._lock:
+            expired = [proxy for proxy, entry in self._proxies.items() if time.time() - entry["validated_at"] >= self.ttl]
+            for proxy in expired:
+                del self._proxies[proxy]
+            proxies = list(self._proxies)
+
+        if not proxies:
+            if time.monotonic() < self._next_refresh or not self.refresh():
+                return None
+            with self._lock:
+                proxies = list(self._proxies)
+            if not proxies:
+                return None
+
+        with self._lock:
+            sample = [proxy for proxy in random.sample(proxies, min(2, len(proxies))) if proxy in self._proxies]
+            if not sample:
+                return None
+            return min(sample, key=lambda proxy: self._score(self._proxies[proxy]))
+
+    def report(self, proxy, ok, latency=None):
+        """
+        Records the outcome of a request made through the proxy; a success renews
+        its TTL, and it is evicted after max_failures failures in a row. Only
+        report failures of the proxy itself (connection errors, timeouts, 407),
+        not error responses of the target site.
+        """
+        if proxy is None:
+            return
+        with self._lock:
+            entry = self._proxies.get(proxy)
+            if entry is None:
+                return
+            if ok:
+                entry["successes"] += 1
+                entry["failures"] = 0
+                entry["validated_at"] = time.time()
+                if latency is not None:
+                    entry["latency"] += LATENCY_SMOOTHING * (latency - entry["latency"])
+                return
+            entry["failures"] += 1
+            if entry["failures"] < self.max_failures:
+                return
+            del self._proxies[proxy]
+        logging.info("Evicted proxy %s after %d consecutive failures.", proxy, self.max_failures)
+        self.save()
+
+    def snapshot(self):
+        with self._lock:
+            return {proxy: {"latency": round(entry["latency"], 3), "successes": entry["successes"],
+                            "failures": entry["failures"]}
+                    for proxy, entry in sorted(self._proxies.items(), key=lambda item: self._score(item[1]))}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._proxies)
+
+
+# Pool shared by the proxy-aware helpers in scrape.py, created on first use
+_proxy_pool = None
+_proxy_pool_lock = threading.Lock()
+
+def get_proxy_pool(proxy_file=None):
+    global _proxy_pool
+    with _proxy_pool_lock:
+        if _proxy_pool is None or (proxy_file and _proxy_pool.proxy_file != proxy_file):
+            _proxy_pool = ProxyPool(proxy_file=proxy_file)
+        return _proxy_pool
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Discover, validate and inspect proxies.")
+    parser.add_argument("--file", default=None, help="Static proxy list instead of free-proxy-list.net.")
+    parser.add_argument("--cache", default=PROXY_CACHE_FILE)
+    parser.add_argument("--test-url", default=PROXY_TEST_URL)
+    parser.add_argument("--timeout", type=float, default=VALIDATION_TIMEOUT)
+    parser.add_argument("--workers", type=int, default=VALIDATION_WORKERS)
+    parser.add_argument("command", choices=("refresh", "list"))
+    args = parser.parse_args(argv)
+
+    pool = ProxyPool(proxy_file=args.file, cache_file=args.cache, test_url=args.test_url, timeout=args.timeout,
+                     workers=args.workers)
+    if args.command == "refresh":
+        pool.refresh()
+    for proxy, entry in pool.snapshot().items():
+        print(f"{entry['latency']:6.2f} s  {proxy}")
+    print(f"{len(pool)} working proxies.")
+
+
+if __name__ == "__main__":
+    main()
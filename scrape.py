@@ -1,4 +1,3 @@
-from datetime import datetime
 import logging
 import selenium.webdriver as webdriver
 from selenium.webdriver.support.ui import WebDriverWait
@@ -6,30 +5,52 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from selenium.webdriver.common.by import By
-from bs4 import BeautifulSoup
-import time
-import random
+import metrics
+from driver_profile import FAST_RENDER, block_chrome_resources, fast_chrome_options, fast_firefox_options, first_party_hosts
+from extract import (extract_body_html, extract_clean_text, extract_listing, extract_transcript, listing_page_url,
+                     months_reached_end, split_listing_url)
 from fake_useragent import UserAgent
+from politeness import RequestCancelled, get_scheduler
+from proxy_pool import get_proxy_pool
+from urllib.parse import urlsplit
 
 
 # Initialize global variables for scraping
 stopped = False
 
-def get_browser_driver(browser='chrome'):
+# Listing pages shift as new transcripts are published, so their cached copies expire quickly
+LISTING_CACHE_TTL = 3600
+
+@metrics.timed("driver_start")
+def get_browser_driver(browser='chrome', fast_render=FAST_RENDER, allowed_hosts=None):
+    """
+    Creates a driver with a fixed desktop User-Agent.
+
+    Parameters:
+    - browser (str): 'chrome' or 'firefox'.
+    - fast_render (bool): Use the headless fast-render profile (see driver_profile.py).
+    - allowed_hosts (tuple): With fast_render, block every other domain (see first_party_hosts).
+    """
     if browser.lower() == 'chrome':
         chrome_options = ChromeOptions()
         chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36")
+        if fast_render:
+            fast_chrome_options(chrome_options, allowed_hosts)
         print("Initializing Chrome WebDriver...")
-        return webdriver.Chrome(options=chrome_options)
+        driver = webdriver.Chrome(options=chrome_options)
+        return block_chrome_resources(driver) if fast_render else driver
     elif browser.lower() == 'firefox':
         firefox_options = FirefoxOptions()
         firefox_options.set_preference("general.useragent.override", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36")
+        if fast_render:
+            fast_firefox_options(firefox_options, allowed_hosts)
         print("Initializing Firefox WebDriver...")
         return webdriver.Firefox(options=firefox_options)
     else:
         raise ValueError("Unsupported browser! Choose 'chrome' or 'firefox'.")
     
-def create_driver(browser='chrome'):
+@metrics.timed("driver_start")
+def create_driver(browser='chrome', fast_render=FAST_RENDER, allowed_hosts=None):
     ua = UserAgent()
     user_agent = ua.random
     print(f"Using User-Agent: {user_agent}")
@@ -37,7 +58,11 @@ def create_driver(browser='chrome'):
     if browser.lower() == 'chrome':
         options = ChromeOptions()
         options.add_argument(f"user-agent={user_agent}")
+        if fast_render:
+            fast_chrome_options(options, allowed_hosts)
         driver = webdriver.Chrome(options=options)
+        if fast_render:
+            block_chrome_resources(driver)
         print("Chrome WebDriver initialized.")
     
     elif browser.lower() == 'firefox':
@@ -45,7 +70,7 @@ def create_driver(browser='chrome'):
         profile = webdriver.FirefoxProfile()
         profile.set_preference("general.useragent.override", user_agent)
         profile.set_preference("network.http.sendRefererHeader", 1)
-        profile.set_preference("network.http.use-cache", False)
+        profile.set_preference("network.http.use-cache", fast_render)  # The fast profile keeps a bounded cache
         
         # Set additional Firefox options
         options = FirefoxOptions()
@@ -53,6 +78,8 @@ def create_driver(browser='chrome'):
         options.set_preference("dom.webdriver.enabled", False)  # Disable webdriver flag
         options.set_preference("useAutomationExtension", False)  # Remove automation flag
         options.set_preference("marionette.logging", False)
+        if fast_render:
+            fast_firefox_options(options, allowed_hosts)
 
         # Initialize WebDriver with options
         driver = webdriver.Firefox(options=options)
@@ -63,84 +90,71 @@ def create_driver(browser='chrome'):
 
     return driver
 
-import requests
-
-def get_free_proxy():
+def get_free_proxy(proxy_pool=None):
     """
-    Fetches a free proxy from 'https://free-proxy-list.net/'.
-    Returns a valid proxy if available, or None if no proxies are working.
+    Returns a working proxy from the proxy pool, or None if no proxies are working.
+    The pool validates candidates concurrently and caches the working ones on disk.
     """
-    url = "https://free-proxy-list.net/"
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, "html.parser")
-    proxy_list = []
-
-    # Scrape proxy table
-    rows = soup.select("table#proxylisttable tbody tr")
-    for row in rows:
-        cols = row.find_all("td")
-        ip = cols[0].get_text()
-        port = cols[1].get_text()
-        https = cols[6].get_text()
-        if https == "yes":  # Only use HTTPS proxies
-            proxy_list.append(f"{ip}:{port}")
-
-    for proxy in proxy_list:
-        try:
-            # Test the proxy
-            response = requests.get(
-                "https://httpbin.org/ip",
-                proxies={"http": f"http://{proxy}", "https": f"https://{proxy}"},
-                timeout=3,
-            )
-            if response.status_code == 200:
-                print(f"Using Proxy: {proxy}")
-                return proxy
-        except Exception:
-            continue  # Skip non-working proxies
-
-    return None
+    return (proxy_pool or get_proxy_pool()).get()
 
-def create_driver_with_proxy(browser='chrome'):
+def create_driver_with_proxy(browser='chrome', proxy_pool=None, fast_render=FAST_RENDER, allowed_hosts=None):
+    """
+    Creates a driver routed through a proxy from the pool. The proxy is kept
+    on driver.proxy so failures can be reported back to the pool, which
+    rotates to another proxy for the next driver.
+    """
     ua = UserAgent()
     user_agent = ua.random
-    proxy = get_free_proxy()  # Get a proxy
+    proxy = get_free_proxy(proxy_pool)  # Get a proxy
 
     if not proxy:
         print("No working proxies found.")
-        return create_driver(browser)  # Fallback to standard driver
+        return create_driver(browser, fast_render, allowed_hosts)  # Fallback to standard driver
 
     if browser.lower() == 'chrome':
         options = ChromeOptions()
         options.add_argument(f"user-agent={user_agent}")
         options.add_argument(f"--proxy-server={proxy}")
-        driver = webdriver.Chrome(options=options)
+        if fast_render:
+            fast_chrome_options(options, allowed_hosts, proxy=proxy)
+        with metrics.timer("driver_start"):  # Not the whole function: the fallback above is timed by create_driver
+            driver = webdriver.Chrome(options=options)
+        if fast_render:
+            block_chrome_resources(driver)
         print(f"Chrome WebDriver initialized with proxy: {proxy}")
     
     elif browser.lower() == 'firefox':
         profile = webdriver.FirefoxProfile()
         profile.set_preference("general.useragent.override", user_agent)
         profile.set_preference("network.http.sendRefererHeader", 1)
-        profile.set_preference("network.http.use-cache", False)
+        profile.set_preference("network.http.use-cache", fast_render)
         
-        # Set proxy
-        profile.set_preference("network.proxy.type", 1)
-        profile.set_preference("network.proxy.http", proxy.split(':')[0])
-        profile.set_preference("network.proxy.http_port", int(proxy.split(':')[1]))
-        profile.set_preference("network.proxy.ssl", proxy.split(':')[0])
-        profile.set_preference("network.proxy.ssl_port", int(proxy.split(':')[1]))
+        # Set proxy (a fast profile that blocks domains routes through it with its PAC script instead)
+        pac_script = fast_render and allowed_hosts
+        if not pac_script:
+            proxy_address = urlsplit(proxy)
+            profile.set_preference("network.proxy.type", 1)
+            profile.set_preference("network.proxy.http", proxy_address.hostname)
+            profile.set_preference("network.proxy.http_port", proxy_address.port)
+            profile.set_preference("network.proxy.ssl", proxy_address.hostname)
+            profile.set_preference("network.proxy.ssl_port", proxy_address.port)
 
         options = FirefoxOptions()
         options.profile = profile
-        driver = webdriver.Firefox(options=options)
+        if fast_render:
+            fast_firefox_options(options, allowed_hosts, proxy=proxy)
+        with metrics.timer("driver_start"):
+            driver = webdriver.Firefox(options=options)
         print(f"Firefox WebDriver initialized with proxy: {proxy}")
     
     else:
         raise ValueError("Unsupported browser! Choose 'chrome' or 'firefox'.")
 
+    driver.proxy = proxy
     return driver
 
-def scrape_all_links(url, browser='chrome', end_month=None, end_year=None, delay_range=(3, 5)):
+def scrape_all_links(url, browser='chrome', end_month=None, end_year=None, cache=None, cache_ttl=LISTING_CACHE_TTL,
+                     scheduler=None):
     """ 
     Scrapes all article links from the given URL until the specified end_month and end_year are reached.
     
@@ -149,159 +163,172 @@ def scrape_all_links(url, browser='chrome', end_month=None, end_year=None, delay
     - browser (str): The browser to use ('chrome' or 'firefox').
     - end_month (int): The target end month (1 = January, ..., 12 = December).
     - end_year (int): The target end year.
-    - delay_range (tuple): A tuple specifying the minimum and maximum delay in seconds.
+    - cache: Optional HtmlCache; listing pages cached within cache_ttl are not reloaded.
+    - cache_ttl (float): How long a cached listing page stays valid, in seconds.
+    - scheduler: Optional PolitenessScheduler that paces page loads (default: the shared one).
     
     Returns:
     - list: A list of unique article links.
     """
+    driver = None
+    all_links = set()
+    scheduler = scheduler or get_scheduler()
+
+    def load_page(page_url):
+        # Only a real page load goes through the politeness scheduler
+        nonlocal driver
+        cached_html = cache.get(page_url, cache_ttl) if cache else None
+        if cached_html:
+            return cached_html
+
+        if driver is None:
+            driver = get_browser_driver(browser, allowed_hosts=first_party_hosts(url))  # Initialize WebDriver
+        # Timed inside the scheduler, so politeness waits do not count as fetch time
+        with scheduler.request(page_url, kind="selenium"), metrics.timer("fetch_selenium", metrics.host_of(page_url)):
+            driver.get(page_url)
+            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+        html = driver.page_source
+        if cache:
+            cache.put(page_url, html)
+        return html
+
     try:
-        driver = get_browser_driver(browser)  # Initialize WebDriver
-        driver.get(url)
-        all_links = set()
-        base_url = "http://en.kremlin.ru"
+        html = load_page(url)
         
         while True:
-            # Wait for the page to load and get the source
-            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-            soup = BeautifulSoup(driver.page_source, "html.parser")
-            
-            # Random delay to mimic human browsing
-            time.sleep(random.uniform(1, 2))
+            # Parse the loaded page source once for both links and dateblocks
+            links, months = extract_listing(html, url)
             
             # Collect article links
-            titles = soup.find_all("span", class_="entry-title p-name")
-            for title in titles:
-                parent = title.find_parent("a")
-                if parent and 'href' in parent.attrs:
-                    relative_url = parent['href']
-                    full_url = relative_url if relative_url.startswith("http") else f"{base_url}{relative_url}"
-                    all_links.add(full_url)
+            all_links.update(links)
 
             logging.info("Collected %d article links so far.", len(all_links))
 
             # Check if end date is reached (as before)
-            found_valid_date = False
-            if end_month and end_year:
-                date_blocks = soup.find_all("a", class_="dateblock")
-                for date_block in date_blocks:
-                    date_text = date_block.get_text(strip=True).replace("Calendar:", "").strip()
-                    try:
-                        month_year = datetime.strptime(date_text, '%B, %Y')
-                        if (month_year.year < end_year) or (month_year.year == end_year and month_year.month <= end_month):
-                            found_valid_date = True
-                            break
-                    except ValueError:
-                        logging.warning("Unrecognized date format: %s", date_text)
+            found_valid_date = months_reached_end(months, end_month, end_year)
             
             if found_valid_date:
                 logging.info("End date reached. Stopping scraping.")
                 break
             
-            # Extract current page number from URL
-            current_page_number = int(url.split('/')[-1])  # Assuming url ends with /page/x
-            next_page_number = current_page_number + 1
-            
-            # Construct new URL for next page
-            url = f"http://en.kremlin.ru/events/president/transcripts/page/{next_page_number}"
-            
-            # Introduce a delay before loading the new URL
-            delay_time = random.uniform(*delay_range)  # Random delay between specified range
-            logging.info("Waiting for %.2f seconds before loading next page: %s", delay_time, url)
-            time.sleep(delay_time)  # Wait before loading the new page
+            # Next page of the same listing (a URL without /page/N is page 1), on whatever host it is served from
+            base, current_page_number = split_listing_url(url)
+            url = listing_page_url(base, current_page_number + 1)
             
             # Load new URL instead of clicking 'Previous' button
-            driver.get(url)
+            html = load_page(url)
             logging.info("Navigated to next page: %s", url)
 
     except Exception as e:
         logging.error("An error occurred during scraping: %s", e)
     finally:
-        driver.quit()  # Ensure driver is properly closed
+        if driver:
+            driver.quit()  # Ensure driver is properly closed
         logging.info("Scraping session completed. Total links collected: %d", len(all_links))
     
     return list(all_links)
 
-def fetch_page_with_retry(url, driver, stop_event, retries=3, delay=1):
+def fetch_page_with_retry(url, driver, stop_event, retries=3, cache=None, cache_ttl=None, scheduler=None):
     """
-    Fetches a page with retries and a delay between requests.
+    Fetches a page with retries, paced by the politeness scheduler.
     
     Parameters:
     - url (str): The URL of the page to fetch.
     - driver: The WebDriver instance being used.
     - stop_event: The threading event to check for stopping the scraper.
     - retries (int): The number of retry attempts.
-    - delay (int): The delay between requests in seconds.
+    - cache: Optional HtmlCache; a fresh hit is returned without loading the page.
+    - cache_ttl (float): Optional TTL override for the cache lookup.
+    - scheduler: Optional PolitenessScheduler (default: the shared one).
     
     Returns:
     - str: The page source if successful, None otherwise.
     """
+    if cache:
+        cached_html = cache.get(url, cache_ttl)
+        if cached_html:
+            return cached_html
+
+    scheduler = scheduler or get_scheduler()
     for attempt in range(retries):
         if stop_event.is_set():  # Check if scraping should stop
             logging.info("Stopping fetch_page_with_retry as requested by user.")
             return None  # Return None or handle accordingly if scraping is stopped
 
         try:
-            driver.get(url)
-            time.sleep(delay)  # Stagger requests to avoid overwhelming the server
-            return driver.page_source
+            # The scheduler spaces requests to the host and backs it off after a failure
+            with scheduler.request(url, kind="selenium", stop_event=stop_event), \
+                    metrics.timer("fetch_selenium", metrics.host_of(url)):
+                driver.get(url)
+            html = driver.page_source
+            if cache:
+                cache.put(url, html)
+            return html
+        except RequestCancelled:
+            logging.info("Stopping fetch_page_with_retry as requested by user.")
+            return None
         except Exception as e:
             logging.error(f"Attempt {attempt + 1} failed for {url}: {e}")
-            time.sleep(delay * (attempt + 1))  # Exponential backoff
+            if attempt + 1 < retries:
+                metrics.count("retries_total", stage="fetch_selenium", host=metrics.host_of(url))
 
     return None
 
+# Function to extract title, summary and content paragraphs from a transcript page
+def parse_transcript_page(html, url=None):
+    with metrics.timer("parse", metrics.host_of(url)):
+        return extract_transcript(html, url)
+
 # Function to scrape content from each individual page, focusing on specific elements
-def scrape_individual_page(url, browser="chrome", stop_event=None):
+def scrape_individual_page(url, browser="chrome", stop_event=None, driver_pool=None, fetcher=None, cache=None):
     if stop_event and stop_event.is_set():
         return None
 
-    driver = get_browser_driver(browser)
-    try:
-        html = fetch_page_with_retry(url, driver, stop_event)
-        if not html or (stop_event and stop_event.is_set()):
+    # HTTP-first fetch layer: only falls back to a browser when the page needs one
+    if fetcher:
+        try:
+            html = fetcher.fetch(url, stop_event)
+            if not html or (stop_event and stop_event.is_set()):
+                return None
+            return parse_transcript_page(html, url)
+        except Exception as e:
+            logging.error(f"Error scraping {url}: {e}")
             return None
 
-        # Scrape page content
-        soup = BeautifulSoup(html, "html.parser")
-        title_element = soup.find("h1", class_="entry-title p-name")
-        title = title_element.get_text(strip=True) if title_element else "No title found"
-
-        summary_element = soup.find("div", class_="read__lead entry-summary p-summary")
-        summary = summary_element.get_text(strip=True) if summary_element else "No summary found"
+    # Borrow a long-lived driver from the pool if one was given, otherwise start a fresh browser
+    driver = (driver_pool.acquire() if driver_pool
+              else get_browser_driver(browser, allowed_hosts=first_party_hosts(url)))
+    if driver is None:
+        return None
 
-        content_element = soup.find("div", class_="entry-content e-content read__internal_content")
-        paragraphs = content_element.find_all("p") if content_element else []
-        content = "\n\n".join(p.get_text(strip=True) for p in paragraphs) if paragraphs else "No content found"
+    failed = False
+    try:
+        html = fetch_page_with_retry(url, driver, stop_event, cache=cache)
+        if not html or (stop_event and stop_event.is_set()):
+            # Every retry failed, so the driver itself is suspect
+            failed = not html and not (stop_event and stop_event.is_set())
+            return None
 
-        return {
-            "title": title,
-            "summary": summary,
-            "content": content,
-        }
+        return parse_transcript_page(html, url)
     except Exception as e:
         logging.error(f"Error scraping {url}: {e}")
+        failed = True
         return None
     finally:
-        driver.quit()
+        if driver_pool:
+            driver_pool.release(driver, failed=failed)
+        else:
+            driver.quit()
 
 
 # Function to extract only the <body> content from the raw HTML
 def extract_body_content(html_content):
-    soup = BeautifulSoup(html_content, "html.parser")
-    body_content = soup.body
-    return str(body_content) if body_content else ""
+    return extract_body_html(html_content)
 
-# Function to clean the extracted <body> content by removing <script> and <style> tags
+# Function to clean the extracted <body> content by removing <script> and <style> tags.
+# Given a whole page, extract_clean_text does both steps in a single parse.
 def clean_body_content(body_content):
-    soup = BeautifulSoup(body_content, "html.parser")
-    for script_or_style in soup(["script", "style"]):
-        script_or_style.extract()
-
-    cleaned_content = soup.get_text(separator="\n")
-    cleaned_content = "\n".join(
-        line.strip() for line in cleaned_content.splitlines() if line.strip()
-    )
-    return cleaned_content
+    return extract_clean_text(body_content)
 
 # Function to split the cleaned content into chunks, respecting LLM input size limits
 def split_dom_content(dom_content, max_length=6000):
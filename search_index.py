@@ -0,0 +1,234 @@
+import argparse
+import hashlib
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from journal import iter_journal
+from sortJSON import extract_date, iter_json_records
+
+SEARCH_INDEX_FILE = "transcripts.sqlite3"
+
+QUERY_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def record_key(record):
+    """
+    Identifies a transcript by URL, or by a hash of its title and content for legacy records without one.
+    """
+    if record.get("url"):
+        return record["url"]
+    digest = hashlib.sha256(f"{record.get('title', '')}\n{record.get('content', '')}".encode("utf-8")).hexdigest()
+    return f"sha256:{digest}"
+
+
+def iter_records(path):
+    """
+    Reads records from a JSONL journal or a JSON array file.
+    """
+    if path.endswith(".jsonl"):
+        for record in iter_journal(path):
+            if record.get("status", "ok") == "ok":
+                yield record
+    else:
+        yield from iter_json_records(path)
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def build_match_query(query, phrase=False):
+    """
+    Turns user input into an FTS5 MATCH expression. Terms are quoted so
+    punctuation in the input cannot break the query syntax.
+    """
+    terms = QUERY_TERM.findall(query)
+    if not terms:
+        return None
+    if phrase:
+        return '"' + " ".join(terms) + '"'
+    return " AND ".join(f'"{term}"' for term in terms)
+
+
+class TranscriptIndex:
+    """
+    SQLite FTS5 full-text index over scraped transcripts. Records are upserted
+    by URL, so re-ingesting a journal only indexes what is new or changed.
+
+    Parameters:
+    - path (str): The SQLite database file.
+    """
+
+    def __init__(self, path=SEARCH_INDEX_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS transcripts (
+                id INTEGER PRIMARY KEY,
+                key TEXT UNIQUE NOT NULL,
+                url TEXT,
+                title TEXT,
+                summary TEXT,
+                content TEXT,
+                published_at TEXT,
+                content_hash TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS transcripts_published ON transcripts (published_at);
+
+            CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts USING fts5(
+                title, summary, content,
+                content='transcripts', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            );
+
+            -- Keep the full-text index in sync with the transcripts table
+            CREATE TRIGGER IF NOT EXISTS transcripts_ai AFTER INSERT ON transcripts BEGIN
+                INSERT INTO transcripts_fts (rowid, title, summary, content) VALUES (new.id, new.title, new.summary, new.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS transcripts_ad AFTER DELETE ON transcripts BEGIN
+                INSERT INTO transcripts_fts (transcripts_fts, rowid, title, summary, content)
+                VALUES ('delete', old.id, old.title, old.summary, old.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS transcripts_au AFTER UPDATE ON transcripts BEGIN
+                INSERT INTO transcripts_fts (transcripts_fts, rowid, title, summary, content)
+                VALUES ('delete', old.id, old.title, old.summary, old.content);
+                INSERT INTO transcripts_fts (rowid, title, summary, content) VALUES (new.id, new.title, new.summary, new.content);
+            END;
+        """)
+        self._db.commit()
+
+    def add_many(self, records, batch_size=500):
+        """
+        Indexes records with title/summary/content (and url if known).
+        Unchanged records are skipped.
+
+        Returns:
+        - int: The number of records inserted or updated.
+        """
+        changed = 0
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                changed += self._add_batch(batch)
+                batch = []
+        if batch:
+            changed += self._add_batch(batch)
+        return changed
+
+    def add(self, record):
+        return self.add_many([record])
+
+    def _add_batch(self, records):
+        rows = []
+        for record in records:
+            title, summary, content = record.get("title", ""), record.get("summary", ""), record.get("content", "")
+            content_hash = hashlib.sha256(f"{title}\n{summary}\n{content}".encode("utf-8")).hexdigest()
+            published = extract_date(content)
+            published_at = published.isoformat() if published != datetime.min else None
+            rows.append((record_key(record), record.get("url"), title, summary, content, published_at, content_hash))
+
+        with self._lock:
+            cursor = self._db.executemany("""
+                INSERT INTO transcripts (key, url, title, summary, content, published_at, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    url = excluded.url, title = excluded.title, summary = excluded.summary, content = excluded.content,
+                    published_at = excluded.published_at, content_hash = excluded.content_hash
+                WHERE transcripts.content_hash != excluded.content_hash
+            """, rows)
+            self._db.commit()
+            # Summed over the batch; unchanged records and trigger writes are not counted
+            return cursor.rowcount
+
+    def ingest_file(self, path):
+        """
+        Indexes every record of a JSONL journal or JSON array file.
+        """
+        return self.add_many(iter_records(path))
+
+    def search(self, query, phrase=False, date_from=None, date_to=None, limit=20):
+        """
+        Ranked full-text search.
+
+        Parameters:
+        - query (str): Words to search for (all must match), or a phrase if phrase=True.
+        - phrase (bool): Match the words as one exact phrase.
+        - date_from, date_to (date): Optional publication date range, both days inclusive.
+        - limit (int): Maximum number of results.
+
+        Returns:
+        - list: dicts with url, title, summary, published_at, snippet and rank (lower is better).
+        """
+        match = build_match_query(query, phrase)
+        if match is None:
+            return []
+
+        conditions, params = ["transcripts_fts MATCH ?"], [match]
+        if date_from:
+            conditions.append("t.published_at >= ?")
+            params.append(_as_date(date_from).isoformat())
+        if date_to:
+            conditions.append("t.published_at < ?")
+            params.append((_as_date(date_to) + timedelta(days=1)).isoformat())
+        params.append(limit)
+
+        with self._lock:
+            rows = self._db.execute(f"""
+                SELECT t.url, t.title, t.summary, t.published_at,
+                       snippet(transcripts_fts, 2, '**', '**', ' … ', 16),
+                       bm25(transcripts_fts, 10.0, 3.0, 1.0) AS rank
+                FROM transcripts_fts JOIN transcripts t ON t.id = transcripts_fts.rowid
+                WHERE {' AND '.join(conditions)}
+                ORDER BY rank
+                LIMIT ?
+            """, params).fetchall()
+
+        columns = ("url", "title", "summary", "published_at", "snippet", "rank")
+        return [dict(zip(columns, row)) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query the full-text transcript index.")
+    parser.add_argument("--index", default=SEARCH_INDEX_FILE)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Index a JSONL journal or JSON array file.")
+    ingest_parser.add_argument("paths", nargs="+")
+
+    search_parser = subparsers.add_parser("search", help="Search the index.")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--phrase", action="store_true")
+    search_parser.add_argument("--from", dest="date_from", type=datetime.fromisoformat, default=None)
+    search_parser.add_argument("--to", dest="date_to", type=datetime.fromisoformat, default=None)
+    search_parser.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args(argv)
+    index = TranscriptIndex(args.index)
+    try:
+        if args.command == "ingest":
+            for path in args.paths:
+                print(f"{path}: {index.ingest_file(path)} records added or updated.")
+            print(f"{index.count()} transcripts indexed.")
+        elif args.command == "search":
+            for result in index.search(args.query, args.phrase, args.date_from, args.date_to, args.limit):
+                print(f"{result['published_at'] or 'undated':19}  {result['title']}")
+                print(f"    {result['snippet']}")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
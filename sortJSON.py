@@ -1,31 +1,181 @@
+import argparse
+import heapq
 import json
-from datetime import datetime
+import os
 import re
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+INPUT_FILE = "scraped_2024-2014.json"
+OUTPUT_FILE = "sorted_2024-2014.json"
+RUN_SIZE = 20000  # Records sorted in memory at a time
+READ_BLOCK_SIZE = 1 << 20
+
+# Publication date pattern (e.g., "October 13, 2023, 11:15"); DOTALL so it also matches
+# content whose newlines have not been normalized yet, such as journal records
+PUBLICATION_DATE = re.compile(r"Publication date:(.*?)(?=Direct link:|$)", re.DOTALL)
+DATE_FORMAT = "%B %d, %Y, %H:%M"
 
 def extract_date(content):
-    # Use regex to find the publication date pattern (e.g., "October 13, 2023, 11:15")
-    date_match = re.search(r"Publication date:(.*?)(?=Direct link:|$)", content)
+    # Use regex to find the publication date pattern
+    date_match = PUBLICATION_DATE.search(content)
     if date_match:
         # Convert to datetime for sorting
         date_str = date_match.group(1).strip()
         try:
-            return datetime.strptime(date_str, "%B %d, %Y, %H:%M")
+            return datetime.strptime(date_str, DATE_FORMAT)
         except ValueError as e:
             print(f"Date parsing error: {e} for content: {content}")
     return datetime.min  # Fallback if no date found
 
-# Load the JSON data
-with open("scraped_2024-2014.json", "r", encoding="utf-8") as file:
-    data = json.load(file)
+def iter_json_records(path, block_size=READ_BLOCK_SIZE):
+    """
+    Streams the records of a JSON array file or a JSONL file (detected from
+    the first character) without loading the whole file.
+
+    Parameters:
+    - path (str): The input file.
+    - block_size (int): Characters read at a time for JSON arrays.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = f.read(block_size).lstrip()
+        if not buffer.startswith("["):
+            # JSONL: one record per line
+            f.seek(0)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        # JSON array: decode one element at a time, reading more when an element is cut off
+        position = 1
+        eof = False
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            try:
+                if position >= len(buffer):
+                    raise ValueError("buffer exhausted")
+                record, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if eof:
+                    raise ValueError(f"Truncated or invalid JSON array in {path}")
+                block = f.read(block_size)
+                eof = not block
+                buffer = buffer[position:] + block
+                position = 0
+                continue
+            yield record
+            position = end
+
+def normalize_record(record):
+    # Replace \n characters in summary and content fields
+    for field in ("summary", "content"):
+        if isinstance(record.get(field), str):
+            record[field] = record[field].replace('\n', ' ')  # Replace with a space
+    return record
+
+def sort_key(record, sequence):
+    """
+    Newest first; records with the same date keep their input order, as
+    with the stable list.sort(reverse=True) this replaces.
+    """
+    minutes = (extract_date(record.get("content", "")) - datetime.min) // timedelta(minutes=1)
+    return -minutes, sequence
+
+def _write_run(records, tmp_dir):
+    records.sort(key=lambda item: item[0])
+    fd, path = tempfile.mkstemp(prefix="sortjson-run-", suffix=".jsonl", dir=tmp_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        for (minutes, sequence), record in records:
+            f.write(f"{minutes}\t{sequence}\t{json.dumps(record, ensure_ascii=False)}\n")
+    return path
+
+def _read_run(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            minutes, sequence, record = line.split("\t", 2)
+            yield (int(minutes), int(sequence)), record
+
+def external_sort(input_path, output_path, run_size=RUN_SIZE, tmp_dir=None, normalize=True):
+    """
+    Sorts a corpus by publication date, newest first, with an external merge
+    sort: runs of run_size records are sorted in memory and spilled to
+    temporary files, then merged while the output is written, so memory use
+    is bounded by the run size rather than the corpus size. The output is
+    the same as json.dump(sorted records, indent=4, ensure_ascii=False).
+
+    Parameters:
+    - input_path (str): JSON array or JSONL corpus.
+    - output_path (str): The sorted JSON array file.
+    - run_size (int): Records per in-memory run.
+    - tmp_dir (str): Directory for the run files (default: the output directory).
+    - normalize (bool): Replace newlines in summary and content with spaces.
+
+    Returns:
+    - dict: Record and run counts and the time spent per phase.
+    """
+    tmp_dir = tmp_dir or os.path.dirname(os.path.abspath(output_path))
+    timings = {}
+    run_paths = []
+    run = []
+    count = 0
+
+    start = time.perf_counter()
+    try:
+        for sequence, record in enumerate(iter_json_records(input_path)):
+            if normalize:
+                normalize_record(record)
+            run.append((sort_key(record, sequence), record))
+            count += 1
+            if len(run) >= run_size:
+                run_paths.append(_write_run(run, tmp_dir))
+                run = []
+        timings["read_and_sort_runs"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if run_paths:
+            if run:
+                run_paths.append(_write_run(run, tmp_dir))
+            merged = (json.loads(record) for _, record in heapq.merge(*map(_read_run, run_paths)))
+        else:
+            # Everything fit in one run; no need to spill it
+            run.sort(key=lambda item: item[0])
+            merged = (record for _, record in run)
+
+        tmp_path = output_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            out.write("[")
+            for index, record in enumerate(merged):
+                item = json.dumps(record, ensure_ascii=False, indent=4)
+                out.write(",\n" if index else "\n")
+                out.write("\n".join("    " + line for line in item.splitlines()))
+            out.write("\n]" if count else "]")
+        os.replace(tmp_path, output_path)
+        timings["merge_and_write"] = time.perf_counter() - start
+    finally:
+        for path in run_paths:
+            os.remove(path)
+
+    return {"records": count, "runs": max(len(run_paths), 1 if count else 0), "timings": timings}
 
-# Replace \n characters in summary and content fields
-for item in data:
-    item['summary'] = item['summary'].replace('\n', ' ')  # Replace with a space
-    item['content'] = item['content'].replace('\n', ' ')  # Replace with a space
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sort scraped transcripts by publication date, newest first.")
+    parser.add_argument("input", nargs="?", default=INPUT_FILE, help="JSON array or JSONL corpus.")
+    parser.add_argument("output", nargs="?", default=OUTPUT_FILE)
+    parser.add_argument("--run-size", type=int, default=RUN_SIZE, help="Records sorted in memory at a time.")
+    parser.add_argument("--tmp-dir", default=None, help="Directory for the temporary sorted runs.")
+    parser.add_argument("--keep-newlines", action="store_true", help="Do not replace newlines in summary/content.")
+    args = parser.parse_args(argv)
 
-# Sort data by the extracted publication date
-data.sort(key=lambda x: extract_date(x['content']), reverse=True)
+    result = external_sort(args.input, args.output, args.run_size, args.tmp_dir, normalize=not args.keep_newlines)
+    print(f"Sorted {result['records']} records in {result['runs']} runs into {args.output}.")
+    for phase, elapsed in result["timings"].items():
+        print(f"{phase}: {elapsed:.2f} s")
 
-# Save the sorted data to a new JSON file
-with open("sorted_2024-2014.json", "w", encoding="utf-8") as file:
-    json.dump(data, file, indent=4, ensure_ascii=False)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
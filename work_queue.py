@@ -0,0 +1,408 @@
+import argparse
+import logging
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+
+import metrics
+from html_cache import normalize_url
+
+WORK_QUEUE_FILE = "work_queue.sqlite3"
+LEASE_SECONDS = 300
+BATCH_SIZE = 20
+MAX_ATTEMPTS = 3
+INGEST_BATCH_SIZE = 1000
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Durable, lease-based queue of URLs to scrape, shared by any number of
+    worker processes. A worker claims a batch of URLs under a lease and
+    renews it while it works. If the worker dies, the lease expires and the
+    URLs go back to the queue. A URL is marked done only by the worker that
+    still holds its lease, after its result was synced to that worker's
+    journal, so each URL is scraped once and no result is lost; only a
+    worker that crashes mid-batch leaves URLs to be scraped again.
+
+    Workers on several machines can share the queue if the database file
+    is on a filesystem with working POSIX locks; SQLite over NFS without
+    reliable locking is not safe.
+
+    Parameters:
+    - path (str): The SQLite database file.
+    - max_attempts (int): Claims per URL before it is marked failed.
+    """
+
+    def __init__(self, path=WORK_QUEUE_FILE, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS work (
+                url TEXT PRIMARY KEY,
+                status TEXT NOT NULL DEFAULT 'pending',
+                lease_owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                enqueued_at REAL NOT NULL,
+                finished_at REAL,
+                error TEXT
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS work_claimable ON work (status, lease_expires)")
+        self._db.commit()
+
+    def enqueue(self, urls, batch_size=INGEST_BATCH_SIZE):
+        """
+        Streams URLs into the queue: each is stripped and normalized, blank
+        lines are skipped, and URLs already queued (in any state) are ignored.
+
+        Returns:
+        - tuple: (URLs read, URLs added).
+        """
+        read = added = 0
+        batch = []
+        for line in urls:
+            url = line.strip()
+            if not url:
+                continue
+            read += 1
+            batch.append(normalize_url(url))
+            if len(batch) >= batch_size:
+                added += self._insert(batch)
+                batch = []
+        if batch:
+            added += self._insert(batch)
+        return read, added
+
+    def _insert(self, urls):
+        now = time.time()
+        with self._lock:
+            cursor = self._db.executemany("INSERT OR IGNORE INTO work (url, enqueued_at) VALUES (?, ?)",
+                                          [(url, now) for url in urls])
+            self._db.commit()
+            return cursor.rowcount
+
+    def ingest_file(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return self.enqueue(f)
+
+    def claim(self, worker_id, batch_size=BATCH_SIZE, lease_seconds=LEASE_SECONDS):
+        """
+        Leases up to batch_size URLs: pending ones, and leased ones whose lease
+        expired (their worker is gone). URLs that used up max_attempts are
+        marked failed instead.
+
+        Returns:
+        - list: The claimed URLs.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("""
+                    UPDATE work SET status = 'failed', finished_at = ?, lease_owner = NULL,
+                                    error = COALESCE(error, 'Lease expired too many times')
+                    WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+                """, (now, now, self.max_attempts))
+                rows = self._db.execute("""
+                    SELECT url FROM work
+                    WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?)
+                    LIMIT ?
+                """, (now, batch_size)).fetchall()
+                urls = [row[0] for row in rows]
+                self._db.executemany("""
+                    UPDATE work SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1
+                    WHERE url = ?
+                """, [(worker_id, now + lease_seconds, url) for url in urls])
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+        return urls
+
+    def renew(self, worker_id, urls, lease_seconds=LEASE_SECONDS):
+        """
+        Extends the leases this worker still holds.
+
+        Returns:
+        - int: The number of leases renewed; fewer than len(urls) means some were lost.
+        """
+        if not urls:
+            return 0
+        expires = time.time() + lease_seconds
+        with self._lock:
+            cursor = self._db.executemany(
+                "UPDATE work SET lease_expires = ? WHERE url = ? AND status = 'leased' AND lease_owner = ?",
+                [(expires, url, worker_id) for url in urls])
+            self._db.commit()
+            return cursor.rowcount
+
+    def complete(self, worker_id, url, status="done", error=None):
+        """
+        Finishes a leased URL. A worker that lost the lease cannot finish it.
+
+        Parameters:
+        - status (str): 'done', or 'retry' to put the URL back in the queue
+          (it is marked 'failed' once it used up max_attempts).
+
+        Returns:
+        - bool: True if this worker still held the lease.
+        """
+        with self._lock:
+            if status == "retry":
+                cursor = self._db.execute("""
+                    UPDATE work SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                                    lease_owner = NULL, lease_expires = NULL, error = ?,
+                                    finished_at = CASE WHEN attempts >= ? THEN ? END
+                    WHERE url = ? AND status = 'leased' AND lease_owner = ?
+                """, (self.max_attempts, error, self.max_attempts, time.time(), url, worker_id))
+            else:
+                cursor = self._db.execute("""
+                    UPDATE work SET status = ?, lease_owner = NULL, lease_expires = NULL, finished_at = ?, error = ?
+                    WHERE url = ? AND status = 'leased' AND lease_owner = ?
+                """, (status, time.time(), error, url, worker_id))
+            self._db.commit()
+            return cursor.rowcount == 1
+
+    def release(self, worker_id):
+        """
+        Returns every URL this worker still holds to the queue, without counting the attempt.
+        """
+        with self._lock:
+            cursor = self._db.execute("""
+                UPDATE work SET status = 'pending', lease_owner = NULL, lease_expires = NULL, attempts = attempts - 1
+                WHERE status = 'leased' AND lease_owner = ?
+            """, (worker_id,))
+            self._db.commit()
+            return cursor.rowcount
+
+    def requeue_failed(self):
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE work SET status = 'pending', attempts = 0, error = NULL, finished_at = NULL WHERE status = 'failed'")
+            self._db.commit()
+            return cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM work GROUP BY status").fetchall()
+        stats = {"pending": 0, "leased": 0, "done": 0, "empty": 0, "failed": 0}
+        stats.update(rows)
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class LeaseKeeper:
+    """
+    Background thread that renews a worker's current batch of leases every
+    lease_seconds / 3 while the batch is being scraped.
+    """
+
+    def __init__(self, work_queue, worker_id, lease_seconds=LEASE_SECONDS):
+        self.work_queue = work_queue
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self._urls = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def hold(self, urls):
+        with self._lock:
+            self._urls.update(urls)
+
+    def held(self):
+        with self._lock:
+            return list(self._urls)
+
+    def drop(self, url):
+        with self._lock:
+            self._urls.discard(url)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            urls = self.held()
+            renewed = self.work_queue.renew(self.worker_id, urls, self.lease_seconds)
+            if renewed < len(urls):
+                logging.warning("Lost %d of %d leases.", len(urls) - renewed, len(urls))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(queue_path=WORK_QUEUE_FILE, worker_id=None, browser="chrome", batch_size=BATCH_SIZE,
+               lease_seconds=LEASE_SECONDS, fetch_workers=8, browsers=2, journal_path=None, stop_event=None,
+               wait_for_leases=True):
+    """
+    Headless worker: claims batches from the work queue and scrapes them with
+    the same fetch and parse pipeline as the UI, writing results to its own
+    journal file. Runs until the queue is drained or stop_event is set.
+
+    Parameters:
+    - queue_path (str): The work queue database.
+    - worker_id (str): Unique worker name (default: hostname-pid).
+    - browser (str): Browser for the Selenium fallback.
+    - batch_size (int): URLs claimed at a time.
+    - lease_seconds (float): Lease length; renewed every third of it while the batch runs.
+    - fetch_workers (int): Concurrent fetch threads.
+    - browsers (int): Size of the fallback driver pool.
+    - journal_path (str): Result journal (default: scraped_content.<worker_id>.jsonl, one per worker).
+    - stop_event: Optional threading event to stop after the current results.
+    - wait_for_leases (bool): When nothing is claimable but other workers hold leases, wait for them
+      to finish or expire instead of exiting.
+
+    Returns:
+    - dict: Counts of done, empty and retried URLs.
+    """
+    # Imported here so enqueueing and stats do not need the browser stack
+    from driver_pool import DriverPool
+    from fetch import PageFetcher
+    from journal import ResultJournal
+    from pipeline import ScrapePipeline
+
+    worker_id = worker_id or default_worker_id()
+    journal_path = journal_path or f"scraped_content.{worker_id}.jsonl"
+    stop_event = stop_event or threading.Event()
+    work_queue = WorkQueue(queue_path)
+    counts = {"done": 0, "empty": 0, "retry": 0, "lost": 0}
+
+    driver_pool = DriverPool(browser, size=browsers, stop_event=stop_event)
+    fetcher = PageFetcher(browser, driver_pool=driver_pool, pool_size=fetch_workers)
+    pipeline = ScrapePipeline(fetcher, fetch_workers=fetch_workers, stop_event=stop_event)
+    logging.info("Worker %s started; results go to %s.", worker_id, journal_path)
+
+    def complete_synced(finished):
+        # A URL leaves the queue only once its result is on disk, so a crash can never lose a result
+        if not finished:
+            return
+        journal.sync()
+        for url, status, error in finished:
+            counts[status if work_queue.complete(worker_id, url, status, error) else "lost"] += 1
+            leases.drop(url)
+        finished.clear()
+
+    try:
+        with ResultJournal(journal_path) as journal, driver_pool, \
+                LeaseKeeper(work_queue, worker_id, lease_seconds) as leases:
+            while not stop_event.is_set():
+                urls = work_queue.claim(worker_id, batch_size, lease_seconds)
+                if not urls:
+                    if wait_for_leases and work_queue.stats()["leased"]:
+                        stop_event.wait(min(lease_seconds / 3, 10))
+                        continue
+                    break
+                leases.hold(urls)
+
+                finished = []
+                for url, record, error in pipeline.run(urls):
+                    if stop_event.is_set():
+                        break
+                    if error:
+                        logging.error("Error scraping %s: %s", url, error)
+                        journal.append(url, status="error")
+                        finished.append((url, "retry", str(error)))
+                    elif not record:
+                        journal.append(url, status="empty")
+                        finished.append((url, "empty", None))
+                    else:
+                        journal.append(url, {
+                            "title": record.get("title", "No Title"),
+                            "summary": record.get("summary", "No Summary"),
+                            "content": record.get("content", "No Content"),
+                        })
+                        finished.append((url, "done", None))
+                    if len(finished) >= journal.fsync_every:
+                        complete_synced(finished)
+
+                complete_synced(finished)
+                if stop_event.is_set():
+                    break
+                # URLs the pipeline dropped (parse failures) go back for another attempt
+                for url in leases.held():
+                    work_queue.complete(worker_id, url, "retry", error="No result from the pipeline")
+                    counts["retry"] += 1
+                    leases.drop(url)
+                logging.info("Worker %s: %s; queue: %s", worker_id, counts, work_queue.stats())
+    finally:
+        # Anything still leased (stopped mid-batch) goes straight back to the queue
+        released = work_queue.release(worker_id)
+        if released:
+            logging.info("Released %d unfinished URLs.", released)
+        fetcher.close()
+        work_queue.close()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared work queue for scraping URL lists with many workers.")
+    parser.add_argument("--queue", default=WORK_QUEUE_FILE)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Normalize, dedupe and enqueue URL files.")
+    ingest_parser.add_argument("paths", nargs="+")
+
+    worker_parser = subparsers.add_parser("worker", help="Scrape URLs from the queue until it is drained.")
+    worker_parser.add_argument("--id", default=None, help="Worker name (default: hostname-pid).")
+    worker_parser.add_argument("--browser", default="chrome", choices=("chrome", "firefox"))
+    worker_parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    worker_parser.add_argument("--lease", type=float, default=LEASE_SECONDS, help="Lease length in seconds.")
+    worker_parser.add_argument("--fetch-workers", type=int, default=8)
+    worker_parser.add_argument("--browsers", type=int, default=2)
+    worker_parser.add_argument("--journal", default=None)
+    worker_parser.add_argument("--no-wait", action="store_true", help="Exit when nothing is claimable.")
+    worker_parser.add_argument("--metrics-port", type=int, default=None,
+                               help="Serve this machine's pipeline metrics for Prometheus on this port.")
+
+    subparsers.add_parser("stats", help="Show how many URLs are in each state.")
+    subparsers.add_parser("requeue-failed", help="Give failed URLs another round of attempts.")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(message)s")
+
+    if args.command == "worker":
+        stop_event = threading.Event()
+        # Finish the current results, release the rest of the batch and exit
+        signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+        signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+        metrics.start_snapshot_writer("worker")
+        if args.metrics_port:
+            metrics.start_metrics_server(args.metrics_port, host="0.0.0.0")
+        counts = run_worker(args.queue, args.id, args.browser, args.batch_size, args.lease, args.fetch_workers,
+                            args.browsers, args.journal, stop_event, wait_for_leases=not args.no_wait)
+        print(f"Worker finished: {counts}")
+        return
+
+    work_queue = WorkQueue(args.queue)
+    try:
+        if args.command == "ingest":
+            for path in args.paths:
+                read, added = work_queue.ingest_file(path)
+                print(f"{path}: {read} URLs read, {added} new.")
+        elif args.command == "requeue-failed":
+            print(f"{work_queue.requeue_failed()} failed URLs requeued.")
+        print(work_queue.stats())
+    finally:
+        work_queue.close()
+
+
+if __name__ == "__main__":
+    main()